@@ -0,0 +1,260 @@
+from btcp.constants import *
+from btcp.client_socket import BTCPClientSocket
+from btcp.server_socket import BTCPServerSocket, BTCPServerConnection
+import io
+import asyncio
+
+
+# The asyncio counterpart of the lossy layer: a datagram protocol which passes the segments to the bTCP socket from the
+# event loop, and calls lossy_layer_tick of the socket with a loop timer instead of from a thread. Without b, segments
+# can only be send to explicit addresses, as a server does which accepts segments from many clients.
+class DatagramLayer(asyncio.DatagramProtocol):
+
+    def __init__(self, btcp_sock):
+        self._btcp_sock = btcp_sock
+        self._transport = None
+        self._tick_handle = None  # The loop timer for the next lossy_layer_tick.
+
+    # Create the datagram endpoint on the running loop, returns the layer once it is bound.
+    @classmethod
+    async def create(cls, btcp_sock, a_address, b_address=None):
+        loop = asyncio.get_running_loop()
+        _, layer = await loop.create_datagram_endpoint(lambda: cls(btcp_sock), local_addr=a_address,
+                                                       remote_addr=b_address)
+        return layer
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def datagram_received(self, data, address):
+        self._btcp_sock.lossy_layer_input(data, address)
+        self._schedule_tick()
+
+    # The (ip, port) the socket is bound to, the port is chosen by the system when bound to port 0.
+    @property
+    def address(self):
+        return self._transport.get_extra_info('sockname')
+
+    # Close the transport and stop the timer.
+    def destroy(self):
+        if self._tick_handle is not None:
+            self._tick_handle.cancel()
+        self._transport.close()
+
+    # Call lossy_layer_tick as soon as possible, from the event loop.
+    def wake(self):
+        asyncio.get_running_loop().call_soon(self._schedule_tick)
+
+    # Put the segment into the network, to b or to the given (ip, port) address.
+    def send_segment(self, segment, address=None):
+        self._transport.sendto(segment, address)
+
+    # Put many segments into the network at once
+    def send_segments(self, segments, address=None):
+        for segment in segments:
+            self._transport.sendto(segment, address)
+
+    # Call lossy_layer_tick again when it asks for it, a pending timer is only moved when it has to go off earlier.
+    def _schedule_tick(self):
+        timeout = self._btcp_sock.lossy_layer_tick()
+        if timeout is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(timeout, 0)
+        if self._tick_handle is not None:
+            if self._tick_handle.when() <= deadline:
+                return
+            self._tick_handle.cancel()
+        self._tick_handle = loop.call_at(deadline, self._tick)
+
+    def _tick(self):
+        self._tick_handle = None
+        self._schedule_tick()
+
+
+# A timer with the interface of threading.Timer, which calls the function from the event loop.
+class _LoopTimer:
+
+    def __init__(self, loop, interval, function):
+        self._loop = loop
+        self._interval = interval
+        self._function = function
+        self._handle = None
+
+    def start(self):
+        self._handle = self._loop.call_at(self._loop.time() + self._interval, self._function)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+
+
+# A client which runs on an asyncio event loop instead of threads, so many clients can share one thread. It is created
+# with the create coroutine, connect, send, send_stream and disconnect are coroutines. The protocol is the one of
+# BTCPClientSocket, only the timers, events and the sleeping of the sender are replaced.
+class AsyncBTCPClientSocket(BTCPClientSocket):
+
+    def __init__(self, timeout, congestion='newreno', address=(CLIENT_IP, CLIENT_PORT),
+                 server_address=(SERVER_IP, SERVER_PORT), pacing=False, rate_limit=None, payload_size=PAYLOAD_SIZE,
+                 compression=None, compression_level=None, resume=False):
+        self._addresses = (address, server_address)
+        self._loop = None
+        self._waiter = None  # The future the sender sleeps on, until an ACK arrives or a segment times out.
+        super().__init__(timeout, congestion, address, server_address, pacing, rate_limit, payload_size, compression,
+                         compression_level, resume)
+
+    # Create a client socket bound on the running loop.
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        sock = cls(*args, **kwargs)
+        sock._loop = asyncio.get_running_loop()
+        sock._lossy_layer = await DatagramLayer.create(sock, *sock._addresses)
+        return sock
+
+    # Perform a three-way handshake to establish a connection, with fast open this returns as soon as the SYN is send.
+    async def connect(self, fast_open=False):
+        self._start_connect()
+        if fast_open:
+            return True
+        await self._connected_flag.wait()
+        return self._connected
+
+    # Send data originating from the application in a reliable way to the server.
+    async def send(self, data, finish=False):
+        if isinstance(data, str):
+            data = data.encode()
+        return await self.send_stream(io.BytesIO(data), finish)
+
+    # Send all of the data from a binary file object in a reliable way to the server, the segments are read lazily.
+    async def send_stream(self, fileobj, finish=False):
+        self._start_send(fileobj, finish)
+        return await self._send_loop()
+
+    # Perform a handshake to terminate a connection, unless the last send already did.
+    async def disconnect(self):
+        if self._fin_seq is None:
+            self._start_disconnect()
+        await self._finished_flag.wait()
+        return self._finished
+
+    # The lossy layer is created by create, since the endpoint can only be created on the running loop.
+    def _create_lossy_layer(self, address, server_address):
+        return None
+
+    def _create_timer(self, function):
+        return _LoopTimer(self._loop, self._rtt.rto, function)
+
+    def _create_event(self):
+        return asyncio.Event()
+
+    # The deadlines are from time.monotonic, which is the clock of the event loop as well.
+    async def _send_loop(self):
+        while True:
+            done, deadline = self._send_step()
+            if done is not None:
+                return done
+
+            # Sleep until an ACK arrives, the first pending segment times out or the pacer releases a segment.
+            self._waiter = self._loop.create_future()
+            handle = None if deadline is None else self._loop.call_at(deadline, self._wake)
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+                if handle is not None:
+                    handle.cancel()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+# A server which runs on an asyncio event loop instead of a thread. It is created with the create coroutine, accept,
+# recv and recv_into are coroutines and the data is iterated over with async for.
+class AsyncBTCPServerSocket(BTCPServerSocket):
+
+    __iter__ = None  # Only async iteration is supported.
+
+    def __init__(self, window_size, ack_every=ACK_EVERY, ack_delay=ACK_DELAY, address=(SERVER_IP, SERVER_PORT),
+                 payload_size=PAYLOAD_SIZE, compression=True, resume=None, idle_timeout=IDLE_TIMEOUT):
+        self._address = address
+        super().__init__(window_size, ack_every, ack_delay, address, payload_size, compression, resume, idle_timeout)
+
+    # Create a server socket bound on the running loop.
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        sock = cls(*args, **kwargs)
+        sock._lossy_layer = await DatagramLayer.create(sock, sock._address)
+        return sock
+
+    # Wait for a client to initiate a three-way handshake, returns the established connection. With a timeout in seconds
+    # None is returned when no connection is established in time.
+    async def accept(self, timeout=None):
+        try:
+            self._connection = await asyncio.wait_for(self._accepted.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self._connection
+
+    # Send any incoming data of the last accepted connection to the application layer, returns all of the data once
+    # the connection is terminated.
+    async def recv(self):
+        return await self._connection.recv()
+
+    # Read the in-order data of the last accepted connection as soon as it is received into the buffer.
+    async def recv_into(self, buffer):
+        return await self._connection.recv_into(buffer)
+
+    # Iterate over the in-order data of the last accepted connection as soon as it is received.
+    def __aiter__(self):
+        return self._connection.__aiter__()
+
+    # The lossy layer is created by create, since the endpoint can only be created on the running loop.
+    def _create_lossy_layer(self, address):
+        return None
+
+    def _create_connection(self, address):
+        return AsyncBTCPServerConnection(self, address, self._window_size, self._ack_every, self._ack_delay,
+                                         self._payload_size, self._compression)
+
+    def _create_queue(self):
+        return asyncio.Queue()
+
+
+# The state of the connection with one client of an AsyncBTCPServerSocket.
+class AsyncBTCPServerConnection(BTCPServerConnection):
+
+    __iter__ = None  # Only async iteration is supported.
+
+    def __init__(self, listener, address, window_size, ack_every=ACK_EVERY, ack_delay=ACK_DELAY,
+                 payload_size=PAYLOAD_SIZE, compression=True):
+        super().__init__(listener, address, window_size, ack_every, ack_delay, payload_size, compression)
+        self._readable_event = asyncio.Event()  # Set when data is ready or the connection is terminated.
+
+    # Send any incoming data to the application layer, returns all of the data once the connection is terminated.
+    async def recv(self):
+        return b''.join([chunk async for chunk in self]).decode()
+
+    # Read the in-order data as soon as it is received into the buffer, returns the amount of bytes read or 0 when the
+    # connection is terminated and all data is read.
+    async def recv_into(self, buffer):
+        await self._wait_readable()
+        return self._read_into(memoryview(buffer).cast('B'))
+
+    # Iterate over the in-order data as soon as it is received, until the connection is terminated.
+    async def __aiter__(self):
+        while True:
+            await self._wait_readable()
+            chunks = self._read_chunks()
+            if not chunks:
+                return
+            for chunk in chunks:
+                yield chunk
+
+    async def _wait_readable(self):
+        while not self._readable():
+            self._readable_event.clear()
+            await self._readable_event.wait()
+
+    def _notify(self):
+        self._readable_event.set()
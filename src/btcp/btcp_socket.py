@@ -1,22 +1,109 @@
 import struct
+import sys
+import functools
 import btcp.constants
 
 
-def create_segments(data, isn):
+# The header of a segment: sequence number, acknowledgement number, flags, window size, data length and checksum.
+HEADER_STRUCT = struct.Struct('>HHBBHH')
+
+
+# A parsed segment. The data is a memoryview of the segment, so it is only valid as long as the segment is not reused.
+class Segment:
+    __slots__ = ('seq_num', 'ack_num', 'flags', 'window_size', 'data')
+
+    def __init__(self, seq_num, ack_num, flags, window_size, data):
+        self.seq_num = seq_num
+        self.ack_num = ack_num
+        self.flags = flags              # The flags as a bitmask of FLAG_ACK, FLAG_SYN and FLAG_FIN.
+        self.window_size = window_size
+        self.data = data
+
+
+def create_segments(data, isn, payload_size=None):
     """
     Chop the data bytes into segments with max payload and return a list with all the segments.
     :param isn: The initial sequence number.
+    :param payload_size: The max payload, PAYLOAD_SIZE by default.
     """
+    payload_size = payload_size or btcp.constants.PAYLOAD_SIZE
     segments = []
     seq_num = isn
-    while len(data) > 0:
-        segment = ascii_to_bytes(seq_num, 0, [False, False, False], 0, data[:btcp.constants.PAYLOAD_SIZE])
-        segments.append(segment)
-        seq_num += 1
-        data = data[btcp.constants.PAYLOAD_SIZE:]
+    data = memoryview(data)
+    for offset in range(0, len(data), payload_size):
+        payload = data[offset:offset + payload_size]
+        segments.append(encode_segment(seq_num, 0, 0, 0, payload))
+        seq_num = seq_add(seq_num, 1)
     return segments
 
 
+def stream_segments(fileobj, isn, payload_size=None):
+    """
+    Lazily chop the data read from a binary file object into segments with max payload.
+    :param isn: The initial sequence number.
+    :param payload_size: The max payload, PAYLOAD_SIZE by default.
+    :return: A generator which yields the segments, it reads the next payload only when the next segment is needed.
+    """
+    payload_size = payload_size or btcp.constants.PAYLOAD_SIZE
+    seq_num = isn
+    while True:
+        data = fileobj.read(payload_size)
+        if not data:
+            return
+        yield encode_segment(seq_num, 0, 0, 0, data)
+        seq_num = seq_add(seq_num, 1)
+
+
+def seq_add(seq_num, amount):
+    """
+    :return: The sequence number the given amount of segments after seq_num, wrapping around after 0xffff.
+    """
+    return (seq_num + amount) & 0xffff
+
+
+def seq_diff(seq_num, other):
+    """
+    Serial number arithmetic as defined by RFC 1982 for 16-bit sequence numbers.
+    :return: The signed distance from other to seq_num, in the range [-0x8000, 0x7fff].
+    """
+    return ((seq_num - other + 0x8000) & 0xffff) - 0x8000
+
+
+def seq_lt(seq_num, other):
+    """
+    :return: If seq_num comes before other, following RFC 1982.
+    """
+    return seq_diff(seq_num, other) < 0
+
+
+def options_to_bytes(options):
+    """
+    Encode the options of a SYN or SYN-ACK segment as its payload: a kind byte, a length byte and the value per option.
+    :param options: Dictionary with the option kinds as keys and the values as bytes.
+    :return: The payload bytes.
+    """
+    return b''.join(bytes([kind, len(value)]) + value for (kind, value) in options.items())
+
+
+def bytes_to_options(data):
+    """
+    Decode the options from the payload of a SYN or SYN-ACK segment.
+    :return: Dictionary with the option kinds as keys and the values as bytes.
+    :raises ValueError: If an option is truncated or a known option has a value of the wrong length.
+    """
+    options = {}
+    index = 0
+    while index < len(data):
+        if index + 2 > len(data) or index + 2 + data[index + 1] > len(data):
+            raise ValueError("The options are truncated.")
+        kind, length = data[index], data[index + 1]
+        if kind in btcp.constants.OPTION_LENGTHS and length not in btcp.constants.OPTION_LENGTHS[kind]:
+            raise ValueError("The length of option {} is invalid: {}.".format(kind, length))
+        options[kind] = bytes(data[index + 2:index + 2 + length])
+        index += 2 + length
+    return options
+
+
 def merge_segments(data):
     """
     Merge the data together.
@@ -26,14 +113,35 @@ def merge_segments(data):
     return b''.join([data for (_, data) in sorted(data)])
 
 
-def calculate_checksum(segment):
+def sack_to_bytes(ranges):
+    """
+    Encode the selective acknowledgement ranges as the payload of an ACK segment, every range takes four bytes.
+    :param ranges: Tuples with (first seq_num, last seq_num) of received segments, at most MAX_SACK_RANGES are encoded.
+    :return: The payload bytes.
+    """
+    return b''.join(struct.pack('>HH', first, last) for (first, last) in ranges[:btcp.constants.MAX_SACK_RANGES])
+
+
+def bytes_to_sack(data):
+    """
+    Decode the selective acknowledgement ranges from the payload of an ACK segment.
+    :return: Tuples with (first seq_num, last seq_num) of received segments.
+    :raises ValueError: If the data length is not a multiple of four bytes.
+    """
+    if len(data) % 4 != 0:
+        raise ValueError("The selective acknowledgement data is not a multiple of four bytes.")
+    return list(struct.iter_unpack('>HH', data))
+
+
+def checksum_reference(segment):
     """
     Calculate the Internet Checksum as defined by RFC 1071. If the data is not divisible by 16 bits then the data is
-    padded with zeros until it is.
+    padded with zeros until it is. This is the straightforward word by word implementation, kept as the reference for
+    the faster engines below.
     :return: The Internet Checksum computed over the given data (with padding).
     """
     if len(segment) % 2 != 0:
-        segment += b'\x00'
+        segment = bytes(segment) + b'\x00'
 
     checksum = 0
     for pair in range(0, len(segment), 2):
@@ -46,6 +154,74 @@ def calculate_checksum(segment):
     return checksum.to_bytes(2, byteorder='big')
 
 
+def checksum_words(segment):
+    """
+    Calculate the Internet Checksum by summing native 16-bit words of a memoryview and folding the carries afterwards.
+    The one's complement sum is byte order independent (RFC 1071 section 2), so the sum is computed in native order and
+    only the result is swapped.
+    :return: The Internet Checksum computed over the given data (with padding).
+    """
+    view = memoryview(segment).cast('B')
+    total = sum(view[:len(view) & ~1].cast('H'))
+    if len(view) % 2 != 0:  # The last byte padded with a zero byte, as a native word.
+        total += view[-1] if sys.byteorder == 'little' else view[-1] << 8
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    if sys.byteorder == 'little':
+        total = ((total & 0xff) << 8) | (total >> 8)
+    return (total ^ 0xffff).to_bytes(2, byteorder='big')
+
+
+def checksum_bigint(segment):
+    """
+    Calculate the Internet Checksum by interpreting the whole segment as one big-endian integer. Since 2**16 is
+    congruent to 1 modulo 0xffff, the one's complement sum of all the 16-bit words equals that integer modulo 0xffff,
+    except that a non-zero sum is represented as 0xffff instead of 0. Padding an odd length segment with a zero byte is
+    the same as shifting the integer by 8 bits, so no copy of the segment is needed.
+    :return: The Internet Checksum computed over the given data (with padding).
+    """
+    number = int.from_bytes(segment, byteorder='big')
+    if len(segment) % 2 != 0:
+        number <<= 8
+
+    total = number % 0xffff
+    if total == 0 and number != 0:
+        total = 0xffff
+    return (total ^ 0xffff).to_bytes(2, byteorder='big')
+
+
+# All the available checksum engines, ordered from the most to the least preferred.
+CHECKSUM_ENGINES = {
+    'bigint': checksum_bigint,
+    'words': checksum_words,
+    'reference': checksum_reference,
+}
+
+_checksum_engine = checksum_bigint
+
+
+def set_checksum_engine(name=None):
+    """
+    Select the engine used by calculate_checksum and valid_checksum.
+    :param name: The name of an engine in CHECKSUM_ENGINES, or None to select the most preferred one automatically.
+    :raises ValueError: If the engine does not exist.
+    """
+    global _checksum_engine
+    if name is None:
+        name = next(iter(CHECKSUM_ENGINES))
+    if name not in CHECKSUM_ENGINES:
+        raise ValueError("The checksum engine does not exist: {}.".format(name))
+    _checksum_engine = CHECKSUM_ENGINES[name]
+
+
+def calculate_checksum(segment):
+    """
+    Calculate the Internet Checksum as defined by RFC 1071 with the selected checksum engine.
+    :return: The Internet Checksum computed over the given data (with padding).
+    """
+    return _checksum_engine(segment)
+
+
 def valid_checksum(segment):
     """
     Validate the Internet Checksum as defined by RFC 1071.
@@ -108,32 +284,70 @@ def ascii_to_bytes(seq_num, ack_num, flags, window_size, data):
     if len(data) > btcp.constants.PAYLOAD_SIZE:
         raise ValueError("The data size is out of range: {}.".format(data))
 
-    header  = seq_num.to_bytes(2, byteorder='big')
-    header += ack_num.to_bytes(2, byteorder='big')
-    header += flags_array_to_byte(flags)
-    header += window_size.to_bytes(1, byteorder='big')
-    header += len(data).to_bytes(2, byteorder='big')
-    header += calculate_checksum(header + b'\x00\x00' + data)
-    return header + data
+    flags_byte = flags_array_to_byte(flags)[0]
+    return bytes(encode_segment(seq_num, ack_num, flags_byte, window_size, data))
 
 
-def bytes_to_ascii(segment):
+def encode_segment(seq_num, ack_num, flags, window_size, data):
     """
-    Extract all of the data values from a segment.
-    :return: All the data values. The data value is of bytes and should only be decoded when all segments are received.
-    :raises: ValueError If the checksum is not valid or if the data_length is different from the actual amount of data.
+    Create a segment by packing the header into a preallocated buffer, followed by the data. The checksum of the
+    header is added to the checksum of the data, so the header and data are never concatenated. The values are not
+    validated, use ascii_to_bytes for that.
+    :param flags: The flags as a bitmask of FLAG_ACK, FLAG_SYN and FLAG_FIN.
+    :param data: The data to be send, as bytes or a memoryview.
+    :return: A bytearray segment.
     """
-    seq_num     = struct.unpack('>H', segment[0:2])[0]
-    ack_num     = struct.unpack('>H', segment[2:4])[0]
-    flags       = flags_byte_to_array(segment[4:5])
-    window_size = struct.unpack('>B', segment[5:6])[0]
-    data_length = struct.unpack('>H', segment[6:8])[0]
-    data        = segment[10:]
+    segment = bytearray(btcp.constants.HEADER_SIZE + len(data))
+    segment[btcp.constants.HEADER_SIZE:] = data
+
+    # The header is an even amount of bytes, so its words are simply added to the one's complement sum of the data.
+    total = seq_num + ack_num + ((flags << 8) | window_size) + len(data) + \
+        (int.from_bytes(calculate_checksum(data), byteorder='big') ^ 0xffff)
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    HEADER_STRUCT.pack_into(segment, 0, seq_num, ack_num, flags, window_size, len(data), total ^ 0xffff)
+    return segment
+
+
+@functools.lru_cache(maxsize=256)
+def control_segment(seq_num, ack_num, flags, window_size, data=b''):
+    """
+    Create a control segment (SYN, ACK, FIN, ...), these are cached since the same ones are send again and again.
+    :param flags: The flags as a bitmask of FLAG_ACK, FLAG_SYN and FLAG_FIN.
+    :param data: The data to be send as bytes, the options or selective acknowledgements.
+    :return: A bytes segment.
+    """
+    return bytes(encode_segment(seq_num, ack_num, flags, window_size, data))
+
+
+def parse_segment(segment):
+    """
+    Parse a segment without copying it, the header is unpacked at once and the data is a view of the segment.
+    :param segment: The segment as bytes, bytearray or memoryview.
+    :return: A Segment with all the values.
+    :raises ValueError: If the checksum is not valid or if the data_length is different from the actual amount of data.
+    """
+    view = memoryview(segment)
+    if len(view) < btcp.constants.HEADER_SIZE:
+        raise ValueError("The segment is shorter than the header.")
+    seq_num, ack_num, flags, window_size, data_length, _ = HEADER_STRUCT.unpack_from(view)
+    data = view[btcp.constants.HEADER_SIZE:]
 
     if len(data) != data_length:
         raise ValueError("The data length is not equal to the actual amount of data.")
-    if not valid_checksum(segment):
+    if not valid_checksum(view):
         raise ValueError("The checksum is invalid.")
 
-    return seq_num, ack_num, flags, window_size, data
+    return Segment(seq_num, ack_num, flags, window_size, data)
 
+
+def bytes_to_ascii(segment):
+    """
+    Extract all of the data values from a segment.
+    :return: All the data values. The data value is of bytes and should only be decoded when all segments are received.
+    :raises: ValueError If the checksum is not valid or if the data_length is different from the actual amount of data.
+    """
+    parsed = parse_segment(segment)
+    flags = [bool(parsed.flags & flag) for flag in (btcp.constants.FLAG_ACK, btcp.constants.FLAG_SYN,
+                                                     btcp.constants.FLAG_FIN)]
+    return parsed.seq_num, parsed.ack_num, flags, parsed.window_size, bytes(parsed.data)
@@ -1,260 +1,690 @@
 from btcp.lossy_layer import LossyLayer
 from btcp.constants import *
-from btcp.btcp_socket import ascii_to_bytes, bytes_to_ascii, create_segments
+from btcp.btcp_socket import control_segment, parse_segment, bytes_to_sack, stream_segments, seq_add, seq_diff, \
+    options_to_bytes, bytes_to_options
+from btcp.rtt_estimator import RTTEstimator
+from btcp.congestion import CONGESTION_CONTROLLERS
+from btcp.pacing import Pacer
+from btcp.compression import Compressor
+from btcp.stats import ConnectionStats
+import io
 import time
+import heapq
 import random
 import threading
 
 
 # A client application makes use of the services provided by bTCP by calling connect, send, disconnect, and close.
+# With pacing the segments are spread over the round-trip time, the rate limit in bytes per second caps the rate. The
+# payload size is the largest payload the client sends, the server may lower it during the establishment. The data
+# segments are compressed with the compression method (zlib or lzma) and level when the server supports it. A short
+# transfer can skip round trips: with fast open the data follows the SYN without waiting for the SYN-ACK, and a send
+# with finish sends the FIN right behind the last segment. A client which can resume learns the prefix of the stream the
+# server already has from resume_offer, once connected.
 class BTCPClientSocket:
 
-    def __init__(self, timeout):
-        self._lossy_layer = LossyLayer(self, CLIENT_IP, CLIENT_PORT, SERVER_IP, SERVER_PORT)
-
-        self._timeout = timeout / 100000  # The timeout for one segment in seconds.
-        self._timer   = None              # The timer used to detect a timeout.
-        self._seq_num = None              # The initial sequence number, initialized during establishment.
+    def __init__(self, timeout, congestion='newreno', address=(CLIENT_IP, CLIENT_PORT),
+                 server_address=(SERVER_IP, SERVER_PORT), pacing=False, rate_limit=None, payload_size=PAYLOAD_SIZE,
+                 compression=None, compression_level=None, resume=False):
+        if payload_size < 1 or payload_size > MAX_PAYLOAD_SIZE:
+            raise ValueError("The payload size is out of range: {}.".format(payload_size))
+        self._rtt     = RTTEstimator(timeout / 1000)  # The round-trip time estimation, the timeout is the initial RTO.
+        self._timer   = None                          # The timer used to detect a timeout of the SYN.
+        self._isn     = None                          # The initial sequence number, initialized during establishment.
+        self._seq_num = None                          # The sequence number of the first data segment.
 
         # Variables for sending data over to the server.
-        self._send_flag = None     # A flag to signify when to stop all the threads.
         self._seg_tries = None     # The amount of tries every segment gets.
-
-        self._segments = None      # All segments which are to be send plus the amount of tries left for every segment.
-        self._status   = None      # The status for every segment: 0 not send, 1 send not ACKed, 2 timeout, 3 ACKed.
-        self._pending  = None      # The time at which certain segments are send, contains (seq_num, time send).
-        self._acks     = None      # All of the acknowledgements which need to be processed.
+        self._finish    = False    # If the FIN is send right behind the data of the current send.
+
+        self._fileobj  = None      # The binary file object with the data to be send.
+        self._source   = None      # A generator which lazily creates the segments from the data to be send.
+        self._segments = None      # The segments in the window by index, plus the amount of tries left and time send.
+        self._status   = None      # The status for every segment from the send base: 0 not send, 1 send not ACKed,
+                                   # 2 timeout, 3 ACKed, 4 lost (detected by duplicate or selective ACKs).
+        self._next_index = None    # The index of the next segment to be created from the source.
+        self._end = None           # The amount of segments in total, None until the source is exhausted.
+        self._pending  = None      # Min-heap with the retransmission deadlines, contains (deadline, index, tries).
+        self._in_flight = None     # The amount of segments which are send but not yet ACKed nor timed out.
 
         self._send_base   = None   # The index for self._segments up to which all segments are ACKed.
         self._window_size = None   # The window size of the server, initialized during establishment.
-
-        self._status_lock  = None  # Ensure that changing the status list is done thread safe.
-        self._pending_lock = None  # Ensure that changing the pending list is done thread safe.
-        self._send_base_lock = None  # Ensure that changing the send base is done thread safe.
+        self._window_scale = 0     # The shift applied to the window size field, agreed during establishment.
+        self._max_payload = payload_size   # The largest payload the client wants to send.
+        self._payload_size = PAYLOAD_SIZE  # The payload size of the segments, agreed during establishment.
+        self._dup_acks    = None   # The amount of ACKs in a row which did not move the send base.
+        self._high_sent   = None   # The index after the highest segment which is send.
+        self._recovery    = None   # Losses of segments before this index do not reduce the congestion window again.
+        self._persist_deadline = None  # The time of the next zero window probe, None while the window is open.
+        self._probes      = None   # The amount of zero window probes since the last ACK.
+
+        # The congestion controller limiting the segments in flight next to the window size, None to disable it.
+        self._congestion = CONGESTION_CONTROLLERS[congestion]() if congestion is not None else None
+
+        # The pacer releasing the segments at a steady rate, None to send the whole window at once.
+        self._pacer = Pacer(pacing, rate_limit) if pacing or rate_limit else None
+        self._release = None  # The time the pacer releases the next segment, None when the pacer does not hold any.
+
+        # The sender only wakes up when an ACK arrives or when the next retransmission deadline expires, all of the
+        # variables above are protected by this condition.
+        self._condition = threading.Condition()
+
+        # The statistics of the connection, and a Tracer to record a timeline of the segments (None to disable it).
+        self.stats = ConnectionStats()
+        self.tracer = None
+
+        # The compressor offered to the server, and the one which is used once the server agreed.
+        self._offered_compressor = Compressor(compression, compression_level, self.stats) if compression else None
+        self._compressor = None
+
+        # If the client can resume a stream, and the (offset, SHA-256 digest) the server offered in the SYN-ACK.
+        self._resume = resume
+        self._resume_offer = None
 
         # Variables for the connection establishment phase.
         self._syn_tries = None         # The number of tries to establish a connection.
+        self._syn_time  = None         # The time at which the first SYN is send, used for the first RTT sample.
         self._connected = None         # A boolean to signify if the connection was successful, returned by connect().
         self._connected_flag = None    # An event to signify when the connection is established.
 
         # Variables for the connection termination phase.
         self._fin_tries = None         # The number of tries to terminate a connection.
+        self._fin_seq = None           # The sequence number of the FIN, the one after the last segment.
+        self._fin_timer = None         # The timer used to detect a timeout of the FIN.
+        self._fin_retransmits = None   # The retransmissions when a pipelined FIN is send, None once it is resend.
         self._finished = None          # A boolean to signify if the closing was (ab)normal, returned by disconnect().
         self._finished_flag = None     # An event to signify when the connection is terminated.
 
+        # The lossy layer is started last, its thread may deliver a stray segment right away. An asyncio client
+        # creates its endpoint later, on the running loop.
+        self._lossy_layer = self._create_lossy_layer(address, server_address)
+        if self._lossy_layer is not None:
+            self._lossy_layer.start()
+
+    # The retransmissions because duplicate or selective ACKs showed a segment is lost.
+    @property
+    def fast_retransmits(self):
+        return self.stats.fast_retransmits
+
+    # The retransmissions because the retransmission timeout expired.
+    @property
+    def timeout_retransmits(self):
+        return self.stats.timeout_retransmits
+
+    # The smoothed round-trip time in seconds, None until the first sample.
+    @property
+    def srtt(self):
+        return self._rtt.srtt
+
+    # The current retransmission timeout in seconds.
+    @property
+    def rto(self):
+        return self._rtt.rto
+
+    # The payload size of the data segments, agreed with the server during the establishment.
+    @property
+    def payload_size(self):
+        return self._payload_size
+
+    # The (offset, SHA-256 digest) of the prefix of the stream the server already has, None if it offered nothing.
+    @property
+    def resume_offer(self):
+        return self._resume_offer
+
+    # The (ip, port) the client is bound to, the port is chosen by the system when bound to port 0.
+    @property
+    def address(self):
+        return self._lossy_layer.address
+
     # Called by the lossy layer from another thread whenever a segment arrives. 
-    def lossy_layer_input(self, segment):
+    def lossy_layer_input(self, segment, address):
+        self.stats.segments_received += 1
+        self.stats.bytes_received += len(segment)
         try:
-            seq_num, ack_num, flags, window_size, data = bytes_to_ascii(segment)
-            if   flags[0] and flags[1]:  # ACK & SYN
-                self._handle_syn(seq_num, ack_num, window_size)
-            elif flags[0] and flags[2]:  # ACK & FIN
-                self._handle_fin()
-            elif flags[0]:  # ACK
-                self._handle_ack(ack_num, window_size)
+            segment = parse_segment(segment)
         except ValueError:  # Incorrect checksum or data length.
+            self.stats.checksum_failures += 1
+            return
+        if self.tracer is not None:
+            self.tracer.record('recv', segment.seq_num, segment.ack_num, segment.flags, segment.window_size)
+        try:
+            flags = segment.flags
+            if   flags & FLAG_ACK and flags & FLAG_SYN:  # ACK & SYN
+                self._handle_syn(segment.seq_num, segment.ack_num, segment.window_size, segment.data)
+            elif flags & FLAG_ACK and flags & FLAG_FIN:  # ACK & FIN
+                self._handle_fin(segment.ack_num)
+            elif flags & FLAG_ACK:  # ACK
+                self._handle_ack(segment.ack_num, segment.window_size, segment.data)
+        except ValueError:  # Incorrect options or selective ACKs.
             pass
 
-    # Perform a three-way handshake to establish a connection.
-    def connect(self):
-        # Create the initial sequence number and amount of tries to establish a connection and the connected flag.
-        self._connected_flag = threading.Event()
-        self._connected = False
-        self._syn_tries = 30
-        self._seq_num = random.randint(0, 0xffff)
+    # Called by the lossy layer after every wakeup, the client has no timers in the lossy layer thread.
+    def lossy_layer_tick(self):
+        return None
 
-        # Send the first segment to the server.
-        segment = ascii_to_bytes(self._seq_num, 0, [False, True, False], 0, b'')
-        self._lossy_layer.send_segment(segment)
-
-        # Create and start a timer for the connection establishment phase.
-        self._timer = threading.Timer(self._timeout, self._handle_syn_timeout)
-        self._timer.start()
+    # Perform a three-way handshake to establish a connection. With fast open this returns as soon as the SYN is send,
+    # the next send fails when the connection cannot be established.
+    def connect(self, fast_open=False):
+        self._start_connect()
+        if fast_open:
+            return True
 
         # Wait until the connection handshake is done.
         self._connected_flag.wait()
         return self._connected
 
-    # Send data originating from the application in a reliable way to the server.
-    def send(self, data):
-        data = data.encode()
-
-        # Initialize all the variables.
-        self._send_flag = threading.Event()
-        self._seg_tries = 30
-        self._send_base = 0
-
-        self._segments = [[segment, self._seg_tries] for segment in create_segments(data, self._seq_num)]
-        self._status   = [0] * len(self._segments)
-        self._pending  = []
-        self._acks     = []
-
-        self._status_lock  = threading.Lock()
-        self._pending_lock = threading.Lock()
-        self._send_base_lock = threading.Lock()
-
-        # Start the acknowledgement loop in a new thread.
-        acks = threading.Thread(target=self._ack_loop)
-        acks.start()
-
-        # Start the timer in a new thread.
-        timer = threading.Thread(target=self._timer_loop)
-        timer.start()
-
-        # Send all of the segments, returns if all are send.
-        success = self._send_loop()
+    # Send the SYN, the rest of the handshake is driven by the SYN-ACK and the timer.
+    def _start_connect(self):
+        # Create the initial sequence number and amount of tries to establish a connection and the connected flag.
+        self._connected_flag = self._create_event()
+        self._connected = False
+        self._syn_tries = 30
+        self.stats.enter('connect')
+        self._isn = random.randint(0, 0xffff)
+        self._seq_num = seq_add(self._isn, 1)
+        self._fin_seq = None
+
+        # Data send before the SYN-ACK arrives uses the defaults every server accepts, in a small window.
+        self._window_size = FAST_OPEN_WINDOW
+        self._window_scale = 0
+        self._payload_size = min(PAYLOAD_SIZE, self._max_payload)
+        self._compressor = None
+        self._resume_offer = None
+        self._source = None
+
+        # Create a timer for the connection establishment phase, before the SYN-ACK can possibly arrive.
+        self._timer = self._create_timer(self._handle_syn_timeout)
+
+        # Send the first segment to the server and start the timer.
+        segment = control_segment(self._isn, 0, FLAG_SYN, 0, self._syn_options())
+        self._syn_time = time.monotonic()
+        self._send_segment(segment)
+        self._timer.start()
 
-        # Set the _send_flag so the timer will stop.
-        self._send_flag.set()
-        acks.join()
-        timer.join()
+    # Send data originating from the application in a reliable way to the server. With finish the FIN follows the
+    # last segment right away and the connection is terminated once this returns, disconnect only returns the result.
+    def send(self, data, finish=False):
+        if isinstance(data, str):
+            data = data.encode()
+        return self.send_stream(io.BytesIO(data), finish)
+
+    # Send all of the data from a binary file object in a reliable way to the server, the segments are read lazily.
+    def send_stream(self, fileobj, finish=False):
+        self._start_send(fileobj, finish)
+
+        # Send all of the segments, returns if all are send and if this was successful.
+        return self._send_loop()
+
+    # Initialize all the variables for sending the data from the file object.
+    def _start_send(self, fileobj, finish=False):
+        with self._condition:
+            self.stats.enter('transfer')
+            self._seg_tries = 30
+            self._finish = finish
+            self._send_base = 0
+            self._dup_acks = 0
+            self._high_sent = 0
+            self._recovery = 0
+            self._persist_deadline = None
+            self._probes = 0
+            self._release = None
+
+            self._segments = {}
+            self._status   = bytearray()
+            self._pending  = []
+            self._in_flight = 0
+            self._next_index = 0
+            self._end = None
+            self._fileobj = fileobj
+            self._start_source()
+
+    # Perform a handshake to terminate a connection, unless the last send already did.
+    def disconnect(self):
+        if self._fin_seq is None:
+            self._start_disconnect()
 
-        # Return if the sending of all the segments was successful.
-        return success
+        # Wait until the termination handshake is done.
+        self._finished_flag.wait()
+        return self._finished
 
-    # Perform a handshake to terminate a connection.
-    def disconnect(self):
-        self._finished_flag = threading.Event()
+    # Send the FIN, the rest of the handshake is driven by the FIN-ACK and the timer.
+    def _start_disconnect(self):
+        self._finished_flag = self._create_event()
         self._finished = False
         self._fin_tries = 15
+        self.stats.enter('disconnect')
+        self._fin_seq = seq_add(self._seq_num, self._end if self._finish else self._send_base or 0)
+        self._fin_retransmits = self.fast_retransmits + self.timeout_retransmits
+        self._send_fin()
+
+    # Send the FIN to the server and start the timer, before the FIN-ACK can possibly arrive.
+    def _send_fin(self):
+        segment = control_segment(self._fin_seq, 0, FLAG_FIN, 0)
+        self._fin_timer = self._create_timer(self._handle_fin_timeout)
+        self._fin_timer.start()
+        self._send_segment(segment)
+
+    # End the termination handshake, and wake a sender which waits for the FIN-ACK of a pipelined FIN.
+    def _terminate(self, finished):
+        with self._condition:
+            if self._timer is not None:  # The SYN-ACK may be lost when the data followed the SYN.
+                self._timer.cancel()
+            self._finished = finished
+            self.stats.leave(phase='disconnect')
+            self._finished_flag.set()
+            self._wake()
 
-        # Send a FIN to the server.
-        segment = ascii_to_bytes(0, 0, [False, False, True], 0, b'')
+    # Put a segment into the network and count it.
+    def _send_segment(self, segment):
+        self.stats.segments_sent += 1
+        self.stats.bytes_sent += len(segment)
         self._lossy_layer.send_segment(segment)
 
-        # Create and start a timer for the connection termination phase.
-        self._timer = threading.Timer(self._timeout, self._handle_fin_timeout)
-        self._timer.start()
+    # Put a batch of segments into the network at once and count them.
+    def _send_segments(self, segments):
+        self.stats.segments_sent += len(segments)
+        self.stats.bytes_sent += sum(len(segment) for segment in segments)
+        self._lossy_layer.send_segments(segments)
 
-        # Wait until the termination handshake is done.
-        self._finished_flag.wait()
-        return self._finished
+    # Update the round-trip time estimation with a sample in seconds.
+    def _sample_rtt(self, rtt):
+        self._rtt.sample(rtt)
+        self.stats.rtt(rtt)
 
     # Clean up any state.
     def close(self):
         self._lossy_layer.destroy()
 
-    def _handle_syn(self, seq_num, ack_num, window_size):
-        if ack_num == self._seq_num + 1:
-            self._timer.cancel()
-            self._window_size = window_size
-            self._seq_num += 1
-
-            # Send an ACK back to the server.
-            segment = ascii_to_bytes(self._seq_num, seq_num + 1, [True, False, False], 0, b'')
-            self._lossy_layer.send_segment(segment)
-
-            # Signal the connect() function that the connection is established.
-            self._connected = True
-            self._connected_flag.set()
+    # The lossy layer with its own thread which delivers the segments from the server.
+    def _create_lossy_layer(self, address, server_address):
+        return LossyLayer(self, *address, *server_address)  # Port 0 lets the system pick a free port.
+
+    # A timer which calls the function after the current retransmission timeout, once it is started.
+    def _create_timer(self, function):
+        return threading.Timer(self._rtt.rto, function)
+
+    # An event to signal the end of a handshake.
+    def _create_event(self):
+        return threading.Event()
+
+    # The options send with the SYN, the window scale option signals that the window size field may be scaled and the
+    # payload size option offers larger segments.
+    def _syn_options(self):
+        options = {OPTION_WINDOW_SCALE: b'\x00', OPTION_PAYLOAD_SIZE: self._max_payload.to_bytes(2, byteorder='big')}
+        if self._offered_compressor is not None:
+            options[OPTION_COMPRESSION] = self._offered_compressor.option
+        if self._resume:
+            options[OPTION_RESUME] = b''
+        return options_to_bytes(options)
+
+    def _handle_syn(self, seq_num, ack_num, window_size, data):
+        if ack_num != seq_add(self._isn, 1):
+            return
+        with self._condition:
+            if not self._connected:
+                self._timer.cancel()
+                options = bytes_to_options(data)
+                if OPTION_WINDOW_SCALE in options:
+                    self._window_scale = min(options[OPTION_WINDOW_SCALE][0], MAX_WINDOW_SCALE)
+                # A server without the payload size option only accepts the default payload size.
+                payload_size = int.from_bytes(options[OPTION_PAYLOAD_SIZE], byteorder='big') \
+                    if OPTION_PAYLOAD_SIZE in options else PAYLOAD_SIZE
+                self._payload_size = max(min(payload_size, self._max_payload), 1)
+                # The server only echoes the compression option when it decompresses the segments.
+                offered = self._offered_compressor
+                self._compressor = offered \
+                    if offered is not None and options.get(OPTION_COMPRESSION) == offered.option else None
+                offer = options.get(OPTION_RESUME)
+                if self._resume and offer is not None and len(offer) == 8 + 32:
+                    self._resume_offer = (int.from_bytes(offer[:8], byteorder='big'), offer[8:])
+                self._window_size = window_size << self._window_scale
+                if self._source is not None and self._end is None:
+                    # A fast open sender created its first segments with the defaults, the rest of the data uses the
+                    # agreed payload size and compression. The server takes the default sized segments in any case.
+                    self._start_source()
+                if self._syn_tries == 30:  # Only sample the round-trip time if the SYN was not retransmitted.
+                    self._sample_rtt(time.monotonic() - self._syn_time)
+                self._connected = True
+                self.stats.leave(phase='connect')
+                self._wake()  # A fast open sender may use the window of the server now.
+
+            # Send an ACK back to the server, again for a retransmitted SYN-ACK since the ACK is probably lost.
+            segment = control_segment(self._seq_num, seq_add(seq_num, 1), FLAG_ACK, 0)
+            self._send_segment(segment)
+
+        # Signal the connect() function that the connection is established.
+        self._connected_flag.set()
 
     def _handle_syn_timeout(self):
+        if self._connected_flag.is_set():  # The SYN-ACK arrived while the timer went off.
+            return
         if self._syn_tries <= 0:
             # Signal the connect() function that the connection could not be established.
+            self.stats.leave(phase='connect')
             self._connected_flag.set()
         else:
             self._syn_tries -= 1
 
             # Resend the initial segment.
-            segment = ascii_to_bytes(self._seq_num, 0, [False, True, False], 0, b'')
-            self._lossy_layer.send_segment(segment)
+            segment = control_segment(self._isn, 0, FLAG_SYN, 0, self._syn_options())
+            self._send_segment(segment)
 
-            # Restart the timeout timer.
-            self._timer = threading.Timer(self._timeout, self._handle_syn_timeout)
+            # Restart the timeout timer with a backed off timeout.
+            self._rtt.backoff()
+            self._timer = self._create_timer(self._handle_syn_timeout)
             self._timer.start()
 
-    def _handle_fin(self):
-        self._timer.cancel()
-        self._finished = True
-        self._finished_flag.set()
+    def _handle_fin(self, ack_num):
+        if self._fin_seq is None or ack_num != seq_add(self._fin_seq, 1):  # Not an answer to this FIN.
+            return
+        if not self._finished_flag.is_set():
+            self._fin_timer.cancel()
+            self._terminate(True)
 
     def _handle_fin_timeout(self):
-        if self._fin_tries <= 0:
-            # Signal the disconnect() function that the connection could not be normally terminated.
-            self._finished_flag.set()
-        else:
-            self._fin_tries -= 1
-
-            # Resend the initial segment.
-            segment = ascii_to_bytes(0, 0, [False, False, True], 0, b'')
-            self._lossy_layer.send_segment(segment)
+        with self._condition:
+            if self._finished_flag.is_set():  # The FIN-ACK arrived while the timer went off.
+                return
+            if self._finish and self._send_base < self._end:
+                # The server ignores a pipelined FIN until all of the data arrived, so the tries are not used up while
+                # the data is outstanding. It is resend anyway, the FIN-ACK may be lost along with the last ACKs.
+                self._send_fin()
+            elif self._fin_tries <= 0:
+                # Signal the disconnect() function that the connection could not be normally terminated.
+                self._terminate(False)
+            else:
+                self._fin_tries -= 1
+
+                # Resend the FIN and restart the timeout timer with a backed off timeout.
+                self._rtt.backoff()
+                self._send_fin()
+
+    def _handle_ack(self, ack_num, window_size, data):
+        with self._condition:
+            if self._segments is None:  # Not sending any data (yet).
+                return
+
+            # The ACK number is the highest in-order segment received, the data contains the ranges received after it.
+            now = time.monotonic()
+            self._probes = 0
+            sacked = [(self._index(first), self._index(last)) for (first, last) in bytes_to_sack(data)]
+            acked = [(self._send_base, self._index(ack_num))] + sacked
+
+            newly_acked = 0
+            time_send = None  # The most recent time a newly ACKed segment was send, if it was only send once.
+            for (first, last) in acked:
+                for index in range(max(first, self._send_base), min(last + 1, self._next_index)):
+                    status = self._status[index - self._send_base]
+                    if status == 3:
+                        continue
+                    if status == 1:
+                        self._in_flight -= 1
+                    self._status[index - self._send_base] = 3  # ACKed flag
+                    newly_acked += 1
+                    if self._segments[index][1] == self._seg_tries - 1:  # Karn: only sample segments send once.
+                        time_send = max(time_send or 0, self._segments[index][2])
+
+            window_opened = self._window_size == 0 and window_size > 0
+            self._window_size = window_size << self._window_scale
+            if time_send is not None:
+                self._sample_rtt(now - time_send)
+            if newly_acked and self._congestion is not None:
+                self._congestion.on_ack(newly_acked, now, self._rtt.srtt)
+
+            # Move the send base past all of the segments that are ACKed, these are not needed anymore.
+            send_base = self._send_base
+            acked_base = 0
+            while acked_base < len(self._status) and self._status[acked_base] == 3:
+                del self._segments[send_base + acked_base]
+                acked_base += 1
+            if acked_base:
+                del self._status[:acked_base]
+                self._send_base += acked_base
+
+            # Fast retransmit the send base after a few duplicate ACKs, and every hole the selective ACKs reveal.
+            lost = False
+            if self._send_base == send_base and self._in_flight > 0:
+                self._dup_acks += 1
+                self.stats.duplicates_received += 1
+                if self._dup_acks == DUP_ACK_THRESHOLD:
+                    lost = self._mark_lost(self._send_base)
+            else:
+                self._dup_acks = 0
+            if sacked:
+                lost = self._mark_sack_holes(max(last for (_, last) in sacked)) or lost
+
+            # Only reduce the congestion window once for all the segments lost in the same window.
+            if lost and self._congestion is not None and self._send_base >= self._recovery:
+                self._congestion.on_loss(now)
+                self._recovery = self._high_sent
+
+            if self.tracer is not None:
+                self.tracer.record('ack', self._send_base, newly_acked, self._dup_acks, self._effective_window())
+            if newly_acked or lost or window_opened:
+                self._wake()
+
+    # The index of a sequence number, which is at most half the sequence number space away from the send base.
+    def _index(self, seq_num):
+        return self._send_base + seq_diff(seq_num, seq_add(self._seq_num, self._send_base))
+
+    # Mark a segment as lost so it is retransmitted without waiting for its timeout.
+    def _mark_lost(self, index):
+        if index >= self._next_index or self._status[index - self._send_base] != 1:
+            return False
+        self._status[index - self._send_base] = 4  # lost flag
+        self._in_flight -= 1
+        if self.tracer is not None:
+            self.tracer.record('lost', index)
+        return True
 
-            # Restart the timeout timer.
-            self._timer = threading.Timer(self._timeout, self._handle_fin_timeout)
-            self._timer.start()
+    # A segment is lost if at least DUP_ACK_THRESHOLD segments above it are ACKed and one of these was send later.
+    def _mark_sack_holes(self, highest):
+        lost = False
+        acked_above = 0
+        latest_send = 0
+        for index in range(min(highest, self._next_index - 1), self._send_base - 1, -1):
+            if self._status[index - self._send_base] == 3:
+                acked_above += 1
+                latest_send = max(latest_send, self._segments[index][2])
+            elif acked_above >= DUP_ACK_THRESHOLD and self._segments[index][2] is not None \
+                    and self._segments[index][2] < latest_send:
+                lost = self._mark_lost(index) or lost
+        return lost
+
+    # Wake up the sender, must be called while holding the condition.
+    def _wake(self):
+        self._condition.notify()
+
+    # A pending entry is cancelled lazily: it is only valid as long as its segment is not ACKed and not send again.
+    def _valid_pending(self, entry):
+        _, index, tries = entry
+        return index >= self._send_base and self._status[index - self._send_base] == 1 \
+            and self._segments[index][1] == tries
+
+    def _expire_timeouts(self, now):
+        while self._pending and self._pending[0][0] <= now:
+            entry = heapq.heappop(self._pending)
+            if self._valid_pending(entry):
+                # A timeout occurred, change the status flag to timeout so it will be resend.
+                self._status[entry[1] - self._send_base] = 2  # timeout flag
+                self._in_flight -= 1
+                if self.tracer is not None:
+                    self.tracer.record('timeout', entry[1])
+
+                # Only back off once per round, i.e. when the oldest unACKed segment times out. Until the SYN-ACK
+                # arrives the timer of the SYN backs off, the data send along with it is dropped with the SYN.
+                if entry[1] == self._send_base and self._connected:
+                    self._rtt.backoff()
+                    if self._congestion is not None:
+                        self._congestion.on_timeout(now)
+                        self._recovery = self._high_sent
+
+    def _send_window(self, now):
+        # Send every segment in the window which is not send yet, timed out or lost, until the window is full.
+        # The segments are collected and put into the network at once.
+        window_size = self._effective_window()
+        self.stats.window(window_size)
+        self._fill(self._send_base + window_size)
+        budget = float('inf')  # The amount of segments the pacer allows.
+        if self._pacer is not None:
+            self._pacer.update(window_size, self._rtt.srtt, HEADER_SIZE + self._payload_size)
+            budget = self._pacer.available(now)
+        paced = False
+        batch = []
+        for index in range(self._send_base, min(self._send_base + window_size, self._next_index)):
+            if self._in_flight >= window_size:
+                break
+            status = self._status[index - self._send_base]
+            if status == 0 or status == 2 or status == 4:  # not send, timeout or lost
+                if len(batch) >= budget:
+                    paced = True
+                    break
+                # Check if the amount of tries for this segment is exceeded.
+                if self._segments[index][1] <= 0:
+                    self._send_segments(batch)
+                    return False
+                if status == 2:
+                    self.stats.timeout_retransmits += 1
+                elif status == 4:
+                    self.stats.fast_retransmits += 1
+                if self.tracer is not None:
+                    self.tracer.record('send', index, ('new', None, 'timeout', None, 'lost')[status])
+                self._segments[index][1] -= 1
+                self._segments[index][2] = now
+
+                # Send the segment, add it to the pending segments and update the status.
+                batch.append(self._segments[index][0])
+                self._status[index - self._send_base] = 1  # send but not ACKed flag
+                self._high_sent = max(self._high_sent, index + 1)
+                heapq.heappush(self._pending, (now + self._rtt.rto, index, self._segments[index][1]))
+                self._in_flight += 1
+        self._send_segments(batch)
+        if self._pacer is not None:
+            self._pacer.consume(len(batch))
+        self._release = self._pacer.release(now) if paced else None
+        return True
 
-    def _handle_ack(self, ack_num, window_size):
-        self._acks.append((ack_num, window_size))
-
-    def _ack_loop(self):
-        while not self._send_flag.is_set():
-            if self._acks:
-                ack_num, window_size = self._acks.pop(0)
-                # Update the window size and increase the send base by one if this was the next to be ACKed segment.
-                self._window_size = window_size
-                try:
-                    self._send_base_lock.acquire()
-                    if self._send_base == ack_num - self._seq_num:
-                        self._send_base = ack_num - self._seq_num + 1
-                finally:
-                    self._send_base_lock.release()
-
-                # Change the segment status to received ACK.
-                try:
-                    self._status_lock.acquire()
-                    self._status[ack_num - self._seq_num] = 3  # ACKed flag
-                finally:
-                    self._status_lock.release()
-
-                # Remove the ACKed segment from the pending list.
-                try:
-                    self._pending_lock.acquire()
-                    self._pending = [(seq_num, _time) for (seq_num, _time) in self._pending if seq_num != ack_num]
-                finally:
-                    self._pending_lock.release()
-
-    def _timer_loop(self):
-        while not self._send_flag.is_set():
-            try:
-                self._status_lock.acquire()
-                self._pending_lock.acquire()
-                still_pending = []
-                for (seq_num, time_send) in self._pending:
-                    if time.time_ns() // 1000 - time_send > self._timeout * 100000:
-                        # A timeout occurred, change the status flag to timeout so it will be resend.
-                        if self._status[self._seq_num - seq_num] != 3:  # not ACKed
-                            self._status[self._seq_num - seq_num] = 2  # timeout flag
-                    else:
-                        still_pending.append((seq_num, time_send))
-                self._pending = still_pending
-            finally:
-                self._pending_lock.release()
-                self._status_lock.release()
-            time.sleep(0.005)
+    # Create the segments which are not created yet from the file object, with the current payload size and compression.
+    def _start_source(self):
+        seq_num = seq_add(self._seq_num, self._next_index)
+        if self._compressor is not None:
+            self._source = self._compressor.segments(self._fileobj, seq_num, self._payload_size)
+        else:
+            self._source = stream_segments(self._fileobj, seq_num, self._payload_size)
+
+    # Create the segments from the stream up to the given index, only the segments in the window are kept in memory.
+    def _fill(self, index):
+        while self._end is None and self._next_index < index:
+            segment = next(self._source, None)
+            if segment is None:
+                self._end = self._next_index
+                return
+            self._segments[self._next_index] = [segment, self._seg_tries, None]
+            self._status.append(0)  # not send flag
+            self._next_index += 1
+
+    # The amount of segments which may be in flight: the minimum of the congestion window and the server window.
+    def _effective_window(self):
+        if self._congestion is None:
+            return self._window_size
+        return min(max(int(self._congestion.cwnd), MIN_CWND), self._window_size)
+
+    def _next_deadline(self):
+        while self._pending and not self._valid_pending(self._pending[0]):
+            heapq.heappop(self._pending)
+        return self._pending[0][0] if self._pending else None
 
     def _send_loop(self):
-        while self._send_base < len(self._segments):  # There are segments left to get ACKed.
-            # Check all the segments from the send base till the window if one can be send and then send ONE or none.
-            try:
-                self._send_base_lock.acquire()
-                self._status_lock.acquire()
-                for index, status in enumerate(self._status[self._send_base:self._send_base + self._window_size]):
-                    if (status == 0 or status == 2) and len(self._pending) < self._window_size:  # not send or timeout
-                        # Check if the amount of tries for this segment is exceeded.
-                        if self._segments[self._send_base + index][1] <= 0:
-                            return False
-                        else:
-                            self._segments[self._send_base + index][1] -= 1
-
-                        # Send the segment, add it to the pending segments and update the status.
-                        self._lossy_layer.send_segment(self._segments[self._send_base + index][0])
-                        self._status[self._send_base + index] = 1  # send but not ACKed flag
-                        try:
-                            self._pending_lock.acquire()
-                            self._pending.append((self._send_base + index + self._seq_num, time.time_ns() // 1000))
-                        finally:
-                            self._pending_lock.release()
-            finally:
-                self._status_lock.release()
-                self._send_base_lock.release()
-        return True
+        with self._condition:
+            while True:
+                done, deadline = self._send_step()
+                if done is not None:
+                    return done
+
+                # Sleep until an ACK arrives, the first pending segment times out or the pacer releases a segment.
+                self._condition.wait(None if deadline is None else deadline - time.monotonic())
+
+    # Expire the timeouts and send what the window and the pacer allow. Returns if the transfer is done and successful
+    # (None while it is not done) and the deadline until which the sender may sleep.
+    def _send_step(self):
+        now = time.monotonic()
+        self._expire_timeouts(now)
+        if not self._send_window(now):
+            return self._fail(now)
+
+        # The end of the source may only be found by the last call, when every segment is already ACKed. With a zero
+        # window the next segment is created here, it is needed for the probe. A pipelined FIN needs to know the end
+        # as soon as every segment is send.
+        if self._window_size == 0:
+            self._fill(self._send_base + 1)
+        elif self._finish and self._high_sent >= self._next_index:
+            self._fill(self._next_index + 1)
+        if self._finish:
+            done = self._finish_step()
+            if done is not None:
+                self._finish = False
+                return done, None
+            if self._end is not None and self._send_base >= self._end:
+                return None, None  # Sleep until the FIN-ACK arrives or the FIN is given up.
+        elif self._end is not None and self._send_base >= self._end:
+            self.stats.leave(now)
+            return True, None
+
+        # Nothing can be send while the server advertises a zero window, probe it so the transfer does not stall when
+        # the window update is lost.
+        if self._window_size == 0 and self._in_flight == 0:
+            deadline = self._probe(now)
+            if deadline is None:
+                return self._fail(now)
+            return None, deadline
+        self._persist_deadline = None
+
+        # Never sleep without a deadline while segments are left, the window is looked at again after a timeout.
+        deadline = self._next_deadline()
+        if deadline is None:
+            deadline = now + self._rtt.rto
+        if self._release is not None and self._release < deadline:
+            deadline = self._release
+        return None, deadline
+
+    # End a failed transfer, a pipelined FIN is given up as well.
+    def _fail(self, now):
+        self.stats.leave(now)
+        if self._finish and self._fin_seq is not None and not self._finished_flag.is_set():
+            self._fin_timer.cancel()
+            self._terminate(False)
+        self._finish = False
+        return False, None
+
+    # Pipeline the FIN once the last segment is send. The server only accepts the FIN after all of the data, so the
+    # FIN-ACK ends the transfer as well. Returns if the transfer is done and successful, None while it is not done.
+    def _finish_step(self):
+        if self._fin_seq is None:
+            if self._end is not None and self._high_sent >= self._end:
+                self._start_disconnect()
+            return None
+        if self._finished_flag.is_set():
+            return self._finished
+        if self._send_base >= self._end and self._fin_retransmits is not None \
+                and self.fast_retransmits + self.timeout_retransmits > self._fin_retransmits:
+            # Segments were retransmitted after the FIN, so the server probably ignored it. Send it again once.
+            self._fin_retransmits = None
+            self._fin_timer.cancel()
+            self._send_fin()
+        return None
+
+    # Send the first unACKed segment as a zero window probe when the persist timer expires, the interval backs off
+    # like the retransmission timeout. Returns the time of the next probe, or None when the server stopped answering.
+    def _probe(self, now):
+        if self._persist_deadline is None:
+            self._persist_deadline = now + self._rtt.rto
+        elif now >= self._persist_deadline:
+            if self._probes >= self._seg_tries:
+                return None
+            self._probes += 1
+            self.stats.window_probes += 1
+            if self.tracer is not None:
+                self.tracer.record('probe', self._send_base)
+            self._send_segment(self._segments[self._send_base][0])
+            self._persist_deadline = now + min(self._rtt.rto * 2 ** self._probes, MAX_PERSIST)
+        return self._persist_deadline
@@ -0,0 +1,126 @@
+from btcp.constants import *
+from btcp.btcp_socket import encode_segment, seq_add
+from btcp.stats import ConnectionStats
+import time
+import zlib
+try:
+    import lzma
+except ImportError:  # Python can be built without lzma.
+    lzma = None
+
+
+# The compression methods by name, with the value of the compression option and the default level.
+COMPRESSION_METHODS = {
+    'zlib': (1, 6),
+    'lzma': (2, 1),
+}
+
+_LZMA_DICT_SIZE = 1 << 20  # Covers the largest compressed segment, so the decoder can use the same size.
+_ERRORS = (zlib.error,) + ((lzma.LZMAError,) if lzma is not None else ())
+
+
+def compression_methods():
+    """
+    :return: The names of the compression methods this Python supports.
+    """
+    return [name for name in COMPRESSION_METHODS if name != 'lzma' or lzma is not None]
+
+
+def compression_method(value):
+    """
+    :return: The name of the compression method with the given option value, None if it is not supported.
+    """
+    for name in compression_methods():
+        if COMPRESSION_METHODS[name][0] == value:
+            return name
+    return None
+
+
+# Compress the payload of every data segment on its own, as raw deflate or LZMA2 streams without headers, so a segment
+# can be decompressed on arrival regardless of the segments which are lost or reordered. The time spent and the bytes
+# before and after compression are counted in the statistics.
+class Compressor:
+
+    def __init__(self, method, level=None, stats=None):
+        if method not in compression_methods():
+            raise ValueError("The compression method is not supported: {}.".format(method))
+        self.method = method
+        self.option = bytes([COMPRESSION_METHODS[method][0]])  # The value of the compression option.
+        self._level = COMPRESSION_METHODS[method][1] if level is None else level
+        self._stats = stats if stats is not None else ConnectionStats()
+
+    def compress(self, data):
+        start = time.thread_time()
+        if self.method == 'zlib':
+            compressor = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compressed = compressor.compress(data) + compressor.flush()
+        else:
+            compressed = lzma.compress(data, format=lzma.FORMAT_RAW, filters=[
+                {'id': lzma.FILTER_LZMA2, 'preset': self._level, 'dict_size': _LZMA_DICT_SIZE}])
+        self._stats.compression_time += time.thread_time() - start
+        return compressed
+
+    # Decompress a payload, which may hold at most max_size bytes of data.
+    def decompress(self, data, max_size):
+        start = time.thread_time()
+        try:
+            if self.method == 'zlib':
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            else:
+                decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[
+                    {'id': lzma.FILTER_LZMA2, 'dict_size': _LZMA_DICT_SIZE}])
+            decompressed = decompressor.decompress(data, max_size)
+            if not decompressor.eof:
+                raise ValueError("The compressed payload is truncated or too large.")
+        except _ERRORS as error:
+            raise ValueError("The compressed payload is invalid: {}.".format(error))
+        finally:
+            self._stats.compression_time += time.thread_time() - start
+        self._stats.compression_input += len(decompressed)
+        self._stats.compression_output += len(data)
+        return decompressed
+
+    # Lazily chop the data read from a binary file object into segments like stream_segments, with compressed payloads.
+    # As long as the compressed payloads fit, more data is read for the next segment (up to MAX_COMPRESSION_FACTOR
+    # payloads). A payload which does not get smaller is send as is with the FLAG_COMPRESSED bit cleared, and the next
+    # segments are send as is without trying, for a growing amount of segments up to COMPRESSION_BACKOFF.
+    def segments(self, fileobj, isn, payload_size):
+        seq_num = isn
+        pending = b''             # The data which is read but not send yet.
+        read_size = payload_size  # The amount of data to compress into the next segment.
+        skip = 0                  # The amount of segments to send as is before compression is tried again.
+        backoff = 0               # The amount of segments skipped after the last failed try.
+        while True:
+            size = read_size if skip == 0 else payload_size
+            data = pending + fileobj.read(max(size - len(pending), 0))
+            if not data:
+                return
+
+            payload, flags = None, 0
+            if skip == 0:
+                used = len(data)
+                compressed = self.compress(data)
+                if len(compressed) > payload_size and used > payload_size:
+                    # Too much data is read, compress about the amount which fits.
+                    used = max(int(used * payload_size / len(compressed) * 0.9), payload_size)
+                    compressed = self.compress(data[:used])
+                if len(compressed) <= payload_size and len(compressed) < used:
+                    payload, flags = compressed, FLAG_COMPRESSED
+                    read_size = min(max(int(used * payload_size / len(compressed) * 0.9), payload_size),
+                                    payload_size * MAX_COMPRESSION_FACTOR)
+                    backoff = 0
+                else:
+                    backoff = min(backoff * 2 or 1, COMPRESSION_BACKOFF)
+                    skip = backoff
+                    read_size = payload_size
+            else:
+                skip -= 1
+            if payload is None:
+                used = min(len(data), payload_size)
+                payload = data[:used]
+
+            pending = data[used:]
+            self._stats.compression_input += used
+            self._stats.compression_output += len(payload)
+            yield encode_segment(seq_num, 0, flags, 0, payload)
+            seq_num = seq_add(seq_num, 1)
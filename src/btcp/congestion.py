@@ -0,0 +1,88 @@
+from btcp.constants import *
+import abc
+
+
+# A congestion controller keeps the congestion window (cwnd) of a connection in segments. The client calls on_ack for
+# every ACK which acknowledges new segments, on_loss once per window in which segments are lost and on_timeout when the
+# oldest segment times out. The amount of segments in flight is at most the minimum of the cwnd and the window size of
+# the server. Subclasses define how the window grows during congestion avoidance.
+class CongestionController(abc.ABC):
+
+    def __init__(self):
+        self.cwnd = INITIAL_CWND      # The congestion window in segments.
+        self.ssthresh = float('inf')  # The slow start threshold in segments.
+
+    def on_ack(self, acked, now, srtt):
+        if self.cwnd < self.ssthresh:
+            # Slow start: increase the window by one segment for every ACKed segment.
+            self.cwnd += acked
+        else:
+            self._congestion_avoidance(acked, now, srtt)
+
+    def on_loss(self, now):
+        self.ssthresh = max(self.cwnd / 2, MIN_CWND)
+        self.cwnd = self.ssthresh
+
+    def on_timeout(self, now):
+        self.ssthresh = max(self.cwnd / 2, MIN_CWND)
+        self.cwnd = MIN_CWND
+
+    @abc.abstractmethod
+    def _congestion_avoidance(self, acked, now, srtt):
+        pass
+
+
+# Slow start, additive increase of one segment per round-trip and multiplicative decrease by half (RFC 5681, 6582).
+class NewReno(CongestionController):
+
+    def _congestion_avoidance(self, acked, now, srtt):
+        self.cwnd += acked / self.cwnd
+
+
+# The window grows as a cubic function of the time since the last loss, independent of the round-trip time, and is
+# only reduced to 70% on a loss (RFC 8312).
+class Cubic(CongestionController):
+
+    C    = 0.4  # The scaling constant of the cubic function.
+    BETA = 0.7  # The multiplicative decrease factor.
+
+    def __init__(self):
+        super().__init__()
+        self._w_max = None        # The window just before the last reduction.
+        self._epoch_start = None  # The start of the current congestion avoidance epoch.
+        self._k = 0               # The time it takes to grow back to _w_max.
+
+    def on_loss(self, now):
+        self._reduce()
+        self.cwnd = self.ssthresh
+
+    def on_timeout(self, now):
+        self._reduce()
+        self.cwnd = MIN_CWND
+
+    def _reduce(self):
+        self._w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, MIN_CWND)
+        self._epoch_start = None
+
+    def _congestion_avoidance(self, acked, now, srtt):
+        if self._epoch_start is None:
+            self._epoch_start = now
+            if self._w_max is None or self._w_max < self.cwnd:
+                self._w_max = self.cwnd
+            self._k = (self._w_max * (1 - self.BETA) / self.C) ** (1 / 3)
+
+        # The target window one round-trip from now, grow towards it.
+        t = now - self._epoch_start + (srtt or 0)
+        target = self.C * (t - self._k) ** 3 + self._w_max
+        if target > self.cwnd:
+            self.cwnd += acked * (target - self.cwnd) / self.cwnd
+        else:
+            self.cwnd += acked * 0.01 / self.cwnd
+
+
+# All of the available congestion controllers by name.
+CONGESTION_CONTROLLERS = {
+    'newreno': NewReno,
+    'cubic': Cubic,
+}
@@ -4,5 +4,52 @@ SERVER_IP = 'localhost'
 SERVER_PORT = 30000
 
 HEADER_SIZE = 10
-PAYLOAD_SIZE = 1008
+PAYLOAD_SIZE = 1008  # The payload size when none is negotiated.
 SEGMENT_SIZE = HEADER_SIZE + PAYLOAD_SIZE
+MAX_PAYLOAD_SIZE = 65507 - HEADER_SIZE  # The largest payload which fits in a UDP datagram over IPv4.
+
+FLAG_ACK = 1  # The bits of the flags byte in the header.
+FLAG_SYN = 2
+FLAG_FIN = 4
+FLAG_COMPRESSED = 8  # The payload of a data segment is compressed with the method agreed during establishment.
+
+MIN_RTO = 0.01  # The lower bound for the retransmission timeout in seconds.
+MAX_RTO = 2.0   # The upper bound for the retransmission timeout in seconds.
+MAX_PERSIST = 2.0  # The upper bound for the interval between zero window probes in seconds.
+
+ACK_EVERY = 2          # The amount of in-order segments after which the server sends a delayed ACK.
+ACK_DELAY = 0.002      # The maximum time in seconds the server delays an ACK.
+MAX_SACK_RANGES = 16   # The maximum amount of selective acknowledgement ranges in one ACK.
+TERMINATED_CONNECTIONS = 1024  # The amount of terminated connections a server remembers to answer retransmitted FINs.
+IDLE_TIMEOUT = 30.0  # The seconds without any segment from a client after which the server ends its connection.
+
+DUP_ACK_THRESHOLD = 3  # The amount of duplicate ACKs (or segments SACKed above a hole) before a fast retransmit.
+
+INITIAL_CWND = 4  # The initial congestion window in segments.
+MIN_CWND = 1      # The minimum congestion window in segments.
+FAST_OPEN_WINDOW = 4  # The window in segments a fast open client assumes until the SYN-ACK arrives.
+
+PACING_GAIN = 1.25  # The pacing rate is this factor times the window per smoothed round-trip time.
+PACING_BURST = 2    # The maximum amount of segments a pacer sends back-to-back.
+
+OPTION_WINDOW_SCALE = 1  # Handshake option with the shift applied to the window size field.
+MAX_WINDOW_SCALE = 7     # The maximum window shift, keeps the window below half of the sequence number space.
+OPTION_PAYLOAD_SIZE = 2  # Handshake option with the largest payload the sender of the option accepts (2 bytes).
+OPTION_COMPRESSION = 3   # Handshake option with the compression method of the data segments (1 byte).
+OPTION_RESUME = 4        # Handshake option, empty in the SYN of a client which can resume a stream. In the SYN-ACK the
+                         # offset of the stream the server already has (8 bytes) and the SHA-256 digest of that prefix.
+OPTION_LENGTHS = {        # The lengths the value of every known handshake option may have, other options are ignored.
+    OPTION_WINDOW_SCALE: (1,),
+    OPTION_PAYLOAD_SIZE: (2,),
+    OPTION_COMPRESSION: (1,),
+    OPTION_RESUME: (0, 8 + 32),
+}
+
+MAX_COMPRESSION_FACTOR = 16  # The maximum data in one compressed segment, as a multiple of the payload size.
+COMPRESSION_BACKOFF = 64     # The maximum amount of segments send as is before compression is tried again.
+
+RECV_BATCH_SIZE = 64  # The maximum amount of datagrams the lossy layer reads at once.
+SEND_BATCH_SIZE = 64  # The maximum amount of datagrams the lossy layer sends at once.
+
+STATS_WINDOW_SAMPLES = 1024  # The maximum amount of window changes kept in the statistics of a connection.
+TRACE_CAPACITY = 65536       # The default amount of events a tracer keeps.
@@ -0,0 +1,308 @@
+import collections
+import heapq
+import random
+import socket
+import threading
+import time
+
+
+def parse_netem(rule):
+    """
+    Parse a netem rule as given to tc qdisc (for example "delay 20ms reorder 25% 50%" or "loss gemodel 1% 10%").
+    Percentages may be given with or without the percent sign, times in s, ms or us and rates in bit, kbit, mbit,
+    gbit, bps, kbps, mbps or gbps.
+    :return: Dictionary with the impairments, every value is a dictionary with the parameters of the impairment.
+    :raises ValueError: If the rule contains an unknown or incomplete impairment.
+    """
+    words = rule.split()
+    rules = {}
+    index = 0
+
+    def optional(count, parse):
+        nonlocal index
+        values = []
+        while len(values) < count and index < len(words) and words[index] not in _IMPAIRMENTS:
+            values.append(parse(words[index]))
+            index += 1
+        return values
+
+    while index < len(words):
+        kind = words[index]
+        index += 1
+        if kind not in _IMPAIRMENTS:
+            raise ValueError("The netem impairment is unknown: {}.".format(kind))
+        if kind == 'loss' and index < len(words) and words[index] == 'gemodel':
+            index += 1
+            values = optional(4, _percentage)
+            if not values:
+                raise ValueError("The gemodel loss needs at least the probability p.")
+            p = values[0]
+            r = values[1] if len(values) > 1 else 1 - p
+            bad_loss = values[2] if len(values) > 2 else 1
+            good_loss = values[3] if len(values) > 3 else 0
+            rules['gemodel'] = {'p': p, 'r': r, 'bad_loss': bad_loss, 'good_loss': good_loss}
+        elif kind == 'delay':
+            values = optional(3, str)
+            if not values:
+                raise ValueError("The delay needs a time.")
+            rules['delay'] = {'delay': _time(values[0]),
+                              'jitter': _time(values[1]) if len(values) > 1 else 0,
+                              'correlation': _percentage(values[2]) if len(values) > 2 else 0}
+        elif kind == 'rate':
+            values = optional(1, _rate)
+            if not values:
+                raise ValueError("The rate needs a rate.")
+            rules['rate'] = {'rate': values[0]}
+        elif kind == 'limit':
+            values = optional(1, int)
+            if not values:
+                raise ValueError("The limit needs an amount of packets.")
+            rules['limit'] = {'limit': values[0]}
+        else:
+            values = optional(2, _percentage)
+            if not values:
+                raise ValueError("The {} needs a probability.".format(kind))
+            rules[kind] = {'probability': values[0], 'correlation': values[1] if len(values) > 1 else 0}
+    return rules
+
+
+_IMPAIRMENTS = ('loss', 'corrupt', 'duplicate', 'reorder', 'delay', 'rate', 'limit')
+
+
+def _percentage(word):
+    return float(word.rstrip('%')) / 100
+
+
+def _time(word):
+    for unit, factor in (('us', 1e-6), ('ms', 1e-3), ('s', 1)):
+        if word.endswith(unit):
+            return float(word[:-len(unit)]) * factor
+    return float(word) * 1e-6  # Like tc, a time without unit is in microseconds.
+
+
+def _rate(word):
+    # The rate in bytes per second.
+    for unit, factor in (('gbit', 1e9 / 8), ('mbit', 1e6 / 8), ('kbit', 1e3 / 8), ('bit', 1 / 8),
+                         ('gbps', 1e9), ('mbps', 1e6), ('kbps', 1e3), ('bps', 1)):
+        if word.lower().endswith(unit):
+            return float(word[:-len(unit)]) * factor
+    return float(word) / 8
+
+
+# The random source of one direction of a link, a value is correlated with the previous value like in netem:
+# next = correlation * previous + (1 - correlation) * uniform.
+class _CorrelatedRandom:
+
+    def __init__(self, rng, correlation):
+        self._rng = rng
+        self._correlation = correlation
+        self._last = rng.random()
+
+    def random(self):
+        self._last = self._correlation * self._last + (1 - self._correlation) * self._rng.random()
+        return self._last
+
+
+# The state of one direction between two addresses. Every direction has its own seeded random generator, so the
+# decisions only depend on the segments which are send in that direction.
+class _Link:
+
+    def __init__(self, rules, seed):
+        self.rng = random.Random(seed)
+        self.random = {kind: _CorrelatedRandom(self.rng, rule['correlation']) for (kind, rule) in rules.items()
+                       if 'correlation' in rule}
+        self.bad = False       # The state of the Gilbert-Elliott loss model.
+        self.free = 0          # The time at which the link is done serializing the previous packet.
+        self.in_flight = 0     # The amount of packets on the link, for the limit.
+
+
+# An in-process network which emulates the impairments of netem between emulated sockets. The packets on every
+# direction are impaired by a seeded random generator, so a run can be reproduced. In real time the packets are
+# delivered after their delay, in virtual time the clock jumps to the arrival of the next packet so the delays and
+# rates only determine the order in which the packets arrive.
+class Network:
+
+    def __init__(self, rule='', seed=0, virtual_time=False):
+        self._seed = seed
+        self._virtual_time = virtual_time
+        self._rules = parse_netem(rule)
+        self._sockets = {}             # The bound sockets by (ip, port) address.
+        self._links = {}               # The links by (source, destination) address.
+        self._next_port = 40000        # The next port for a socket bound to port 0.
+        self._now = 0                  # The virtual time.
+        self._arrivals = []            # Min-heap with (arrival time, counter, destination, data, source, link).
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._deliver, daemon=True)
+        self._thread.start()
+
+    # Change the impairments, like tc qdisc change. The links start over with the same seeds.
+    def configure(self, rule):
+        rules = parse_netem(rule)
+        with self._condition:
+            self._rules = rules
+            self._links = {}
+
+    # A new unbound socket on this network.
+    def socket(self):
+        return EmulatedSocket(self)
+
+    # The current time of the network in seconds.
+    def time(self):
+        return self._now if self._virtual_time else time.monotonic()
+
+    # Stop delivering packets.
+    def close(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _bind(self, sock, address):
+        ip, port = socket.gethostbyname(address[0]), address[1]
+        with self._condition:
+            if port == 0:
+                while (ip, self._next_port) in self._sockets:
+                    self._next_port += 1
+                port = self._next_port
+                self._next_port += 1
+            if (ip, port) in self._sockets:
+                raise OSError("The address is already in use: {}.".format((ip, port)))
+            self._sockets[(ip, port)] = sock
+        return ip, port
+
+    def _unbind(self, address):
+        with self._condition:
+            self._sockets.pop(address, None)
+
+    # Put a packet on the link from the source to the destination, applying the impairments.
+    def _send(self, data, source, destination):
+        destination = (socket.gethostbyname(destination[0]), destination[1])
+        with self._condition:
+            link = self._links.get((source, destination))
+            if link is None:
+                link = _Link(self._rules, "{}-{}-{}".format(self._seed, source, destination))
+                self._links[(source, destination)] = link
+            for packet in self._impair(link, bytes(data)):
+                if 'limit' in self._rules and link.in_flight >= self._rules['limit']['limit']:
+                    continue  # The queue of the link is full, drop the packet.
+                arrival = self._departure(link, self.time(), len(packet)) + self._delay(link)
+                link.in_flight += 1
+                self._counter += 1
+                heapq.heappush(self._arrivals, (arrival, self._counter, destination, packet, source, link))
+            self._condition.notify()
+
+    # The packets which are put on the link: none when lost, the packet possibly corrupted, or twice when duplicated.
+    def _impair(self, link, packet):
+        rules = self._rules
+        if 'gemodel' in rules:
+            gemodel = rules['gemodel']
+            link.bad = link.rng.random() >= gemodel['r'] if link.bad else link.rng.random() < gemodel['p']
+            if link.rng.random() < (gemodel['bad_loss'] if link.bad else gemodel['good_loss']):
+                return []
+        if 'loss' in rules and link.random['loss'].random() < rules['loss']['probability']:
+            return []
+        if 'corrupt' in rules and link.random['corrupt'].random() < rules['corrupt']['probability'] and packet:
+            bit = link.rng.randrange(len(packet) * 8)
+            packet = bytearray(packet)
+            packet[bit // 8] ^= 1 << (bit % 8)
+            packet = bytes(packet)
+        if 'duplicate' in rules and link.random['duplicate'].random() < rules['duplicate']['probability']:
+            return [packet, packet]
+        return [packet]
+
+    # The time the packet is serialized onto the link, which is limited by the rate.
+    def _departure(self, link, now, size):
+        if 'rate' not in self._rules:
+            return now
+        link.free = max(link.free, now) + size / self._rules['rate']['rate']
+        return link.free
+
+    # The delay of the next packet, zero for packets which are reordered (send immediately like netem does).
+    def _delay(self, link):
+        rules = self._rules
+        if 'delay' not in rules:
+            return 0
+        if 'reorder' in rules and link.random['reorder'].random() < rules['reorder']['probability']:
+            return 0
+        delay = rules['delay']
+        jitter = (2 * link.random['delay'].random() - 1) * delay['jitter'] if delay['jitter'] else 0
+        return max(delay['delay'] + jitter, 0)
+
+    def _deliver(self):
+        with self._condition:
+            while not self._stopped:
+                if not self._arrivals:
+                    self._condition.wait()
+                    continue
+                if not self._virtual_time:
+                    remaining = self._arrivals[0][0] - time.monotonic()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                        continue
+                arrival, _, destination, packet, source, link = heapq.heappop(self._arrivals)
+                link.in_flight -= 1
+                self._now = max(self._now, arrival)
+                sock = self._sockets.get(destination)
+                if sock is not None:
+                    sock._receive(packet, source)
+
+
+# A datagram socket on an emulated network, with the part of the socket interface the lossy layer uses. It can be
+# used in select since its file descriptor is readable whenever a packet is waiting: a byte is written to a socket
+# pair when the first packet arrives in the empty inbox and read again when the inbox is empty.
+class EmulatedSocket:
+
+    def __init__(self, network):
+        self._network = network
+        self._address = None
+        self._inbox = collections.deque()
+        self._lock = threading.Lock()  # Keeps the readiness byte in line with the inbox.
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+
+    def bind(self, address):
+        self._address = self._network._bind(self, address)
+
+    def getsockname(self):
+        return self._address
+
+    def setsockopt(self, *args):
+        pass
+
+    def setblocking(self, flag):
+        pass
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def sendto(self, data, address):
+        if self._address is None:
+            self.bind(('0.0.0.0', 0))
+        self._network._send(data, self._address, address)
+        return len(data)
+
+    # Read the next packet into the buffer, returns the size and the source address like socket.recvfrom_into.
+    def recvfrom_into(self, buffer):
+        with self._lock:
+            if not self._inbox:
+                raise BlockingIOError
+            packet, source = self._inbox.popleft()
+            if not self._inbox:
+                self._reader.recv(1)
+        size = min(len(packet), len(buffer))
+        memoryview(buffer)[:size] = packet[:size]
+        return size, source
+
+    def close(self):
+        if self._address is not None:
+            self._network._unbind(self._address)
+        self._reader.close()
+        self._writer.close()
+
+    def _receive(self, packet, source):
+        with self._lock:
+            self._inbox.append((packet, source))
+            if len(self._inbox) == 1:
+                self._writer.send(b'\x00')
@@ -1,45 +1,244 @@
 import socket
 import select
 import threading
+import ctypes
+import ctypes.util
+import sys
 from btcp.constants import *
 
 
-# Continuously read from the socket and whenever a segment arrives,
-# call the lossy_layer_input method of the associated socket. 
-# When flagged, return from the function.
-def handle_incoming_segments(btcp_sock, event, udp_sock):
+# The recvmmsg and sendmmsg system calls read or write many datagrams at once, they are only used when the C library
+# provides them (Linux), otherwise the lossy layer falls back to one recvfrom_into or sendto per datagram.
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_IOVec)), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort), ('sin_port', ctypes.c_uint16),
+                ('sin_addr', ctypes.c_uint8 * 4), ('sin_zero', ctypes.c_uint8 * 8)]
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+# The preallocated message headers which describe a batch of datagrams to the system calls.
+class _Batch:
+
+    def __init__(self, size, native=True):
+        self._size = size
+        self.native = native and _libc is not None  # If the system calls can be used, only for real UDP sockets.
+        if self.native:
+            self._iovecs = (_IOVec * size)()
+            self._msgs = (_MMsgHdr * size)()
+            for index in range(size):
+                self._msgs[index].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[index])
+                self._msgs[index].msg_hdr.msg_iovlen = 1
+
+
+# Preallocated buffers to receive a batch of datagrams into.
+class _RecvBatch(_Batch):
+
+    def __init__(self, size, native=True, buffer_size=SEGMENT_SIZE):
+        super().__init__(size, native)
+        self._buffer_size = buffer_size             # The largest datagram which can be received.
+        self._buffers = [bytearray(buffer_size) for _ in range(size)]
+        self._views = [memoryview(buffer) for buffer in self._buffers]
+        if self.native:
+            self._names = (_SockAddrIn * size)()
+            self._addresses = [ctypes.addressof((ctypes.c_char * buffer_size).from_buffer(buffer))
+                               for buffer in self._buffers]
+            self._peers = {}  # The (ip, port) tuples of the raw source addresses seen before.
+
+    # Read all of the datagrams which are ready (at most the batch size) into the buffers, returns (view, address) for
+    # every datagram. The views are only valid until the next call, since the buffers are reused.
+    def recv(self, udp_sock):
+        if self.native:
+            for index in range(self._size):
+                self._iovecs[index].iov_base = self._addresses[index]
+                self._iovecs[index].iov_len = self._buffer_size
+                self._msgs[index].msg_hdr.msg_name = ctypes.addressof(self._names[index])
+                self._msgs[index].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+            received = _libc.recvmmsg(udp_sock.fileno(), self._msgs, self._size, socket.MSG_DONTWAIT, None)
+            if received < 0:
+                return []
+            return [(self._views[index][:self._msgs[index].msg_len], self._peer(self._names[index]))
+                    for index in range(received)]
+
+        segments = []
+        for view in self._views:
+            try:
+                size, address = udp_sock.recvfrom_into(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            segments.append((view[:size], address))
+        return segments
+
+    def _peer(self, name):
+        raw = bytes(name)[2:8]  # The port and the IPv4 address.
+        peer = self._peers.get(raw)
+        if peer is None:
+            peer = (socket.inet_ntoa(raw[2:]), int.from_bytes(raw[:2], byteorder='big'))
+            self._peers[raw] = peer
+        return peer
+
+
+# Describes a batch of datagrams to send, the iovecs point into the segments themselves so no buffers are allocated.
+class _SendBatch(_Batch):
+
+    # Send the segments (bytes or bytearray) to the address with one system call, returns the amount of segments which
+    # are send. The iovecs point directly into the segments, which are kept alive by the buffers list.
+    def send(self, udp_sock, segments, address):
+        name = _sockaddr(address)
+        buffers = [ctypes.c_char_p(segment) if isinstance(segment, bytes) else
+                   (ctypes.c_char * len(segment)).from_buffer(segment) for segment in segments]
+        for index, segment in enumerate(segments):
+            self._iovecs[index].iov_base = ctypes.cast(buffers[index], ctypes.c_void_p)
+            self._iovecs[index].iov_len = len(segment)
+            self._msgs[index].msg_hdr.msg_name = ctypes.addressof(name)
+            self._msgs[index].msg_hdr.msg_namelen = ctypes.sizeof(name)
+        return max(_libc.sendmmsg(udp_sock.fileno(), self._msgs, len(segments), 0), 0)
+
+
+def _sockaddr(address):
+    name = _SockAddrIn()
+    name.sin_family = socket.AF_INET
+    name.sin_port = socket.htons(address[1])
+    name.sin_addr[:] = socket.inet_aton(address[0])
+    return name
+
+
+_network = None
+
+
+def set_network(network=None):
+    """
+    Let the lossy layers which are created from now on use an emulated network instead of real UDP sockets.
+    :param network: A btcp.emulator.Network, or None to use real UDP sockets again.
+    """
+    global _network
+    _network = network
+
+
+# Continuously read from the socket and whenever segments arrive,
+# call the lossy_layer_input method of the associated socket for every segment, with the address it came from.
+# All of the segments which are ready are read at once, into preallocated buffers which are reused, so
+# lossy_layer_input has to copy the data it keeps.
+# After every wakeup the lossy_layer_tick method of the associated socket is called,
+# which returns the amount of seconds until it wants to be called again (or None).
+# When flagged, return from the function, the wake socket interrupts the select immediately (also to call
+# lossy_layer_tick on behalf of another thread).
+def handle_incoming_segments(btcp_sock, event, udp_sock, wake_sock, segment_size=SEGMENT_SIZE):
+    batch = _RecvBatch(RECV_BATCH_SIZE, isinstance(udp_sock, socket.socket), segment_size)
+    timeout = None
     while not event.is_set():
-        # We do not block here, because we might never check the loop condition in that case
-        rlist, wlist, elist = select.select([udp_sock], [], [], 1)
-        if rlist:
-            segment, client = udp_sock.recvfrom(SEGMENT_SIZE)
-            btcp_sock.lossy_layer_input(segment)
+        rlist, wlist, elist = select.select([udp_sock, wake_sock], [], [], timeout)
+        if udp_sock in rlist:
+            for segment, address in batch.recv(udp_sock):
+                btcp_sock.lossy_layer_input(segment, address)
+        if wake_sock in rlist:
+            wake_sock.recv(4096)
+        timeout = btcp_sock.lossy_layer_tick()
+        if timeout is not None:
+            timeout = max(timeout, 0)
 
 
-# The lossy layer emulates the network layer in that it provides bTCP with 
-# an unreliable segment delivery service between a and b. When the lossy layer is created, 
-# a thread is started that calls handle_incoming_segments. 
+# The lossy layer emulates the network layer in that it provides bTCP with
+# an unreliable segment delivery service between a and b. When the lossy layer is started,
+# a thread is started that calls handle_incoming_segments. Without b, segments can only be send to explicit addresses,
+# as a server does which accepts segments from many clients. The segment size is the largest segment it receives.
 class LossyLayer:
 
-    def __init__(self, btcp_sock, a_ip, a_port, b_ip, b_port):
+    def __init__(self, btcp_sock, a_ip, a_port, b_ip=None, b_port=None, segment_size=SEGMENT_SIZE):
         self._btcp_sock = btcp_sock
-        self._b_ip = b_ip
-        self._b_port = b_port
+        self._b_address = (socket.gethostbyname(b_ip), b_port) if b_ip is not None else None
 
-        self._udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if _network is None else _network.socket()
+        if a_port != 0:  # Reusing the address would let the system pick a port which is already in use.
+            self._udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self._udp_sock.bind((a_ip, a_port))
+        self._udp_sock.setblocking(False)
+        if segment_size > SEGMENT_SIZE:  # Let the system buffer a whole receive batch of large segments.
+            self._udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BATCH_SIZE * segment_size)
+
+        self._send_batch = _SendBatch(SEND_BATCH_SIZE, _network is None)
+        self._send_lock = threading.Lock()  # The send batch headers are shared between the sending threads.
 
         self._event = threading.Event()
-        self._thread = threading.Thread(target=handle_incoming_segments, args=(self._btcp_sock, self._event, self._udp_sock))
+        self._wake_sock, self._wake_sock_write = socket.socketpair()
+        self._thread = threading.Thread(target=handle_incoming_segments,
+                                        args=(self._btcp_sock, self._event, self._udp_sock, self._wake_sock,
+                                              segment_size))
+
+    # Start delivering the segments, once the bTCP socket is ready to handle them and to send replies.
+    def start(self):
         self._thread.start()
 
-    # Flag the thread that it can stop and close the socket.
+    # Flag the thread that it can stop, wake it up and close the sockets.
     def destroy(self):
         self._event.set()
+        self._wake_sock_write.send(b'\x00')
         self._thread.join()
         self._udp_sock.close()
+        self._wake_sock.close()
+        self._wake_sock_write.close()
+
+    # The (ip, port) the socket is bound to, the port is chosen by the system when bound to port 0.
+    @property
+    def address(self):
+        return self._udp_sock.getsockname()
+
+    # Let the thread call lossy_layer_tick as soon as possible, can be called from any thread.
+    def wake(self):
+        self._wake_sock_write.send(b'\x00')
+
+    # Put the segment into the network, to b or to the given (ip, port) address.
+    def send_segment(self, segment, address=None):
+        self._send(self._udp_sock.sendto, segment, address or self._b_address)
+
+    # Put many segments into the network at once
+    def send_segments(self, segments, address=None):
+        if not self._send_batch.native or len(segments) <= 1:
+            for segment in segments:
+                self.send_segment(segment, address)
+            return
+
+        sent = 0
+        with self._send_lock:
+            while sent < len(segments):
+                batch = segments[sent:sent + SEND_BATCH_SIZE]
+                result = self._send_batch.send(self._udp_sock, batch, address or self._b_address)
+                if result == 0:  # The send buffer is full, send one segment which waits until it is writable.
+                    self.send_segment(batch[0], address)
+                    result = 1
+                sent += result
 
-    # Put the segment into the network
-    def send_segment(self, segment):
-        self._udp_sock.sendto(segment, (self._b_ip, self._b_port))
+    # The socket is non-blocking, wait until it is writable when its send buffer is full.
+    def _send(self, sendto, segment, address):
+        while True:
+            try:
+                return sendto(segment, address)
+            except BlockingIOError:
+                select.select([], [self._udp_sock], [], 1)
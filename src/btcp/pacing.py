@@ -0,0 +1,45 @@
+from btcp.constants import *
+
+
+# A token bucket which spreads the segments of a window over the round-trip time instead of sending them in one burst.
+# A token is needed for every segment, the tokens fill up at the pacing rate to at most a small burst. The rate follows
+# the window: PACING_GAIN times the window per smoothed round-trip time, optionally capped by a fixed rate limit. The
+# sender asks for the available tokens before sending and sleeps until the next token is released when it ran out.
+class Pacer:
+
+    def __init__(self, adaptive=True, rate_limit=None, burst=PACING_BURST):
+        self._adaptive = adaptive      # If the rate follows the window and the round-trip time.
+        self._rate_limit = rate_limit  # The maximum rate in bytes per second, None for no limit.
+        self._burst = burst            # The maximum amount of tokens, the segments which may be send back-to-back.
+        self._tokens = burst
+        self._time = None              # The time the tokens were last filled up.
+        self.rate = None               # The current rate in segments per second, None while the rate is unknown.
+
+    # Derive the rate from the window in segments and the smoothed round-trip time in seconds (None if unknown), the
+    # rate limit is converted with the size of the segments.
+    def update(self, window, srtt, segment_size=SEGMENT_SIZE):
+        rate = PACING_GAIN * window / srtt if self._adaptive and srtt else None
+        if self._rate_limit is not None:
+            limit = self._rate_limit / segment_size
+            rate = limit if rate is None else min(rate, limit)
+        self.rate = rate
+
+    # The amount of segments which may be send now.
+    def available(self, now):
+        if self.rate is None:
+            return float('inf')
+        if self._time is not None:
+            self._tokens = min(self._tokens + (now - self._time) * self.rate, self._burst)
+        self._time = now
+        return int(self._tokens)
+
+    # Take the tokens of the segments which are send.
+    def consume(self, count):
+        if self.rate is not None:
+            self._tokens -= count
+
+    # The time at which the next token is available.
+    def release(self, now):
+        if self.rate is None or self._tokens >= 1:
+            return now
+        return now + (1 - self._tokens) / self.rate
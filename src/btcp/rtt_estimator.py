@@ -0,0 +1,34 @@
+from btcp.constants import *
+
+
+# Estimate the round-trip time and the retransmission timeout (RTO) of a connection as defined by RFC 6298. Samples
+# should only be taken from segments which are not retransmitted (Karn's algorithm), the RTO is doubled on every
+# timeout until a new sample is taken.
+class RTTEstimator:
+
+    ALPHA = 1 / 8  # The gain for the smoothed round-trip time.
+    BETA  = 1 / 4  # The gain for the round-trip time variation.
+    K     = 4      # The weight of the round-trip time variation in the RTO.
+
+    def __init__(self, initial_rto):
+        self.srtt   = None                      # The smoothed round-trip time in seconds, None until the first sample.
+        self.rttvar = None                      # The round-trip time variation in seconds.
+        self.rto    = self._bound(initial_rto)  # The current retransmission timeout in seconds.
+
+    # Update the estimation with a newly measured round-trip time in seconds.
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.rto = self._bound(self.srtt + self.K * self.rttvar)
+
+    # Exponentially back off the RTO after a timeout.
+    def backoff(self):
+        self.rto = self._bound(self.rto * 2)
+
+    @staticmethod
+    def _bound(rto):
+        return min(max(rto, MIN_RTO), MAX_RTO)
@@ -1,97 +1,510 @@
 from btcp.lossy_layer import LossyLayer
 from btcp.constants import *
-from btcp.btcp_socket import ascii_to_bytes, bytes_to_ascii, merge_segments
+from btcp.btcp_socket import control_segment, parse_segment, sack_to_bytes, seq_add, seq_diff, options_to_bytes, \
+    bytes_to_options
+from btcp.stats import ConnectionStats
+from btcp.compression import Compressor, compression_method
+import time
 import random
 import threading
+import collections
+import queue
 
 
-# A server application makes use of the services provided by bTCP by calling accept, recv, and close.
+# A server application makes use of the services provided by bTCP by calling accept, recv, and close. The server
+# socket listens on one UDP port for many clients: the segments are demultiplexed by their source address into a
+# BTCPServerConnection per client, every accept returns the next established connection. The payload size is the
+# largest payload the server accepts, a client which offers larger segments is lowered to it. With compression the
+# server agrees to the compression method a client offers, when it is supported. The resume offer is the (offset,
+# SHA-256 digest) of the prefix of a stream the server already has, it is offered to the clients which can resume. The
+# stream of a client which does not send anything for the idle timeout is ended, so a client which is gone without a
+# FIN does not keep its connection forever.
 class BTCPServerSocket:
 
-    def __init__(self, window_size):
-        self._lossy_layer = LossyLayer(self, SERVER_IP, SERVER_PORT, CLIENT_IP, CLIENT_PORT)
+    def __init__(self, window_size, ack_every=ACK_EVERY, ack_delay=ACK_DELAY, address=(SERVER_IP, SERVER_PORT),
+                 payload_size=PAYLOAD_SIZE, compression=True, resume=None, idle_timeout=IDLE_TIMEOUT):
+        if payload_size < 1 or payload_size > MAX_PAYLOAD_SIZE:
+            raise ValueError("The payload size is out of range: {}.".format(payload_size))
+        self._payload_size = payload_size
+        self._compression = compression
+        self._resume = resume
+        self._idle_timeout = idle_timeout
 
-        self._window_size = window_size  # The window size of this server.
+        self._window_size = window_size  # The window size for every connection.
+        self._ack_every = ack_every      # The amount of in-order segments after which an ACK is send at the latest.
+        self._ack_delay = ack_delay      # The time in seconds after which a delayed ACK is send at the latest.
+
+        # Variables for the connections, only used from the lossy layer thread.
+        self._connections = {}           # The connections by the (ip, port) address of the client.
+        self._delayed = set()            # The connections with a delayed ACK, checked on every tick.
+        self._updates = collections.deque()  # The connections with a window update, filled by the application.
+        self._terminated = collections.OrderedDict()  # The (SYN, FIN) sequence numbers of recently terminated
+                                                      # connections by address, to answer their retransmissions.
+        self._idle_check = None          # The time of the next check for idle connections, None without connections.
+
+        self._accepted = self._create_queue()  # The established connections which are not accepted yet.
+        self._connection = None          # The connection returned by the last accept.
+
+        # The statistics of all of the traffic on the port (every connection has its own statistics as well), and a
+        # Tracer to record a timeline of the segments of all connections (None to disable it).
+        self.stats = ConnectionStats()
+        self.tracer = None
+
+        # The lossy layer is started last, its thread may deliver a waiting segment right away. An asyncio server
+        # creates its endpoint later, on the running loop.
+        self._lossy_layer = self._create_lossy_layer(address)
+        if self._lossy_layer is not None:
+            self._lossy_layer.start()
+
+    # Called by the lossy layer from another thread whenever a segment arrives, the segment is a view of the receive
+    # buffer of the lossy layer so the data is copied once when it is kept.
+    def lossy_layer_input(self, segment, address):
+        self.stats.segments_received += 1
+        self.stats.bytes_received += len(segment)
+        try:
+            segment = parse_segment(segment)
+        except ValueError:  # Incorrect checksum or data length.
+            self.stats.checksum_failures += 1
+            return
+
+        connection = self._connections.get(address)
+        if connection is None:
+            terminated = self._terminated.get(address)
+            if segment.flags & FLAG_SYN and not segment.flags & FLAG_ACK:
+                if terminated is not None and terminated[0] == segment.seq_num:
+                    return  # A late retransmission of the SYN of a connection which is already terminated.
+                connection = self._create_connection(address)
+                self._connections[address] = connection
+            elif segment.flags & FLAG_FIN and terminated is not None and terminated[1] == segment.seq_num:
+                # A retransmitted FIN of a terminated connection, the FIN-ACK was probably lost so send it again. A
+                # FIN of an unknown connection is not answered, it may have overtaken the SYN and the data.
+                segment = control_segment(0, seq_add(segment.seq_num, 1), FLAG_ACK | FLAG_FIN, 0)
+                self._send_segment(segment, address)
+                return
+            else:
+                return
+
+        connection.lossy_layer_input(segment)
+        if connection.finished:
+            del self._connections[address]
+            self._delayed.discard(connection)
+            self._terminated[address] = (connection._isn, connection._fin_seq)
+            if len(self._terminated) > TERMINATED_CONNECTIONS:
+                self._terminated.popitem(last=False)
+
+    # Called by the lossy layer after every wakeup, send the window updates and the delayed ACKs which are due.
+    def lossy_layer_tick(self):
+        while self._updates:
+            connection = self._updates.popleft()
+            if not connection.finished:
+                connection.stats.window_updates += 1
+                connection._send_ack()
+
+        now = time.monotonic()
+        timeout = self._reap_idle(now)
+        for connection in list(self._delayed):
+            remaining = connection.tick(now)
+            if remaining is None:
+                self._delayed.discard(connection)
+            elif timeout is None or remaining < timeout:
+                timeout = remaining
+        return timeout
+
+    # End the connections which did not receive anything for the idle timeout. The connections are checked once per
+    # idle timeout, so an idle connection ends after one to two idle timeouts. Returns the amount of seconds until the
+    # next check, or None without connections.
+    def _reap_idle(self, now):
+        if not self._connections:
+            self._idle_check = None
+            return None
+        if self._idle_check is None:
+            self._idle_check = now + self._idle_timeout
+        elif now >= self._idle_check:
+            for address, connection in list(self._connections.items()):
+                if now - connection._last_input >= self._idle_timeout:
+                    del self._connections[address]
+                    self._delayed.discard(connection)
+                    connection._abort()
+            self._idle_check = now + self._idle_timeout
+        return self._idle_check - now
+
+    # The (ip, port) the server is bound to, the port is chosen by the system when bound to port 0.
+    @property
+    def address(self):
+        return self._lossy_layer.address
+
+    # Wait for a client to initiate a three-way handshake, returns the established connection. With a timeout in seconds
+    # None is returned when no connection is established in time.
+    def accept(self, timeout=None):
+        try:
+            self._connection = self._accepted.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return self._connection
+
+    # Send any incoming data of the last accepted connection to the application layer, returns all of the data once
+    # the connection is terminated.
+    def recv(self):
+        return self._connection.recv()
+
+    # Read the in-order data of the last accepted connection as soon as it is received into the buffer.
+    def recv_into(self, buffer):
+        return self._connection.recv_into(buffer)
+
+    # Iterate over the in-order data of the last accepted connection as soon as it is received.
+    def __iter__(self):
+        return iter(self._connection)
+
+    # Clean up any state
+    def close(self):
+        self._lossy_layer.destroy()
+
+    # The lossy layer with its own thread which delivers the segments from all of the clients. A fast open client sends
+    # segments with the default payload size before it learns the payload size of the server, so the receive buffers
+    # always take those.
+    def _create_lossy_layer(self, address):
+        return LossyLayer(self, *address, segment_size=HEADER_SIZE + max(self._payload_size, PAYLOAD_SIZE))
+
+    # The state for a new connection with the client at the address.
+    def _create_connection(self, address):
+        return BTCPServerConnection(self, address, self._window_size, self._ack_every, self._ack_delay,
+                                    self._payload_size, self._compression)
+
+    # A queue for the established connections, filled from the lossy layer thread.
+    def _create_queue(self):
+        return queue.Queue()
+
+    # Let the lossy layer send a window update for the connection, called by the application.
+    def _request_window_update(self, connection):
+        self._updates.append(connection)
+        self._lossy_layer.wake()
+
+    # Put a segment of one of the connections into the network.
+    def _send_segment(self, segment, address):
+        self.stats.segments_sent += 1
+        self.stats.bytes_sent += len(segment)
+        self._lossy_layer.send_segment(segment, address)
+
+
+# The state of the connection with one client, the segments are passed in by the server socket from the lossy layer
+# thread and the application reads the data with recv, recv_into or by iterating over the connection.
+class BTCPServerConnection:
+
+    def __init__(self, listener, address, window_size, ack_every=ACK_EVERY, ack_delay=ACK_DELAY,
+                 payload_size=PAYLOAD_SIZE, compression=True):
+        self._listener = listener        # The server socket which received the SYN.
+        self.address = address           # The (ip, port) address of the client.
+        self._window_size = min(window_size, 0xff << MAX_WINDOW_SCALE)  # The receive buffer in segments.
+        self._window_scale = 0           # The shift applied to the window size field, agreed during establishment.
+        self._max_payload = payload_size  # The largest payload this server accepts.
+        self.payload_size = PAYLOAD_SIZE  # The payload size of the client, agreed during establishment.
+        self._compression = compression   # If the server agrees to compress the data segments.
+        self._decompressor = None         # The decompressor of the data segments, agreed during establishment.
+        self._resume = None               # The resume offer send to the client, None if it cannot resume.
         self._seq_num_server = None      # The sequence number for this server (practically ignored).
         self._seq_num_client = None      # The sequence number from the client (practically ignored).
+        self._isn = None                 # The initial sequence number of the client.
+        self._fin_seq = None             # The sequence number of the FIN of the client.
+        self._last_input = time.monotonic()  # The time the last segment of the client arrived.
+
+        # Variables for receiving data from the client, only used from the lossy layer thread.
+        self._expected = None            # The sequence number of the next in-order segment.
+        self._delivered = 0              # The amount of in-order segments, not wrapped like the sequence numbers.
+        self._out_of_order = None        # The payloads of received segments after a hole, by sequence number.
 
-        # Variables for receiving data from the client.
-        self._recv_data = None           # A variable to check if we are already handling the receiving data.
-        self._data = None                # Tuples with (seq_num, data bytes) which are received.
-        self._buffer = None              # Contains sequence numbers which need to be send back an ACK for.
+        # Variables for delivering the data to the application, protected by the condition. The window advertised to
+        # the client is the part of the receive buffer which is not taken by unread payloads.
+        self._ready = collections.deque()         # The in-order payloads which are not read by the application yet.
+        self._condition = threading.Condition()   # Signals the application when data is ready or the stream ended.
+        self._advertised = 0                      # The window in segments advertised by the last ACK.
+        self._update_requested = False            # If a window update is requested since the last ACK.
+
+        # Variables for the (delayed) acknowledgements.
+        self._ack_every = ack_every      # The amount of in-order segments after which an ACK is send at the latest.
+        self._ack_delay = ack_delay      # The time in seconds after which a delayed ACK is send at the latest.
+        self._unacked = 0                # The amount of in-order segments which are not ACKed yet.
+        self._ack_deadline = None        # The time at which the delayed ACK has to be send.
 
         # Variables for the connection establishment phase.
-        self._connected_flag = None      # An event to signify when the connection is established.
+        self._connected_flag = threading.Event()  # An event to signify when the connection is established.
 
         # Variables for the connection termination phase.
-        self._finished_flag = None       # An event to signify when the connection is finished.
+        self._finished_flag = threading.Event()   # An event to signify when the connection is finished.
+
+        # The statistics of this connection, the duplicates are data segments which were already received.
+        self.stats = ConnectionStats()
 
-    # Called by the lossy layer from another thread whenever a segment arrives
+    # Called by the server socket from the lossy layer thread for every parsed segment of this client, the data is a
+    # view of the receive buffer of the lossy layer so it is copied once when it is kept.
     def lossy_layer_input(self, segment):
+        self._last_input = time.monotonic()
+        self.stats.segments_received += 1
+        self.stats.bytes_received += HEADER_SIZE + len(segment.data)
         try:
-            seq_num, ack_num, flags, window_size, data = bytes_to_ascii(segment)
-            if   flags[0]:  # ACK
-                self._handle_ack(seq_num, ack_num)
-            elif flags[1]:  # SYN
-                self._handle_syn(seq_num)
-            elif flags[2]:  # FIN
-                self._handle_fin()
+            if   segment.flags & FLAG_ACK:  # ACK
+                self._handle_ack(segment.seq_num, segment.ack_num)
+            elif segment.flags & FLAG_SYN:  # SYN
+                self._handle_syn(segment.seq_num, segment.data)
+            elif segment.flags & FLAG_FIN:  # FIN
+                self._handle_fin(segment.seq_num)
             else:  # DATA
-                if not self._connected_flag.is_set(): self._connected_flag.set()
-                self._handle_data(seq_num, data)
-        except ValueError:  # Incorrect checksum or data length.
+                self._handle_data(segment.seq_num, segment.data, segment.flags)
+        except ValueError:  # Incorrect options or compressed data.
             pass
 
-    # Wait for the client to initiate a three-way handshake
-    def accept(self):
-        self._connected_flag = threading.Event()
-        self._connected_flag.wait()
+    # Called by the server socket after every wakeup while a delayed ACK is pending, send it when it is due. Returns the
+    # amount of seconds until it is due, or None when no ACK is pending anymore.
+    def tick(self, now):
+        if self._ack_deadline is None:
+            return None
+        remaining = self._ack_deadline - now
+        if remaining <= 0:
+            self._send_ack()
+            return None
+        return remaining
+
+    # If the connection is terminated by the client.
+    @property
+    def finished(self):
+        return self._finished_flag.is_set()
 
-    # Send any incoming data to the application layer
+    # If the resume offer of the server is send to the client, so the stream starts with the offset it resumes at.
+    @property
+    def resumed(self):
+        return self._resume is not None
+
+    # Send any incoming data to the application layer, returns all of the data once the connection is terminated.
     def recv(self):
-        self._finished_flag = threading.Event()
-        self._data = []
-        self._buffer = []
+        return b''.join(self).decode()
 
-        # Try to empty the buffer all the time, i.e. send ACKs back for received segments.
-        self._handle_buffer()
+    # Read the in-order data as soon as it is received into the buffer, returns the amount of bytes read or 0 when the
+    # connection is terminated and all data is read.
+    def recv_into(self, buffer):
+        with self._condition:
+            self._condition.wait_for(self._readable)
+            return self._read_into(memoryview(buffer).cast('B'))
 
-        # Remove duplicates from the segments received and merge them together.
-        data = list(set(self._data))
-        data = merge_segments(data)
-        return data.decode()
+    # Iterate over the in-order data as soon as it is received, until the connection is terminated.
+    def __iter__(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(self._readable)
+                chunks = self._read_chunks()
+            if not chunks:
+                return
+            yield from chunks
 
-    # Clean up any state
-    def close(self):
-        self._lossy_layer.destroy()
+    # If there is data to read or the connection is terminated.
+    def _readable(self):
+        return self._ready or self._finished_flag.is_set()
+
+    # Move the ready data into the view, returns the amount of bytes read.
+    def _read_into(self, view):
+        read = 0
+        while self._ready and read < len(view):
+            chunk = self._ready.popleft()
+            size = min(len(chunk), len(view) - read)
+            view[read:read + size] = chunk[:size]
+            if size < len(chunk):
+                self._ready.appendleft(memoryview(chunk)[size:])
+            read += size
+        self._window_opened()
+        return read
+
+    # Take all of the ready data, an empty list means the connection is terminated.
+    def _read_chunks(self):
+        chunks = list(self._ready)
+        self._ready.clear()
+        self._window_opened()
+        return chunks
+
+    # The amount of segments the receive buffer can still take.
+    def _free_window(self):
+        return max(self._window_size - len(self._ready), 0)
+
+    # Request a window update after a read once the window grew by half of the buffer since it was advertised, so the
+    # client learns about the space without a window update for every read (silly window syndrome).
+    def _window_opened(self):
+        if not self._update_requested and not self.finished \
+                and self._free_window() - self._advertised >= (self._window_size + 1) // 2:
+            self._update_requested = True
+            self._listener._request_window_update(self)
+
+    # Wake up the application, must be called while holding the condition.
+    def _notify(self):
+        self._condition.notify_all()
 
-    def _handle_syn(self, seq_num):
-        self._seq_num_client = seq_num
-        self._seq_num_server = random.randint(0, 255)
-        segment = ascii_to_bytes(self._seq_num_server, seq_num + 1, [True, True, False], self._window_size, b'')
-        self._lossy_layer.send_segment(segment)
+    def _handle_syn(self, seq_num, data):
+        if self._seq_num_client != seq_num:  # Not a retransmission of the SYN, start a new connection.
+            self._seq_num_client = seq_num
+            self._isn = seq_num
+            self._seq_num_server = random.randint(0, 255)
+            self._expected = seq_add(seq_num, 1)
+            self._delivered = 0
+            self._out_of_order = {}
+            self.stats.enter('connect')
+
+            # Only scale the window if the client supports it, otherwise advertise at most 255 segments.
+            client_options = bytes_to_options(data)
+            self._window_scale = 0
+            if OPTION_WINDOW_SCALE in client_options:
+                while self._window_size >> self._window_scale > 0xff:
+                    self._window_scale += 1
+
+            # Without the payload size option the client sends at most the default payload size.
+            self.payload_size = min(PAYLOAD_SIZE, self._max_payload)
+            if OPTION_PAYLOAD_SIZE in client_options:
+                self.payload_size = max(min(int.from_bytes(client_options[OPTION_PAYLOAD_SIZE], byteorder='big'),
+                                            self._max_payload), 1)
+
+            # Echo the compression option of the client when its method is supported.
+            self._decompressor = None
+            method = compression_method(client_options[OPTION_COMPRESSION][0]) \
+                if self._compression and client_options.get(OPTION_COMPRESSION) else None
+            if method is not None:
+                self._decompressor = Compressor(method, stats=self.stats)
+
+            # Offer the prefix the server already has when the client can resume.
+            self._resume = self._listener._resume if OPTION_RESUME in client_options else None
+
+        self._advertised = self._window_size
+        options = {OPTION_WINDOW_SCALE: bytes([self._window_scale]),
+                   OPTION_PAYLOAD_SIZE: self.payload_size.to_bytes(2, byteorder='big')}
+        if self._decompressor is not None:
+            options[OPTION_COMPRESSION] = self._decompressor.option
+        if self._resume is not None:
+            offset, digest = self._resume
+            options[OPTION_RESUME] = offset.to_bytes(8, byteorder='big') + digest
+        segment = control_segment(self._seq_num_server, seq_add(seq_num, 1), FLAG_ACK | FLAG_SYN,
+                                 self._advertised_window(self._window_size), options_to_bytes(options))
+        self._send_segment(segment)
 
     def _handle_ack(self, seq_num, ack_num):
-        if seq_num == self._seq_num_client + 1 and ack_num == self._seq_num_server + 1:
-            self._seq_num_client += 1
-            self._seq_num_server += 1
+        if self._seq_num_client is None:  # No SYN is received (yet).
+            return
+        if seq_num == seq_add(self._seq_num_client, 1) and ack_num == seq_add(self._seq_num_server, 1):
+            self._seq_num_client = seq_add(self._seq_num_client, 1)
+            self._seq_num_server = seq_add(self._seq_num_server, 1)
+            self._establish()
+
+    # Hand the connection to accept once it is established.
+    def _establish(self):
+        if not self._connected_flag.is_set():
+            self.stats.enter('transfer')
             self._connected_flag.set()
+            self._listener._accepted.put_nowait(self)
+
+    def _handle_fin(self, seq_num):
+        # The FIN follows the last segment, or the send base of a client which gave up on its data: the stream ends
+        # there. A pipelined FIN after missing data is answered once the data arrived. A FIN before the first segment
+        # is a late FIN of an earlier connection from the same address. The sequence numbers wrap, so the distance to
+        # the next in-order segment is compared with the unwrapped amount of delivered segments.
+        if self._expected is None:
+            return
+        behind = seq_diff(self._expected, seq_num)
+        if behind < 0 or behind > self._delivered:
+            return
+        # With fast open the FIN can arrive before the ACK of the handshake, the connection is still accepted.
+        self._establish()
+        self._fin_seq = seq_num
+        self._out_of_order.clear()
+        segment = control_segment(0, seq_add(seq_num, 1), FLAG_ACK | FLAG_FIN, 0)
+        self._send_segment(segment)
+        self._abort()
+
+    # End the stream, after the FIN or when the client is gone.
+    def _abort(self):
+        self.stats.leave()
+        with self._condition:
+            self._finished_flag.set()
+            self._notify()
+
+    def _handle_data(self, seq_num, data, flags=0):
+        if self._expected is None:  # No SYN is received (yet).
+            return
+        self._establish()
+
+        distance = seq_diff(seq_num, self._expected)
+        tracer = self._listener.tracer
+        if tracer is not None:
+            tracer.record('data', self.address, seq_num, distance)
+        if 0 <= distance and distance >= self._free_window():
+            # The receive buffer is full, the segment is beyond the window (or a zero window probe) so drop it.
+            self._send_ack()
+        elif distance == 0:
+            # Deliver the segment and all of the segments directly following it to the application.
+            payload = self._payload(data, flags)
+            with self._condition:
+                self._ready.append(payload)
+                self._expected = seq_add(self._expected, 1)
+                self._delivered += 1
+                while self._expected in self._out_of_order:
+                    self._ready.append(self._out_of_order.pop(self._expected))
+                    self._expected = seq_add(self._expected, 1)
+                    self._delivered += 1
+                self._notify()
+
+            # A segment that fills a hole is ACKed immediately, others are ACKed every ack_every segments.
+            self._unacked += 1
+            if self._unacked >= self._ack_every or self._out_of_order or seq_add(seq_num, 1) != self._expected:
+                self._send_ack()
+            elif self._ack_deadline is None:
+                self._ack_deadline = time.monotonic() + self._ack_delay
+                self._listener._delayed.add(self)
+        elif distance > 0:
+            # A hole in the received segments, ACK immediately so the client knows which segments are missing.
+            if seq_num in self._out_of_order:
+                self.stats.duplicates_received += 1
+            self._out_of_order[seq_num] = self._payload(data, flags)
+            self._send_ack()
+        else:
+            # A duplicate, the ACK was probably lost so ACK again.
+            self.stats.duplicates_received += 1
+            self._send_ack()
+
+    # The data of a segment as bytes, decompressed when it is compressed.
+    def _payload(self, data, flags):
+        if self._decompressor is None:
+            if flags & FLAG_COMPRESSED:
+                raise ValueError("The segment is compressed without an agreed compression method.")
+            return bytes(data)
+        if flags & FLAG_COMPRESSED:
+            return self._decompressor.decompress(data, self.payload_size * MAX_COMPRESSION_FACTOR)
+        self.stats.compression_input += len(data)  # A segment the client did not compress.
+        self.stats.compression_output += len(data)
+        return bytes(data)
+
+    # The ranges of received segments after the first hole.
+    def _sack_ranges(self):
+        ranges = []
+        for seq_num in sorted(self._out_of_order, key=lambda seq_num: seq_diff(seq_num, self._expected)):
+            if ranges and seq_add(ranges[-1][1], 1) == seq_num:
+                ranges[-1][1] = seq_num
+            else:
+                ranges.append([seq_num, seq_num])
+        return ranges
+
+    # Send a cumulative ACK for the highest in-order segment, with the selective acknowledgements as data.
+    def _send_ack(self):
+        self._unacked = 0
+        self._ack_deadline = None
+        window_size = self._free_window()
+        self._advertised = window_size
+        self._update_requested = False
+        self.stats.window(window_size)
+        segment = control_segment(0, seq_add(self._expected, -1), FLAG_ACK,
+                                 self._advertised_window(window_size), sack_to_bytes(self._sack_ranges()))
+        self._send_segment(segment)
+        tracer = self._listener.tracer
+        if tracer is not None:
+            tracer.record('ack', self.address, seq_add(self._expected, -1), window_size, len(self._out_of_order))
+
+    # Put a segment to the client into the network and count it.
+    def _send_segment(self, segment):
+        self.stats.segments_sent += 1
+        self.stats.bytes_sent += len(segment)
+        self._listener._send_segment(segment, self.address)
 
-    def _handle_fin(self):
-        segment = ascii_to_bytes(0, 0, [True, False, True], 0, b'')
-        self._lossy_layer.send_segment(segment)
-        self._finished_flag.set()
-
-    def _handle_data(self, seq_num, data):
-        if self._recv_data:
-            self._buffer.append(seq_num)
-            self._data.append((seq_num, data))
-
-    def _handle_buffer(self):
-        self._recv_data = True
-        while not self._finished_flag.is_set():
-            if self._buffer:
-                seq_num = self._buffer.pop(0)
-                segment = ascii_to_bytes(0, seq_num, [True, False, False], max(self._window_size - len(self._buffer), 0), b'')
-                self._lossy_layer.send_segment(segment)
-        self._recv_data = False
+    # The value of the window size field for a window of the given amount of segments.
+    def _advertised_window(self, window_size):
+        return min(window_size >> self._window_scale, 0xff)
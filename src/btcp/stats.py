@@ -0,0 +1,88 @@
+from btcp.constants import *
+import collections
+import sys
+import time
+
+
+# The counters of one connection, like tcp_info. The sockets update them on every segment, the application can read
+# them at any time (they are not synchronized, so a read during a transfer is approximate).
+class ConnectionStats:
+
+    def __init__(self):
+        self.segments_sent = 0         # All of the segments put into the network, including retransmissions.
+        self.bytes_sent = 0
+        self.segments_received = 0     # All of the segments which arrived, including invalid ones.
+        self.bytes_received = 0
+        self.fast_retransmits = 0      # Retransmissions because duplicate or selective ACKs showed a segment is lost.
+        self.timeout_retransmits = 0   # Retransmissions because the retransmission timeout expired.
+        self.duplicates_received = 0   # Duplicate data segments (server) or duplicate ACKs (client).
+        self.checksum_failures = 0     # Segments dropped because the checksum or the data length is wrong.
+        self.window_probes = 0         # Zero window probes (client).
+        self.window_updates = 0        # ACKs send only to announce that the window opened again (server).
+        self.compression_input = 0     # The data bytes of the data segments before compression.
+        self.compression_output = 0    # The payload bytes of the data segments after compression.
+        self.compression_time = 0      # The CPU seconds spent on (de)compression.
+        self.rtt_samples = 0           # The amount of round-trip time samples, with the latest and smallest one.
+        self.last_rtt = None
+        self.min_rtt = None
+        self.windows = collections.deque(maxlen=STATS_WINDOW_SAMPLES)  # (time, window) whenever the window changes.
+        self.phases = {}               # The seconds spent in every phase of the connection by name.
+        self._phase = None             # The current phase with its start time.
+
+    # Record a round-trip time sample in seconds.
+    def rtt(self, sample):
+        self.rtt_samples += 1
+        self.last_rtt = sample
+        if self.min_rtt is None or sample < self.min_rtt:
+            self.min_rtt = sample
+
+    # Record the window in segments (the effective window for the client, the advertised one for the server).
+    def window(self, window):
+        if not self.windows or self.windows[-1][1] != window:
+            self.windows.append((time.monotonic(), window))
+
+    # The data bytes per payload byte on the wire, None before any data segment.
+    @property
+    def compression_ratio(self):
+        return self.compression_input / self.compression_output if self.compression_output else None
+
+    # Start a phase, like connect, transfer or disconnect, which ends the previous phase.
+    def enter(self, phase):
+        now = time.monotonic()
+        self.leave(now)
+        self._phase = (phase, now)
+
+    # End the current phase, or only the given phase when it is the current one.
+    def leave(self, now=None, phase=None):
+        if self._phase is not None and (phase is None or self._phase[0] == phase):
+            phase, start = self._phase
+            self.phases[phase] = self.phases.get(phase, 0) + (now or time.monotonic()) - start
+            self._phase = None
+
+    # All of the counters as a dictionary.
+    def as_dict(self):
+        counters = {name: (list(value) if name == 'windows' else value) for (name, value) in vars(self).items()
+                    if not name.startswith('_')}
+        counters['compression_ratio'] = self.compression_ratio
+        return counters
+
+
+# A ring buffer with the latest events of a connection, which can be dumped as a per-segment timeline after a
+# transfer. A socket only records events when a tracer is set, so the tracing costs nothing when it is disabled.
+class Tracer:
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.events = collections.deque(maxlen=capacity)  # Tuples with (time, event, values...).
+
+    def record(self, event, *values):
+        self.events.append((time.monotonic(), event) + values)
+
+    # Write the timeline, with the times relative to the first event in milliseconds.
+    def dump(self, file=None):
+        file = file or sys.stdout
+        if not self.events:
+            return
+        start = self.events[0][0]
+        for event in self.events:
+            file.write("{:>10.3f} {:<10} {}\n".format((event[0] - start) * 1000, event[1],
+                                                      " ".join(str(value) for value in event[2:])))
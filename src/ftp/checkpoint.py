@@ -0,0 +1,140 @@
+from ftp.striping import STRIPE_HEADER
+import hashlib
+import json
+import os
+
+
+CHECKPOINT_INTERVAL = 1 << 20  # The amount of bytes received after which the next checkpoint is persisted.
+_BLOCK_SIZE = 1 << 16          # The amount of bytes hashed at once when a prefix is verified.
+
+
+def checkpoint_path(output):
+    """
+    :return: The path of the checkpoint which belongs to the output file.
+    """
+    return output + '.checkpoint'
+
+
+def file_prefix_hash(path, size):
+    """
+    Hash the prefix of a file.
+    :param size: The length of the prefix.
+    :return: The SHA-256 hash object of the prefix, None if the file is shorter than the prefix or does not exist.
+    """
+    sha = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            while size > 0:
+                block = file.read(min(size, _BLOCK_SIZE))
+                if not block:
+                    return None
+                sha.update(block)
+                size -= len(block)
+    except FileNotFoundError:
+        return None
+    return sha
+
+
+def load_checkpoint(output):
+    """
+    Read the checkpoint of an interrupted transfer into the output file, and verify the prefix of the output it covers.
+    :return: The offset up to which the output is received and the SHA-256 hash object of that prefix. The offset is 0
+    without a checkpoint, or when the prefix does not match the digest in the checkpoint.
+    """
+    try:
+        with open(checkpoint_path(output)) as file:
+            checkpoint = json.load(file)
+        offset, digest = int(checkpoint['offset']), checkpoint['sha256']
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0, hashlib.sha256()
+    sha = file_prefix_hash(output, offset)
+    if sha is None or sha.hexdigest() != digest:
+        return 0, hashlib.sha256()
+    return offset, sha
+
+
+def resume_offset(path, offer):
+    """
+    Decide where to resume the transfer of a file, given the offer of the server.
+    :param offer: The (offset, SHA-256 digest) of the prefix the server has, None if it offered nothing.
+    :return: The offset of the offer if the file starts with the same prefix, 0 otherwise.
+    """
+    if offer is None:
+        return 0
+    offset, digest = offer
+    sha = file_prefix_hash(path, offset)
+    return offset if sha is not None and sha.digest() == digest else 0
+
+
+# Writes a stream into the output file from an offset on, and persists a checkpoint with the offset and the SHA-256
+# digest of the prefix every CHECKPOINT_INTERVAL bytes. The data is synced to the disk before the checkpoint replaces
+# the previous one, so a checkpoint never covers data which is lost in a crash.
+class CheckpointWriter:
+
+    def __init__(self, output, offset=0, sha=None):
+        self._output = output
+        self._file = open(output, 'r+b' if offset > 0 else 'wb')
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self.offset = offset                             # The amount of contiguous bytes in the output.
+        self._sha = sha if sha is not None else hashlib.sha256()  # The hash of the output up to the offset.
+        self._checkpointed = offset                      # The offset of the last checkpoint.
+
+    def write(self, data):
+        self._file.write(data)
+        self._sha.update(data)
+        self.offset += len(data)
+        if self.offset - self._checkpointed >= CHECKPOINT_INTERVAL:
+            self.checkpoint()
+
+    # Persist the offset and the digest of all of the data written so far.
+    def checkpoint(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        path = checkpoint_path(self._output)
+        with open(path + '.tmp', 'w') as file:
+            json.dump({'offset': self.offset, 'sha256': self._sha.hexdigest()}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + '.tmp', path)
+        self._checkpointed = self.offset
+
+    # Close the output, the checkpoint is removed once the whole file is received and persisted otherwise.
+    def close(self, complete):
+        if complete:
+            self._file.close()
+            if os.path.exists(checkpoint_path(self._output)):
+                os.remove(checkpoint_path(self._output))
+        else:
+            self.checkpoint()
+            self._file.close()
+
+
+def receive_resumable(chunks, output, offset, sha):
+    """
+    Write a stream which starts with a stripe header into the output. The client either resumes at the offset of the
+    checkpoint or starts again at 0.
+    :param chunks: The chunks of data of the connection.
+    :param offset: The offset up to which the output is received, as offered to the client.
+    :param sha: The SHA-256 hash object of the output up to the offset.
+    :return: If the whole file is received.
+    """
+    header = b''
+    writer = None
+    total = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                header += chunk
+                if len(header) < STRIPE_HEADER.size:
+                    continue
+                start, _, total = STRIPE_HEADER.unpack_from(header)
+                if start != offset and start != 0:  # Neither the offered offset nor a new start.
+                    return False
+                writer = CheckpointWriter(output, start, sha if start == offset else None)
+                chunk = header[STRIPE_HEADER.size:]
+            writer.write(chunk)
+    finally:
+        if writer is not None:
+            writer.close(writer.offset == total)
+    return writer is not None and writer.offset == total
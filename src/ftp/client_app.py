@@ -1,30 +1,60 @@
 #!/usr/local/bin/python3
 
 from btcp.client_socket import BTCPClientSocket
+from ftp.striping import send_striped, StripeReader
+from ftp.checkpoint import resume_offset
 import argparse
+import os
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument("-t", "--timeout", help="Define bTCP timeout in milliseconds", type=int, default=100)
+    parser.add_argument("-t", "--timeout", help="Define the initial bTCP timeout in milliseconds", type=int, default=100)
     parser.add_argument("-i", "--input", help="File to send", default="../ftp/input.txt")
-    args = parser.parse_args()
+    parser.add_argument("-c", "--compression", help="Compress the data segments", choices=["zlib", "lzma"])
+    parser.add_argument("-f", "--fast", help="Send the data right behind the SYN and the FIN right behind the data",
+                        action="store_true")
+    parser.add_argument("-s", "--stripes", help="Send the file over this many concurrent connections", type=int,
+                        default=1)
+    parser.add_argument("-r", "--resume", help="Only send the part of the file the server does not have yet",
+                        action="store_true")
+    args = parser.parse_args(argv)
+    if args.resume and args.stripes > 1:
+        parser.error("a striped transfer cannot be resumed")
 
-    sock = BTCPClientSocket(args.timeout)
+    if args.stripes > 1:
+        # Every stripe uses its own process and ports, from CLIENT_PORT and SERVER_PORT onwards.
+        if send_striped(args.input, args.stripes, args.timeout, args.compression, args.fast):
+            print("[client] The data is successfully transferred over {} connections.".format(args.stripes))
+            return 0
+        print("[client] Error while trying to transfer the data over {} connections.".format(args.stripes))
+        return 1
+
+    sock = BTCPClientSocket(args.timeout, compression=args.compression, resume=args.resume)
 
     def close(exit_status):
         sock.close()
-        exit(exit_status)
+        return exit_status
 
-    if sock.connect():
+    # The resume offer arrives with the SYN-ACK, so a resumed transfer waits for it.
+    if sock.connect(args.fast and not args.resume):
         print("[client] A connection is established.")
     else:
         print("[client] Error while trying to connect.")
-        close(1)
+        return close(1)
 
-    with open(args.input, 'r', encoding='utf-8') as file:
-        data = file.read()
-    if sock.send(data):
+    with open(args.input, 'rb') as file:
+        if sock.resume_offer is not None:
+            # Continue after the prefix the server has when it is the same as the start of the file. Only a server
+            # which offered to resume expects the stripe header in front of the data.
+            size = os.path.getsize(args.input)
+            offset = resume_offset(args.input, sock.resume_offer)
+            if offset:
+                print("[client] The transfer is resumed at byte {}.".format(offset))
+            success = sock.send_stream(StripeReader(file, offset, size - offset, size), args.fast)
+        else:
+            success = sock.send_stream(file, args.fast)
+    if success:
         print("[client] The data is successfully transferred.")
     else:
         print("[client] Error while trying to transfer the data.")
@@ -33,9 +63,9 @@ def main():
         print("[client] The connection is terminated.")
     else:
         print("[client] The connection is terminated abnormally.")
-        close(1)
-    close(0)
+        return close(1)
+    return close(0)
 
 
 if __name__ == '__main__':
-    main()
+    exit(main())
@@ -2,26 +2,54 @@
 
 import argparse
 from btcp.server_socket import BTCPServerSocket
+from ftp.striping import receive_striped
+from ftp.checkpoint import load_checkpoint, receive_resumable
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-w", "--window", help="Define bTCP window size", type=int, default=30)
     parser.add_argument("-o", "--output", help="Where to store the file", default="../ftp/output.txt")
-    args = parser.parse_args()
-
-    sock = BTCPServerSocket(args.window)
-
-    sock.accept()
+    parser.add_argument("-s", "--stripes", help="Receive the file over this many concurrent connections", type=int,
+                        default=1)
+    parser.add_argument("-r", "--resume", help="Keep a checkpoint, so an interrupted transfer can be resumed",
+                        action="store_true")
+    args = parser.parse_args(argv)
+    if args.resume and args.stripes > 1:
+        parser.error("a striped transfer cannot be resumed")
+
+    if args.stripes > 1:
+        # Every stripe uses its own process and port, from SERVER_PORT onwards.
+        if receive_striped(args.output, args.stripes, args.window):
+            print("[server] The data is received over {} connections.".format(args.stripes))
+            return 0
+        print("[server] The data did not arrive completely over {} connections.".format(args.stripes))
+        return 1
+
+    # Offer the verified prefix of an interrupted transfer to the client.
+    offset, sha = load_checkpoint(args.output) if args.resume else (0, None)
+    sock = BTCPServerSocket(args.window, resume=(offset, sha.digest()) if args.resume else None)
+
+    connection = sock.accept()
     print("[server] A connection is established.")
 
-    data = sock.recv()
-    with open(args.output, 'w', encoding='utf-8') as file:
-        file.write(data)
+    if connection.resumed:
+        # Write the data after the part the client skipped, and keep a checkpoint until the whole file arrived.
+        complete = receive_resumable(connection, args.output, offset, sha)
+    else:
+        # Write the data to the file as soon as it arrives, a client which cannot resume sends the whole file.
+        with open(args.output, 'wb') as file:
+            for chunk in connection:
+                file.write(chunk)
+        complete = True
 
     print("[server] The connection is terminated.")
     sock.close()
+    if not complete:
+        print("[server] The file is incomplete, the transfer can be resumed.")
+        return 1
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    exit(main())
@@ -0,0 +1,146 @@
+from btcp.client_socket import BTCPClientSocket
+from btcp.server_socket import BTCPServerSocket
+from btcp.constants import *
+import concurrent.futures
+import multiprocessing
+import os
+import struct
+
+
+# The header in front of the data of every stripe: the offset of its range in the file, the length of the range and
+# the size of the whole file.
+STRIPE_HEADER = struct.Struct('>QQQ')
+
+STRIPE_TIMEOUT = 60.0  # The seconds the server waits for the connection of every stripe.
+
+
+def stripe_ranges(size, stripes):
+    """
+    Split a file into contiguous ranges of about the same length, one per stripe.
+    :param size: The size of the file in bytes.
+    :param stripes: The amount of stripes.
+    :return: A list with the (offset, length) of every stripe.
+    :raises ValueError: If the amount of stripes is not positive.
+    """
+    if stripes < 1:
+        raise ValueError("The amount of stripes is not positive: {}.".format(stripes))
+    ranges = []
+    offset = 0
+    for index in range(stripes):
+        length = size // stripes + (1 if index < size % stripes else 0)
+        ranges.append((offset, length))
+        offset += length
+    return ranges
+
+
+# A binary file object which reads the header of a stripe followed by its range of the file, so the stripe is send as
+# one stream.
+class StripeReader:
+
+    def __init__(self, fileobj, offset, length, total):
+        fileobj.seek(offset)
+        self._file = fileobj
+        self._header = STRIPE_HEADER.pack(offset, length, total)
+        self._remaining = length  # The amount of bytes of the range which is not read yet.
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self._header) + self._remaining
+        data = self._header[:size]
+        self._header = self._header[len(data):]
+        if len(data) < size and self._remaining > 0:
+            chunk = self._file.read(min(size - len(data), self._remaining))
+            self._remaining -= len(chunk)
+            data += chunk
+        return data
+
+
+def send_stripe(path, index, offset, length, total, timeout, compression=None, fast_open=False):
+    """
+    Send one range of a file over its own connection, from CLIENT_PORT + index to SERVER_PORT + index.
+    :return: If the connection is established, the range is transferred and the connection is terminated normally.
+    """
+    sock = BTCPClientSocket(timeout, address=(CLIENT_IP, CLIENT_PORT + index),
+                            server_address=(SERVER_IP, SERVER_PORT + index), compression=compression)
+    try:
+        if not sock.connect(fast_open):
+            return False
+        with open(path, 'rb') as file:
+            success = sock.send_stream(StripeReader(file, offset, length, total), fast_open)
+        return sock.disconnect() and success
+    finally:
+        sock.close()
+
+
+def receive_stripe(output, index, window, timeout=STRIPE_TIMEOUT):
+    """
+    Accept one connection on SERVER_PORT + index and write the range it carries into the output file at its offset.
+    :param timeout: The seconds to wait for the connection.
+    :return: The offset, the amount of bytes written, the length of the range and the size of the file. The offset, the
+    length and the size are None if the connection or the header did not arrive.
+    """
+    sock = BTCPServerSocket(window, address=(SERVER_IP, SERVER_PORT + index))
+    offset = length = total = None
+    written = 0
+    try:
+        connection = sock.accept(timeout)
+        if connection is None:
+            return offset, written, length, total
+        header = b''
+        with open(output, 'r+b') as file:
+            for chunk in connection:
+                if length is None:
+                    header += chunk
+                    if len(header) < STRIPE_HEADER.size:
+                        continue
+                    offset, length, total = STRIPE_HEADER.unpack_from(header)
+                    chunk = header[STRIPE_HEADER.size:]
+                    file.seek(offset)
+                file.write(chunk)
+                written += len(chunk)
+    finally:
+        sock.close()
+    return offset, written, length, total
+
+
+# The stripes run in processes of their own, so the packet processing of the connections spreads over the cores. The
+# processes are spawned, the apps may run in a thread next to other bTCP threads.
+def _executor(stripes):
+    return concurrent.futures.ProcessPoolExecutor(stripes, mp_context=multiprocessing.get_context('spawn'))
+
+
+def send_striped(path, stripes, timeout, compression=None, fast_open=False):
+    """
+    Send a file over concurrent connections, every stripe carries a contiguous range of the file.
+    :return: If every stripe is transferred successfully.
+    """
+    ranges = stripe_ranges(os.path.getsize(path), stripes)
+    total = sum(length for (_, length) in ranges)
+    with _executor(stripes) as executor:
+        results = [executor.submit(send_stripe, path, index, offset, length, total, timeout, compression, fast_open)
+                   for (index, (offset, length)) in enumerate(ranges)]
+        return all(result.result() for result in results)
+
+
+def receive_striped(output, stripes, window, timeout=STRIPE_TIMEOUT):
+    """
+    Receive a file over concurrent connections and reassemble the stripes by their offsets.
+    :param timeout: The seconds every stripe waits for its connection.
+    :return: If every stripe arrived completely and the stripes cover the whole file.
+    """
+    with open(output, 'wb'):
+        pass
+    with _executor(stripes) as executor:
+        results = [result.result() for result in
+                   [executor.submit(receive_stripe, output, index, window, timeout) for index in range(stripes)]]
+
+    if any(length is None or written != length for (_, written, length, _) in results):
+        return False
+
+    # The ranges follow each other without gaps and add up to the whole file.
+    end = 0
+    for (offset, _, length, _) in sorted(results):
+        if offset != end:
+            return False
+        end += length
+    return all(total == end for (_, _, _, total) in results)
@@ -0,0 +1,30 @@
+import argparse
+
+from benchmarks_framework import input_data, socket_transfer
+
+
+def benchmark_acks(loss, runs, repeat):
+    """Compare an ACK per data segment with delayed cumulative ACKs, both with selective acknowledgements."""
+    modes = [("per-segment", {"ack_every": 1, "ack_delay": 0}), ("delayed", {})]
+    data = input_data(repeat).encode()
+    print("{:<14}{:>8}{:>14}{:>14}{:>16}{:>8}{:>10}".format("acks", "loss", "data packets", "ack packets",
+                                                            "goodput (kB/s)", "fast", "timeout"))
+    for name, server_kwargs in modes:
+        for run in range(runs):
+            result = socket_transfer(data, "loss {}%".format(loss * 100), run, 100, server_kwargs=server_kwargs)
+            if not result["success"]:
+                print("{:<14}{:>8}  transfer failed".format(name, loss))
+                continue
+            client = result["client"]
+            print("{:<14}{:>8}{:>14}{:>14}{:>16.0f}{:>8}{:>10}".format(
+                name, loss, client.stats.segments_sent, result["server"].stats.segments_sent,
+                len(data) / result["seconds"] / 1000, client.fast_retransmits, client.timeout_retransmits))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP acknowledgement benchmarks")
+    parser.add_argument("-l", "--loss", help="Define the probability a segment is lost", type=float, default=0.1)
+    parser.add_argument("-r", "--runs", help="Define the amount of runs per mode", type=int, default=3)
+    parser.add_argument("-s", "--size", help="Define how many times input.txt is send", type=int, default=1)
+    args = parser.parse_args()
+    benchmark_acks(args.loss, args.runs, args.size)
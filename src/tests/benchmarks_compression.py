@@ -0,0 +1,36 @@
+import argparse
+
+from benchmarks_framework import input_data
+from benchmarks_matrix import run
+
+
+def benchmark_compression(size, window, timeout, rates, methods, level=None):
+    """
+    Compare the goodput of uncompressed and compressed transfers over emulated links of different rates, to find the
+    rate above which compressing costs more time than it saves.
+    """
+    data = input_data(size)
+    print("{:>10}{:<2}{:<7}{:>9}{:>16}{:>8}{:>8}{:>10}".format(
+        "rate", "", "method", "seconds", "goodput (kB/s)", "data", "ratio", "cpu (s)"))
+    for rate in rates:
+        rule = "rate {}".format(rate) if rate != "none" else ""
+        for method in [None] + methods:
+            result = run(data, None, window, timeout, 0, rule, compression=method, compression_level=level)
+            ratio = result["compression_ratio"]
+            print("{:>10}{:<2}{:<7}{:>9.2f}{:>16.0f}{:>8}{:>8}{:>10.3f}{}".format(
+                rate, "", method or "-", result["seconds"], result["goodput"] / 1000, result["data_packets"],
+                "-" if ratio is None else "{:.2f}".format(ratio), result["compression_time"],
+                "" if result["success"] else "  transfer failed"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP compression benchmarks over emulated links of different rates")
+    parser.add_argument("-s", "--size", help="Define how many times input.txt is send", type=int, default=10)
+    parser.add_argument("-w", "--window", help="Define the bTCP window size", type=int, default=100)
+    parser.add_argument("-t", "--timeout", help="Define the initial timeout (ms)", type=int, default=100)
+    parser.add_argument("-r", "--rates", help="Define the netem link rates, none for an unlimited link", nargs="+",
+                        default=["2mbit", "10mbit", "50mbit", "200mbit", "none"])
+    parser.add_argument("-m", "--methods", help="Define the compression methods", nargs="+", default=["zlib", "lzma"])
+    parser.add_argument("-l", "--level", help="Define the compression level", type=int)
+    args = parser.parse_args()
+    benchmark_compression(args.size, args.window, args.timeout, args.rates, args.methods, args.level)
@@ -0,0 +1,39 @@
+import argparse
+
+from benchmarks_framework import input_data, socket_transfer
+
+
+def benchmark_congestion(rate, queue, delay, runs, repeat, window):
+    """Compare the congestion controllers over an emulated bottleneck link."""
+    from btcp.congestion import CONGESTION_CONTROLLERS
+    from btcp.constants import SEGMENT_SIZE
+    import math
+
+    # The limit of the emulated network counts the packets on the link as well as the ones waiting in the queue.
+    limit = queue + math.ceil(rate * delay / SEGMENT_SIZE)
+    rule = "rate {}bps limit {} delay {}s".format(rate, limit, delay)
+    data = input_data(repeat).encode()
+    print("{:<10}{:>16}{:>12}{:>16}".format("control", "goodput (kB/s)", "seconds", "retransmitted"))
+    for name in [None] + list(CONGESTION_CONTROLLERS):
+        for run in range(runs):
+            result = socket_transfer(data, rule, run, window, client_kwargs={"congestion": name})
+            if not result["success"]:
+                print("{:<10}  transfer failed".format(str(name)))
+                continue
+            client = result["client"]
+            retransmitted = client.fast_retransmits + client.timeout_retransmits
+            print("{:<10}{:>16.0f}{:>12.2f}{:>15.1f}%".format(str(name), len(data) / result["seconds"] / 1000,
+                                                               result["seconds"],
+                                                               100 * retransmitted / client.stats.segments_sent))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP congestion control benchmarks")
+    parser.add_argument("--rate", help="Define the bottleneck rate in kB/s", type=float, default=2000)
+    parser.add_argument("--queue", help="Define the bottleneck queue size in segments", type=int, default=20)
+    parser.add_argument("--delay", help="Define the propagation delay in ms", type=float, default=10)
+    parser.add_argument("-w", "--window", help="Define the bTCP window size of the server", type=int, default=200)
+    parser.add_argument("-r", "--runs", help="Define the amount of runs per controller", type=int, default=3)
+    parser.add_argument("-s", "--size", help="Define how many times input.txt is send", type=int, default=4)
+    args = parser.parse_args()
+    benchmark_congestion(args.rate * 1000, args.queue, args.delay / 1000, args.runs, args.size, args.window)
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from benchmarks_framework import input_data
+
+
+def load(clients, data, timeout=100, window=100):
+    """
+    Transfer the data from many clients in parallel to one server socket in this process.
+    :return: A dictionary with the results, including the seconds every client took.
+    """
+    from btcp.client_socket import BTCPClientSocket
+    from btcp.server_socket import BTCPServerSocket
+    import btcp.constants
+
+    server = BTCPServerSocket(window)
+    received = []
+    lock = threading.Lock()
+
+    def receive(connection):
+        data = connection.recv()
+        with lock:
+            received.append(data)
+
+    def accept():
+        readers = []
+        for _ in range(clients):
+            reader = threading.Thread(target=receive, args=(server.accept(),))
+            reader.start()
+            readers.append(reader)
+        for reader in readers:
+            reader.join()
+
+    durations = []
+
+    def send():
+        client = BTCPClientSocket(timeout, address=(btcp.constants.CLIENT_IP, 0))
+        start = time.perf_counter()
+        success = client.connect() and client.send(data)
+        with lock:
+            durations.append(time.perf_counter() - start if success else None)
+        client.disconnect()
+        client.close()
+
+    acceptor = threading.Thread(target=accept)
+    acceptor.start()
+    start = time.perf_counter()
+    senders = [threading.Thread(target=send) for _ in range(clients)]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+    seconds = time.perf_counter() - start
+    acceptor.join()
+    server.close()
+
+    finished = [duration for duration in durations if duration is not None]
+    return {
+        "success": len(finished) == clients and received.count(data) == clients,
+        "seconds": seconds,
+        "goodput": len(data.encode()) * len(finished) / seconds,
+        "durations": finished,
+    }
+
+
+def load_asyncio(clients, data, timeout=100, window=100):
+    """
+    Transfer the data from many asyncio clients in parallel to one asyncio server socket, all on one event loop.
+    :return: A dictionary with the results, including the seconds every client took.
+    """
+    from btcp.async_socket import AsyncBTCPClientSocket, AsyncBTCPServerSocket
+    import btcp.constants
+
+    async def run():
+        server = await AsyncBTCPServerSocket.create(window)
+
+        async def receive():
+            connections = [await server.accept() for _ in range(clients)]
+            return await asyncio.gather(*[connection.recv() for connection in connections])
+
+        async def send():
+            client = await AsyncBTCPClientSocket.create(timeout, address=(btcp.constants.CLIENT_IP, 0))
+            start = time.perf_counter()
+            success = await client.connect() and await client.send(data)
+            duration = time.perf_counter() - start if success else None
+            await client.disconnect()
+            client.close()
+            return duration
+
+        receiver = asyncio.create_task(receive())
+        start = time.perf_counter()
+        durations = await asyncio.gather(*[send() for _ in range(clients)])
+        seconds = time.perf_counter() - start
+        received = await receiver
+        server.close()
+        return durations, seconds, received
+
+    durations, seconds, received = asyncio.run(run())
+    finished = [duration for duration in durations if duration is not None]
+    return {
+        "success": len(finished) == clients and received.count(data) == clients,
+        "seconds": seconds,
+        "goodput": len(data.encode()) * len(finished) / seconds,
+        "durations": finished,
+    }
+
+
+def benchmark_connections(counts, repeat, use_asyncio=False):
+    """Report the aggregate goodput and the spread of the transfer times for a number of parallel clients."""
+    data = input_data(repeat)
+    print("{:<10}{:>10}{:>16}{:>10}{:>10}{:>10}".format("clients", "seconds", "goodput (kB/s)", "min", "median",
+                                                        "max"))
+    for clients in counts:
+        result = load_asyncio(clients, data) if use_asyncio else load(clients, data)
+        if not result["success"]:
+            print("{:<10}  transfer failed".format(clients))
+            continue
+        durations = result["durations"]
+        print("{:<10}{:>10.2f}{:>16.0f}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+            clients, result["seconds"], result["goodput"] / 1000, min(durations), statistics.median(durations),
+            max(durations)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP benchmarks with many parallel clients on one server port")
+    parser.add_argument("-c", "--clients", help="Define the amounts of parallel clients", type=int, nargs="+",
+                        default=[1, 10, 100, 200])
+    parser.add_argument("-s", "--size", help="Define how many times input.txt is send per client", type=int, default=1)
+    parser.add_argument("-a", "--asyncio", help="Run all clients and the server on one event loop",
+                        action="store_true")
+    args = parser.parse_args()
+    benchmark_connections(args.clients, args.size, args.asyncio)
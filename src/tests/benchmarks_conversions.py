@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import timeit
+
+
+def benchmark_checksum(number):
+    """Report the throughput of every checksum engine for control and full data segments."""
+    from btcp.btcp_socket import CHECKSUM_ENGINES
+    import btcp.constants
+
+    sizes = [("control", btcp.constants.HEADER_SIZE), ("data", btcp.constants.SEGMENT_SIZE)]
+    print("{:<12}{:<10}{:>16}".format("engine", "segment", "segments/sec"))
+    for name, engine in CHECKSUM_ENGINES.items():
+        for kind, size in sizes:
+            segment = os.urandom(size)
+            seconds = timeit.timeit(lambda: engine(segment), number=number)
+            print("{:<12}{:<10}{:>16.0f}".format(name, kind, number / seconds))
+
+
+def benchmark_parse(number):
+    """Report the throughput of parsing control and full data segments, from bytes and from a reused buffer."""
+    from btcp.btcp_socket import ascii_to_bytes, bytes_to_ascii, parse_segment
+    import btcp.constants
+
+    segments = [("control", ascii_to_bytes(1, 2, [True, False, False], 3, b'')),
+                ("data", ascii_to_bytes(1, 2, [False, False, False], 3, os.urandom(btcp.constants.PAYLOAD_SIZE)))]
+    print("{:<16}{:<10}{:>16}".format("parser", "segment", "segments/sec"))
+    for kind, segment in segments:
+        buffer = bytearray(btcp.constants.SEGMENT_SIZE)
+        buffer[:len(segment)] = segment
+        view = memoryview(buffer)[:len(segment)]
+        parsers = [("bytes_to_ascii", lambda: bytes_to_ascii(segment)),
+                   ("parse_segment", lambda: parse_segment(view))]
+        for name, parser in parsers:
+            seconds = timeit.timeit(parser, number=number)
+            print("{:<16}{:<10}{:>16.0f}".format(name, kind, number / seconds))
+
+
+def benchmark_encode(number):
+    """Report the throughput of encoding control and full data segments, with and without validation or cache."""
+    from btcp.btcp_socket import ascii_to_bytes, encode_segment, control_segment
+    import btcp.constants
+
+    payload = os.urandom(btcp.constants.PAYLOAD_SIZE)
+    encoders = [("ascii_to_bytes", "control", lambda: ascii_to_bytes(1, 2, [True, False, False], 3, b'')),
+                ("encode_segment", "control", lambda: encode_segment(1, 2, btcp.constants.FLAG_ACK, 3, b'')),
+                ("control_segment", "control", lambda: control_segment(1, 2, btcp.constants.FLAG_ACK, 3)),
+                ("ascii_to_bytes", "data", lambda: ascii_to_bytes(1, 2, [False, False, False], 3, payload)),
+                ("encode_segment", "data", lambda: encode_segment(1, 2, 0, 3, payload))]
+    print("{:<16}{:<10}{:>16}".format("encoder", "segment", "segments/sec"))
+    for name, kind, encoder in encoders:
+        seconds = timeit.timeit(encoder, number=number)
+        print("{:<16}{:<10}{:>16.0f}".format(name, kind, number / seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP conversion benchmarks")
+    parser.add_argument("-n", "--number", help="Define the amount of segments per measurement", type=int,
+                        default=20000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    benchmark_checksum(args.number)
+    print()
+    benchmark_parse(args.number)
+    print()
+    benchmark_encode(args.number)
@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def socket_transfer(data, rule=None, seed=0, window=50, timeout=100, fast_open=False, finish=False,
+                    client_kwargs=None, server_kwargs=None, receive=None, prepare=None):
+    """
+    Transfer the data from a client to a server socket over loopback, from connect until the connection is terminated.
+    :param data: The data to be send, as bytes.
+    :param rule: The netem rule of an emulated network between the sockets, None to use real UDP sockets.
+    :param receive: Reads the data from the accepted connection and returns it, all of the data is joined by default.
+    :param prepare: Called with the client and the server socket before the transfer starts.
+    :return: A dictionary with the results of the transfer, the sockets are closed.
+    """
+    from btcp.client_socket import BTCPClientSocket
+    from btcp.server_socket import BTCPServerSocket
+    from btcp.emulator import Network
+    from btcp.lossy_layer import set_network
+
+    network = Network(rule, seed) if rule is not None else None
+    set_network(network)
+    try:
+        server = BTCPServerSocket(window, address=("127.0.0.1", 0), **(server_kwargs or {}))
+        client = BTCPClientSocket(timeout, address=("127.0.0.1", 0), server_address=server.address,
+                                  **(client_kwargs or {}))
+    finally:
+        set_network(None)
+    if prepare is not None:
+        prepare(client, server)
+    result = {"received": None, "connection": None}
+
+    def receiver():
+        connection = server.accept()
+        result["connection"] = connection
+        result["received"] = receive(connection) if receive is not None else b"".join(connection)
+
+    thread = threading.Thread(target=receiver)
+    thread.start()
+    start = time.perf_counter()
+    sent = client.connect(fast_open) and client.send(data, finish)
+    seconds = time.perf_counter() - start
+    terminated = client.disconnect()
+    total_seconds = time.perf_counter() - start
+    thread.join(30)
+    client.close()
+    server.close()
+    if network is not None:
+        network.close()
+
+    result.update({
+        "success": sent and result["received"] == data,
+        "sent": sent,                    # If connect and send succeeded.
+        "terminated": terminated,        # If disconnect succeeded.
+        "seconds": seconds,              # From connect until send returned.
+        "total_seconds": total_seconds,  # From connect until disconnect returned.
+        "client": client,
+        "server": server,
+    })
+    return result
+
+
+def input_data(repeat=1):
+    """The data from ftp/input.txt, optionally repeated a few times."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ftp", "input.txt")
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read() * repeat
@@ -0,0 +1,52 @@
+import argparse
+import statistics
+
+from benchmarks_framework import socket_transfer
+
+
+MODES = {
+    "classic": (False, False),
+    "fast open": (True, False),
+    "fast+fin": (True, True),
+}
+
+
+def transfer(data, rule, seed, fast_open, finish, timeout):
+    """
+    Transfer the data over an emulated network, from connect until the connection is terminated.
+    :return: The seconds the transfer took and if it was successful.
+    """
+    result = socket_transfer(data, rule, seed, 100, timeout, fast_open, finish)
+    return result["total_seconds"], result["success"] and result["terminated"]
+
+
+def benchmark_latency(sizes, delay, loss, runs, timeout):
+    """
+    Print the median and 90th percentile latency of short transfers, in milliseconds and in round trips, for the
+    classic handshakes, fast open, and fast open with the FIN pipelined behind the data.
+    """
+    rtt = 2 * delay / 1000
+    rule = "delay {}ms loss {}%".format(delay, loss)
+    print("{:>8}{:<2}{:<11}{:>13}{:>13}{:>9}{:>8}".format(
+        "bytes", "", "mode", "median (ms)", "p90 (ms)", "RTTs", "failed"))
+    for size in sizes:
+        data = bytes(size)
+        for mode, (fast_open, finish) in MODES.items():
+            results = [transfer(data, rule, seed, fast_open, finish, timeout) for seed in range(runs)]
+            seconds = sorted(result[0] for result in results)
+            median = statistics.median(seconds)
+            print("{:>8}{:<2}{:<11}{:>13.1f}{:>13.1f}{:>9.2f}{:>8}".format(
+                size, "", mode, median * 1000, seconds[int(0.9 * (len(seconds) - 1))] * 1000, median / rtt,
+                sum(not result[1] for result in results)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP latency of short transfers over an emulated delay")
+    parser.add_argument("-b", "--sizes", help="Define the transfer sizes (bytes)", type=int, nargs="+",
+                        default=[100, 1000, 4000, 16000])
+    parser.add_argument("-d", "--delay", help="Define the one-way delay (ms)", type=int, default=25)
+    parser.add_argument("-l", "--loss", help="Define the loss rate (%%)", type=float, default=0)
+    parser.add_argument("-r", "--runs", help="Define the amount of transfers (seeds) per mode", type=int, default=10)
+    parser.add_argument("-t", "--timeout", help="Define the initial timeout (ms)", type=int, default=100)
+    args = parser.parse_args()
+    benchmark_latency(args.sizes, args.delay, args.loss, args.runs, args.timeout)
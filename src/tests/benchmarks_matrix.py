@@ -0,0 +1,126 @@
+import argparse
+import csv
+import itertools
+import json
+import time
+
+from benchmarks_framework import input_data, socket_transfer
+
+# The network profiles of the framework tests, the delay profile is relative to the timeout.
+PROFILES = {
+    "ideal": "",
+    "loss": "loss 10% 25%",
+    "reorder": "delay 20ms reorder 25% 50%",
+    "delay": "delay {timeout}ms 20ms",
+    "allbad": "corrupt 1% duplicate 10% loss 10% 25% delay 20ms reorder 25% 50%",
+}
+
+FIELDS = ["label", "profile", "size", "window", "timeout", "run", "success", "seconds", "goodput", "data_packets",
+          "retransmissions", "fast_retransmits", "timeout_retransmits", "ack_packets", "client_cpu", "server_cpu",
+          "network_cpu", "compression_ratio", "compression_time"]
+
+
+def thread_cpu(thread):
+    """The CPU time in seconds the (still running) thread used, or None if the platform cannot tell."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+    except (AttributeError, OSError):
+        return None
+
+
+def add_cpu(*times):
+    return None if None in times else sum(times)
+
+
+def run(data, profile, window, timeout, seed, rule=None, **options):
+    """
+    Transfer the data over an emulated network with the profile (or the netem rule) and measure the transfer, the
+    options are passed to the client socket.
+    :return: A dictionary with the results of the transfer.
+    """
+    data = data.encode()
+    threads = {}
+
+    def prepare(client, server):
+        threads["client"] = client._lossy_layer._thread
+        threads["server"] = server._lossy_layer._thread
+        threads["network"] = client._lossy_layer._udp_sock._network._thread
+
+    def receive(connection):
+        start = time.thread_time()
+        received = b"".join(connection)
+        threads["receiver_cpu"] = time.thread_time() - start
+        # The stream ended with the FIN, the lossy layer threads are still running so their CPU time can be read.
+        for name in ("client", "server", "network"):
+            threads[name + "_cpu"] = thread_cpu(threads[name])
+        return received
+
+    start_cpu = time.thread_time()
+    result = socket_transfer(data, rule if rule is not None else PROFILES[profile].format(timeout=timeout), seed,
+                             window, timeout, client_kwargs=options, prepare=prepare, receive=receive)
+    sender_cpu = time.thread_time() - start_cpu
+    client, server = result["client"], result["server"]
+
+    return {
+        "success": result["success"],
+        "seconds": result["seconds"],
+        "goodput": len(data) / result["seconds"],
+        "data_packets": client.stats.segments_sent,
+        "retransmissions": client.fast_retransmits + client.timeout_retransmits,
+        "fast_retransmits": client.fast_retransmits,
+        "timeout_retransmits": client.timeout_retransmits,
+        "ack_packets": server.stats.segments_sent,
+        "client_cpu": add_cpu(sender_cpu, threads.get("client_cpu")),
+        "server_cpu": add_cpu(threads.get("receiver_cpu", 0), threads.get("server_cpu")),
+        "network_cpu": threads.get("network_cpu"),
+        "compression_ratio": client.stats.compression_ratio,
+        "compression_time": client.stats.compression_time,
+    }
+
+
+def benchmark_matrix(sizes, windows, timeouts, profiles, runs, label=None, output=None):
+    """Run every combination of the parameters, print a table and optionally write the results as JSON or CSV."""
+    results = []
+    print("{:<8}{:>6}{:>8}{:>8}{:>5}{:>9}{:>16}{:>8}{:>8}{:>8}{:>12}".format(
+        "profile", "size", "window", "timeout", "run", "seconds", "goodput (kB/s)", "data", "retrans", "acks",
+        "cpu c/s (s)"))
+    for profile, size, window, timeout, index in itertools.product(profiles, sizes, windows, timeouts, range(runs)):
+        result = run(input_data(size), profile, window, timeout, index)
+        result.update({"label": label, "profile": profile, "size": size, "window": window, "timeout": timeout,
+                       "run": index})
+        results.append(result)
+
+        cpu = "-" if result["client_cpu"] is None else "{:.2f}/{:.2f}".format(result["client_cpu"],
+                                                                             result["server_cpu"])
+        print("{:<8}{:>6}{:>8}{:>8}{:>5}{:>9.2f}{:>16.0f}{:>8}{:>8}{:>8}{:>12}{}".format(
+            profile, size, window, timeout, index, result["seconds"], result["goodput"] / 1000,
+            result["data_packets"], result["retransmissions"], result["ack_packets"], cpu,
+            "" if result["success"] else "  transfer failed"))
+
+    if output is not None:
+        with open(output, "w", newline="") as file:
+            if output.endswith(".csv"):
+                writer = csv.DictWriter(file, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(results)
+            else:
+                json.dump(results, file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP throughput and latency benchmarks over an emulated network")
+    parser.add_argument("-s", "--sizes", help="Define how many times input.txt is send", type=int, nargs="+",
+                        default=[1, 10])
+    parser.add_argument("-w", "--windows", help="Define the bTCP window sizes", type=int, nargs="+",
+                        default=[30, 100])
+    parser.add_argument("-t", "--timeouts", help="Define the initial timeouts (ms)", type=int, nargs="+",
+                        default=[100])
+    parser.add_argument("-p", "--profiles", help="Define the network profiles", nargs="+", choices=list(PROFILES),
+                        default=list(PROFILES))
+    parser.add_argument("-r", "--runs", help="Define the amount of runs (seeds) per combination", type=int,
+                        default=1)
+    parser.add_argument("-l", "--label", help="Define a label for the results, like the version")
+    parser.add_argument("-o", "--output", help="Write the results to a .json or .csv file")
+    args = parser.parse_args()
+    benchmark_matrix(args.sizes, args.windows, args.timeouts, args.profiles, args.runs, args.label, args.output)
@@ -0,0 +1,45 @@
+import argparse
+
+from benchmarks_framework import input_data
+from benchmarks_matrix import PROFILES, run
+
+
+def benchmark_pacing(size, window, timeout, profiles, bottleneck, runs, rate_limit=None):
+    """
+    Compare bursts of whole windows with paced transfers over the network profiles behind a bottleneck, a drop-tail
+    queue at a fixed rate. The loss rate is the share of the data segments which had to be retransmitted.
+    """
+    variants = [("burst", {}), ("paced", {"pacing": True})]
+    if rate_limit is not None:
+        variants.append(("limited", {"rate_limit": rate_limit * 1000}))
+
+    print("{:<8}{:<9}{:>9}{:>16}{:>8}{:>10}{:>10}".format(
+        "profile", "sender", "seconds", "goodput (kB/s)", "data", "retrans", "loss (%)"))
+    for profile in profiles:
+        for name, options in variants:
+            seconds = goodput = packets = retransmissions = 0
+            for index in range(runs):
+                rule = "{} {}".format(PROFILES[profile].format(timeout=timeout), bottleneck)
+                result = run(input_data(size), profile, window, timeout, index, rule, **options)
+                seconds += result["seconds"] / runs
+                goodput += result["goodput"] / runs
+                packets += result["data_packets"]
+                retransmissions += result["retransmissions"]
+            print("{:<8}{:<9}{:>9.2f}{:>16.0f}{:>8}{:>10}{:>10.1f}".format(
+                profile, name, seconds, goodput / 1000, packets // runs, retransmissions // runs,
+                100 * retransmissions / packets))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP pacing benchmarks over an emulated bottleneck")
+    parser.add_argument("-s", "--size", help="Define how many times input.txt is send", type=int, default=4)
+    parser.add_argument("-w", "--window", help="Define the bTCP window size", type=int, default=100)
+    parser.add_argument("-t", "--timeout", help="Define the initial timeout (ms)", type=int, default=100)
+    parser.add_argument("-p", "--profiles", help="Define the network profiles", nargs="+", choices=list(PROFILES),
+                        default=["loss", "delay"])
+    parser.add_argument("-b", "--bottleneck", help="Define the netem rate and queue limit of the bottleneck",
+                        default="rate 20mbit limit 20")
+    parser.add_argument("-r", "--runs", help="Define the amount of runs (seeds) per variant", type=int, default=1)
+    parser.add_argument("-l", "--rate-limit", help="Also run with a fixed rate limit (kB/s)", type=float)
+    args = parser.parse_args()
+    benchmark_pacing(args.size, args.window, args.timeout, args.profiles, args.bottleneck, args.runs, args.rate_limit)
@@ -0,0 +1,43 @@
+import argparse
+
+from benchmarks_framework import input_data, socket_transfer
+
+
+def transfer(data, payload_size, window, timeout):
+    """
+    Transfer the data over loopback with the payload size offered by both sides.
+    :return: A dictionary with the results of the transfer.
+    """
+    result = socket_transfer(data, window=window, timeout=timeout, client_kwargs={"payload_size": payload_size},
+                             server_kwargs={"payload_size": payload_size})
+    client = result["client"]
+    return {
+        "success": result["success"],
+        "seconds": result["seconds"],
+        "goodput": len(data) / result["seconds"],
+        "segments": client.stats.segments_sent,
+        "retransmissions": client.fast_retransmits + client.timeout_retransmits,
+    }
+
+
+def benchmark_segment_size(sizes, repeat, window, timeout, runs):
+    """Print the goodput of a transfer over loopback for every payload size, the best of a few runs."""
+    data = input_data(repeat).encode()
+    print("{:>8}{:>9}{:>16}{:>10}{:>9}".format("payload", "seconds", "goodput (MB/s)", "segments", "retrans"))
+    for size in sizes:
+        result = min((transfer(data, size, window, timeout) for _ in range(runs)), key=lambda r: r["seconds"])
+        print("{:>8}{:>9.3f}{:>16.1f}{:>10}{:>9}{}".format(
+            size, result["seconds"], result["goodput"] / 1e6, result["segments"], result["retransmissions"],
+            "" if result["success"] else "  transfer failed"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP goodput against the negotiated payload size over loopback")
+    parser.add_argument("-p", "--payload-sizes", help="Define the payload sizes (bytes)", type=int, nargs="+",
+                        default=[1008, 2048, 4096, 8192, 16384, 32768, 65497])
+    parser.add_argument("-s", "--size", help="Define how many times input.txt is send", type=int, default=50)
+    parser.add_argument("-w", "--window", help="Define the bTCP window size", type=int, default=100)
+    parser.add_argument("-t", "--timeout", help="Define the initial timeout (ms)", type=int, default=100)
+    parser.add_argument("-r", "--runs", help="Define the amount of runs per payload size", type=int, default=3)
+    args = parser.parse_args()
+    benchmark_segment_size(args.payload_sizes, args.size, args.window, args.timeout, args.runs)
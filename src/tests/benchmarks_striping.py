@@ -0,0 +1,55 @@
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import tempfile
+import threading
+import time
+
+
+def transfer(source, output, stripes, window, timeout):
+    """
+    Transfer the file with the FTP apps over the given amount of connections, over loopback.
+    :return: The seconds the transfer took and if the output is the same as the source.
+    """
+    import ftp.client_app, ftp.server_app
+
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = threading.Thread(target=lambda: results.append(
+            ftp.server_app.main(["-w", str(window), "-o", output, "-s", str(stripes)])))
+        server.start()
+        start = time.perf_counter()
+        ftp.client_app.main(["-t", str(timeout), "-i", source, "-s", str(stripes)])
+        server.join()
+        seconds = time.perf_counter() - start
+    return seconds, filecmp.cmp(source, output, shallow=False)
+
+
+def benchmark_striping(size, stripes, window, timeout):
+    """
+    Print the aggregate goodput of a file transfer for every amount of stripes. Every stripe runs in a process of its
+    own on both sides, the goodput scales with the amount of cores until the link is saturated.
+    """
+    print("{} cores".format(os.cpu_count()))
+    print("{:>8}{:>9}{:>16}".format("stripes", "seconds", "goodput (MB/s)"))
+    with tempfile.TemporaryDirectory() as directory:
+        source, output = os.path.join(directory, "input"), os.path.join(directory, "output")
+        with open(source, "wb") as file:
+            file.write(os.urandom(size * 1000000))
+        for count in stripes:
+            seconds, success = transfer(source, output, count, window, timeout)
+            print("{:>8}{:>9.2f}{:>16.1f}{}".format(
+                count, seconds, size / seconds, "" if success else "  transfer failed"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bTCP striped transfers of the FTP apps over loopback")
+    parser.add_argument("-s", "--size", help="Define the size of the file (MB)", type=int, default=50)
+    parser.add_argument("-n", "--stripes", help="Define the amounts of stripes", type=int, nargs="+",
+                        default=[1, 2, 4, 8])
+    parser.add_argument("-w", "--window", help="Define the bTCP window size", type=int, default=100)
+    parser.add_argument("-t", "--timeout", help="Define the initial timeout (ms)", type=int, default=100)
+    args = parser.parse_args()
+    benchmark_striping(args.size, args.stripes, args.window, args.timeout)
@@ -0,0 +1,46 @@
+import unittest
+
+
+class TestAsyncSocket(unittest.TestCase):
+    """Test cases for the asyncio client and server sockets."""
+
+    def test_parallel_transfers(self):
+        """
+        Test if many clients transfer their data to one server on a single event loop, half of them with fast open
+        and a pipelined FIN.
+        """
+        from btcp.async_socket import AsyncBTCPClientSocket, AsyncBTCPServerSocket
+        import asyncio
+
+        clients = 5
+        data = [bytes([index]) * (3000 + index) for index in range(clients)]
+
+        async def transfer():
+            server = await AsyncBTCPServerSocket.create(50, address=('127.0.0.1', 0))
+
+            async def serve():
+                async def read(connection):
+                    return b''.join([chunk async for chunk in connection])
+                connections = [await server.accept() for _ in range(clients)]
+                return await asyncio.gather(*[read(connection) for connection in connections])
+
+            async def send(payload, fast):
+                client = await AsyncBTCPClientSocket.create(100, address=('127.0.0.1', 0),
+                                                            server_address=server.address)
+                result = await client.connect(fast) and await client.send(payload, fast) and await client.disconnect()
+                client.close()
+                return result
+
+            received = asyncio.create_task(serve())
+            results = await asyncio.gather(*[send(payload, index % 2 == 1) for (index, payload) in enumerate(data)])
+            received = await asyncio.wait_for(received, 10)
+            server.close()
+            return results, received
+
+        results, received = asyncio.run(asyncio.wait_for(transfer(), 30))
+        self.assertEqual(results, [True] * clients)
+        self.assertEqual(sorted(received), sorted(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+
+class TestCompression(unittest.TestCase):
+    """Test cases for the compression of the data segments."""
+
+    def test_segments(self):
+        """
+        Test if the segments of compressible data hold more data, and incompressible data is send as is.
+        """
+        from btcp.compression import Compressor, compression_methods
+        from btcp.btcp_socket import parse_segment
+        from btcp.constants import FLAG_COMPRESSED, PAYLOAD_SIZE, MAX_COMPRESSION_FACTOR
+        import io
+        import os
+
+        text = b"The quick brown fox jumps over the lazy dog. " * 2000
+        noise = os.urandom(50000)
+        for method in compression_methods():
+            compressor = Compressor(method)
+            segments = [parse_segment(segment) for segment in
+                        compressor.segments(io.BytesIO(text + noise), 100, PAYLOAD_SIZE)]
+            self.assertEqual([segment.seq_num for segment in segments], list(range(100, 100 + len(segments))))
+            self.assertTrue(all(len(segment.data) <= PAYLOAD_SIZE for segment in segments))
+
+            data = b''.join(compressor.decompress(segment.data, PAYLOAD_SIZE * MAX_COMPRESSION_FACTOR)
+                            if segment.flags & FLAG_COMPRESSED else bytes(segment.data) for segment in segments)
+            self.assertEqual(data, text + noise, method)
+
+            # The text needs far fewer segments, the noise is mostly send as is.
+            compressed = [segment for segment in segments if segment.flags & FLAG_COMPRESSED]
+            self.assertLess(len(compressed), len(text) // PAYLOAD_SIZE // 4, method)
+            self.assertGreater(len(segments) - len(compressed), len(noise) // PAYLOAD_SIZE - 2, method)
+
+    def test_decompress_invalid(self):
+        """
+        Test if invalid or too large compressed payloads are refused.
+        """
+        from btcp.compression import Compressor
+
+        compressor = Compressor('zlib')
+        with self.assertRaises(ValueError):
+            compressor.decompress(b'not compressed', 1000)
+        with self.assertRaises(ValueError):
+            compressor.decompress(compressor.compress(b'\x00' * 2000), 1000)
+        with self.assertRaises(ValueError):
+            Compressor('rar')
+
+    def test_transfer(self):
+        """
+        Test if the compression is agreed and the data arrives over a lossy network, or is send as is when the server
+        refuses it.
+        """
+        from benchmarks_framework import socket_transfer
+        from btcp.compression import compression_methods
+        from btcp.constants import PAYLOAD_SIZE
+
+        data = b"The quick brown fox jumps over the lazy dog. " * 3000
+        for method in compression_methods():
+            result = socket_transfer(data, "loss 10%", 1, client_kwargs={'compression': method})
+            self.assertTrue(result["success"], method)
+            self.assertEqual(result["received"], data, method)
+            client, connection = result["client"], result["connection"]
+            self.assertGreater(client.stats.compression_ratio, 4, method)
+            self.assertGreater(connection.stats.compression_ratio, 4, method)
+            self.assertLess(client.stats.segments_sent, len(data) // PAYLOAD_SIZE, method)
+
+        result = socket_transfer(data, '', 1, client_kwargs={'compression': 'zlib'},
+                                 server_kwargs={'compression': False})
+        self.assertTrue(result["success"])
+        self.assertEqual(result["received"], data)
+        self.assertIsNone(result["client"].stats.compression_ratio)
+        self.assertGreater(result["client"].stats.segments_sent, len(data) // PAYLOAD_SIZE)
+
+if __name__ == "__main__":
+    unittest.main()
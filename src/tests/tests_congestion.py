@@ -0,0 +1,59 @@
+import unittest
+
+
+class TestCongestion(unittest.TestCase):
+    """Test cases for the congestion controllers."""
+
+    def test_slow_start(self):
+        """
+        Test if every controller doubles its window per round-trip during slow start.
+        """
+        from btcp.congestion import CONGESTION_CONTROLLERS
+        from btcp.constants import INITIAL_CWND
+
+        for name, controller in CONGESTION_CONTROLLERS.items():
+            congestion = controller()
+            congestion.on_ack(INITIAL_CWND, 0, 0.1)
+            self.assertEqual(congestion.cwnd, 2 * INITIAL_CWND, name)
+
+    def test_newreno(self):
+        """
+        Test the additive increase and multiplicative decrease of NewReno.
+        """
+        from btcp.congestion import NewReno
+        from btcp.constants import MIN_CWND
+
+        congestion = NewReno()
+        congestion.cwnd = 20
+        congestion.on_loss(0)
+        self.assertEqual(congestion.cwnd, 10)
+        self.assertEqual(congestion.ssthresh, 10)
+
+        # One segment per round-trip in congestion avoidance.
+        for _ in range(10):
+            congestion.on_ack(1, 0, 0.1)
+        self.assertAlmostEqual(congestion.cwnd, 11, delta=0.1)
+
+        congestion.on_timeout(0)
+        self.assertEqual(congestion.cwnd, MIN_CWND)
+
+    def test_cubic(self):
+        """
+        Test if CUBIC only decreases to 70% and grows back to the window before the loss.
+        """
+        from btcp.congestion import Cubic
+
+        congestion = Cubic()
+        congestion.cwnd = 100
+        congestion.on_loss(0)
+        self.assertAlmostEqual(congestion.cwnd, 70)
+
+        now = 0
+        while now < 10:
+            congestion.on_ack(int(congestion.cwnd), now, 0.1)
+            now += 0.1
+        self.assertGreater(congestion.cwnd, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
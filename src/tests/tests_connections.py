@@ -0,0 +1,92 @@
+import unittest
+
+
+def handshake(server, isn):
+    """
+    Establish a connection with the server from a plain UDP socket.
+    :param isn: The initial sequence number of the client.
+    :return: The UDP socket of the client.
+    """
+    from btcp.btcp_socket import control_segment, parse_segment, seq_add
+    from btcp.constants import FLAG_ACK, FLAG_SYN
+    import socket
+
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.bind(('127.0.0.1', 0))
+    udp.settimeout(2)
+    udp.sendto(control_segment(isn, 0, FLAG_SYN, 0), server.address)
+    syn_ack = parse_segment(udp.recv(2048))
+    udp.sendto(control_segment(seq_add(isn, 1), seq_add(syn_ack.seq_num, 1), FLAG_ACK, 0), server.address)
+    return udp
+
+
+class TestConnections(unittest.TestCase):
+    """Test cases for the end of the connections of a server."""
+
+    def test_early_fin(self):
+        """
+        Test if the FIN of a client which gave up on its data ends the stream at its send base.
+        """
+        from btcp.btcp_socket import control_segment, encode_segment, parse_segment
+        from btcp.constants import FLAG_ACK, FLAG_FIN
+        from btcp.server_socket import BTCPServerSocket
+
+        server = BTCPServerSocket(20, address=('127.0.0.1', 0))
+        udp = handshake(server, 100)
+        try:
+            connection = server.accept()
+            for seq_num in range(101, 104):
+                udp.sendto(bytes(encode_segment(seq_num, 0, 0, 0, b'x' * 10)), server.address)
+
+            # The ACKs did not arrive at the client, it gave up after the first segment.
+            udp.sendto(control_segment(102, 0, FLAG_FIN, 0), server.address)
+            while True:
+                segment = parse_segment(udp.recv(2048))
+                if segment.flags & FLAG_FIN:
+                    break
+            self.assertEqual(segment.flags, FLAG_ACK | FLAG_FIN)
+            self.assertEqual(segment.ack_num, 103)
+            self.assertEqual(b''.join(connection), b'x' * 30)
+            self.assertEqual(server._connections, {})
+        finally:
+            udp.close()
+            server.close()
+
+    def test_long_fin(self):
+        """
+        Test if the FIN of a stream longer than half of the sequence number space terminates the connection.
+        """
+        from benchmarks_framework import socket_transfer
+
+        data = bytes(range(256)) * 157  # 40192 segments of one byte.
+        result = socket_transfer(data, window=2000, client_kwargs={'payload_size': 1},
+                                 server_kwargs={'payload_size': 1})
+        self.assertTrue(result["success"])
+        self.assertTrue(result["terminated"])
+        self.assertTrue(result["connection"].finished)
+        self.assertEqual(result["server"]._connections, {})
+
+    def test_idle(self):
+        """
+        Test if the stream of a client which is gone without a FIN ends after the idle timeout.
+        """
+        from btcp.btcp_socket import encode_segment
+        from btcp.server_socket import BTCPServerSocket
+        import time
+
+        server = BTCPServerSocket(20, address=('127.0.0.1', 0), idle_timeout=0.2)
+        udp = handshake(server, 0xfffe)
+        try:
+            connection = server.accept()
+            udp.sendto(bytes(encode_segment(0xffff, 0, 0, 0, b'data')), server.address)
+            start = time.monotonic()
+            self.assertEqual(b''.join(connection), b'data')
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual(server._connections, {})
+        finally:
+            udp.close()
+            server.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -36,6 +36,35 @@ class TestConversions(unittest.TestCase):
         packet = b'\x00\x23\x45\x67\x89\xab\xcd\xef' + checksum + b'\xff\xee\xdd\xcc\xbb\xaa\x99'
         self.assertFalse(valid_checksum(packet))
 
+    def test_checksum_engines(self):
+        """
+        Test if all of the checksum engines agree with the reference implementation.
+        """
+        from btcp.btcp_socket import CHECKSUM_ENGINES, checksum_reference
+        import random
+
+        rng = random.Random(1071)
+        packets = [b'', b'\x00', b'\xff', b'\x00' * 10, b'\xff' * 10, b'\xff\xff\x00\x01']
+        packets += [bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 1018))) for _ in range(200)]
+        for name, engine in CHECKSUM_ENGINES.items():
+            for packet in packets:
+                self.assertEqual(engine(packet), checksum_reference(packet), name)
+
+    def test_set_checksum_engine(self):
+        """
+        Test the selection of the checksum engine.
+        """
+        from btcp.btcp_socket import set_checksum_engine, calculate_checksum
+
+        try:
+            for name in ['reference', 'words', 'bigint', None]:
+                set_checksum_engine(name)
+                self.assertEqual(calculate_checksum(b'\x00\x01\xf2\x03\xf4\xf5\xf6\xf7'), b'\x22\x0d')
+            with self.assertRaises(ValueError):
+                set_checksum_engine('unknown')
+        finally:
+            set_checksum_engine()
+
     def test_flags_array_to_byte(self):
         """
         Test the transformation of the flags from ascii to bytes.
@@ -139,6 +168,17 @@ class TestConversions(unittest.TestCase):
                    b'\x00\r\x00\x00\x00\x00\x002\xb4u' + b'\x03' * 50]
         self.assertEqual(segments, correct)
 
+    def test_stream_segments(self):
+        """
+        Test if the data read from a file object is chopped into the same segments.
+        """
+        from btcp.btcp_socket import create_segments, stream_segments
+        import io
+
+        data = b'\x00' * 1008 + b'\x01' * 1008 + b'\x02' * 1008 + b'\x03' * 50
+        self.assertEqual(list(stream_segments(io.BytesIO(data), 10)), create_segments(data, 10))
+        self.assertEqual(list(stream_segments(io.BytesIO(b''), 10)), [])
+
     def test_merge_segments(self):
         """
         Test if the data merging goes correctly.
@@ -158,6 +198,131 @@ class TestConversions(unittest.TestCase):
         answer = merge_segments(to_be_sorted)
         self.assertEqual(data_init, answer)
 
+    def test_sack(self):
+        """
+        Test the encoding and decoding of the selective acknowledgement ranges.
+        """
+        from btcp.btcp_socket import sack_to_bytes, bytes_to_sack
+        import btcp.constants
+
+        ranges = [(1, 1), (3, 10), (65534, 65535)]
+        self.assertEqual(sack_to_bytes([]), b'')
+        self.assertEqual(sack_to_bytes(ranges[:1]), b'\x00\x01\x00\x01')
+        self.assertEqual(bytes_to_sack(sack_to_bytes(ranges)), ranges)
+
+        # Only the first few ranges are encoded.
+        ranges = [(index, index) for index in range(0, 100, 2)]
+        self.assertEqual(bytes_to_sack(sack_to_bytes(ranges)), ranges[:btcp.constants.MAX_SACK_RANGES])
+
+        with self.assertRaises(ValueError):
+            bytes_to_sack(b'\x00\x01\x00')
+
+    def test_seq_arithmetic(self):
+        """
+        Test the serial number arithmetic on the 16-bit sequence numbers.
+        """
+        from btcp.btcp_socket import seq_add, seq_diff, seq_lt
+
+        self.assertEqual(seq_add(0xfffe, 3), 1)
+        self.assertEqual(seq_add(0, -1), 0xffff)
+        self.assertEqual(seq_diff(1, 0xfffe), 3)
+        self.assertEqual(seq_diff(0xfffe, 1), -3)
+        self.assertEqual(seq_diff(0x8000, 0), -0x8000)
+        self.assertTrue(seq_lt(0xffff, 0))
+        self.assertFalse(seq_lt(0, 0xffff))
+        self.assertFalse(seq_lt(5, 5))
+
+    def test_create_segments_wraparound(self):
+        """
+        Test if the sequence numbers of the segments wrap around after 0xffff.
+        """
+        from btcp.btcp_socket import create_segments, bytes_to_ascii
+
+        segments = create_segments(b'\x00' * 1008 * 3, 0xfffe)
+        self.assertEqual([bytes_to_ascii(segment)[0] for segment in segments], [0xfffe, 0xffff, 0])
+
+    def test_transfer_wraparound(self):
+        """
+        Test if a lossy stream longer than the sequence number space arrives and terminates normally.
+        """
+        from benchmarks_framework import socket_transfer
+
+        data = bytes(range(256)) * 391  # 100096 segments of one byte, so the sequence numbers wrap at least once.
+        result = socket_transfer(data, "loss 1%", window=4000, finish=True, client_kwargs={'payload_size': 1},
+                                 server_kwargs={'payload_size': 1})
+        self.assertTrue(result["sent"])
+        self.assertEqual(result["received"], data)
+        self.assertTrue(result["terminated"])
+
+    def test_options(self):
+        """
+        Test the encoding and decoding of the handshake options.
+        """
+        from btcp.btcp_socket import options_to_bytes, bytes_to_options
+
+        options = {1: b'\x03', 2: b'\x12\x34', 4: b'', 9: b''}
+        self.assertEqual(options_to_bytes({1: b'\x03'}), b'\x01\x01\x03')
+        self.assertEqual(bytes_to_options(options_to_bytes(options)), options)
+        self.assertEqual(bytes_to_options(b''), {})
+
+        with self.assertRaises(ValueError):
+            bytes_to_options(b'\x01')
+        with self.assertRaises(ValueError):
+            bytes_to_options(b'\x01\x02\x00')
+        # A known option with a value of the wrong length, e.g. an empty window scale.
+        with self.assertRaises(ValueError):
+            bytes_to_options(b'\x01\x00')
+        with self.assertRaises(ValueError):
+            bytes_to_options(b'\x04\x01\x00')
+
+    def test_parse_segment(self):
+        """
+        Test the parsing of segments from a reused buffer without copying the data.
+        """
+        from btcp.btcp_socket import ascii_to_bytes, parse_segment
+        import btcp.constants
+
+        buffer = bytearray(btcp.constants.SEGMENT_SIZE)
+        segment = ascii_to_bytes(32143, 432, [True, False, True], 123, b'\x98' * 543)
+        buffer[:len(segment)] = segment
+        parsed = parse_segment(memoryview(buffer)[:len(segment)])
+        self.assertEqual((parsed.seq_num, parsed.ack_num, parsed.window_size), (32143, 432, 123))
+        self.assertEqual(parsed.flags, btcp.constants.FLAG_ACK | btcp.constants.FLAG_FIN)
+        self.assertEqual(bytes(parsed.data), b'\x98' * 543)
+
+        # The data is a view of the buffer, not a copy.
+        buffer[btcp.constants.HEADER_SIZE] = 0
+        self.assertEqual(parsed.data[0], 0)
+
+        with self.assertRaises(ValueError):
+            parse_segment(segment[:btcp.constants.HEADER_SIZE - 1])
+        with self.assertRaises(ValueError):
+            parse_segment(segment[:-1])
+
+    def test_encode_segment(self):
+        """
+        Test if the incrementally calculated checksum equals the checksum over the whole segment.
+        """
+        from btcp.btcp_socket import encode_segment, control_segment, checksum_reference, valid_checksum
+        import btcp.constants
+        import random
+
+        rng = random.Random(3)
+        cases = [(0, 0, 0, 0, b''), (0, 0, 0, 0, b'\x00' * 3), (0xffff, 0xffff, 7, 0xff, b'\xff' * 1008)]
+        cases += [(rng.randrange(0x10000), rng.randrange(0x10000), rng.randrange(8), rng.randrange(0x100),
+                   bytes(rng.randrange(256) for _ in range(rng.randrange(btcp.constants.PAYLOAD_SIZE + 1))))
+                  for _ in range(50)]
+        for case in cases:
+            segment = encode_segment(*case)
+            self.assertTrue(valid_checksum(segment))
+            unchecked = bytes(segment[:8]) + b'\x00\x00' + bytes(segment[10:])
+            self.assertEqual(bytes(segment[8:10]), checksum_reference(unchecked))
+            self.assertEqual(control_segment(*case), segment)
+
+        # The same control segment is only created once.
+        ack = control_segment(1, 2, btcp.constants.FLAG_ACK, 3)
+        self.assertIs(control_segment(1, 2, btcp.constants.FLAG_ACK, 3), ack)
+
 
 if __name__ == "__main__":
     unittest.main()
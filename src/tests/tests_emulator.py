@@ -0,0 +1,97 @@
+import unittest
+
+
+def exchange(rule, seed, packets, virtual_time=True):
+    """Send the packets over an emulated network with the rule, returns all of the packets which arrive."""
+    from btcp.emulator import Network
+    import select
+
+    network = Network(rule, seed, virtual_time)
+    a, b = network.socket(), network.socket()
+    a.bind(('127.0.0.1', 1))
+    b.bind(('127.0.0.1', 2))
+    for packet in packets:
+        a.sendto(packet, ('127.0.0.1', 2))
+
+    received = []
+    buffer = bytearray(100)
+    while select.select([b], [], [], 0.2)[0]:
+        try:
+            size, source = b.recvfrom_into(buffer)
+        except BlockingIOError:
+            continue
+        received.append(bytes(buffer[:size]))
+    network.close()
+    a.close()
+    b.close()
+    return received
+
+
+class TestEmulator(unittest.TestCase):
+    """Test cases for the network emulator."""
+
+    def test_parse_netem(self):
+        """
+        Test the parsing of the netem rules used by the framework tests.
+        """
+        from btcp.emulator import parse_netem
+
+        self.assertEqual(parse_netem(""), {})
+        self.assertEqual(parse_netem("loss 10% 25%"), {'loss': {'probability': 0.1, 'correlation': 0.25}})
+        self.assertEqual(parse_netem("delay 100ms 20ms reorder 25%"),
+                         {'delay': {'delay': 0.1, 'jitter': 0.02, 'correlation': 0},
+                          'reorder': {'probability': 0.25, 'correlation': 0}})
+        self.assertEqual(parse_netem("loss gemodel 1% 10%"),
+                         {'gemodel': {'p': 0.01, 'r': 0.1, 'bad_loss': 1, 'good_loss': 0}})
+        self.assertEqual(parse_netem("rate 8kbit limit 10"), {'rate': {'rate': 1000}, 'limit': {'limit': 10}})
+
+        with self.assertRaises(ValueError):
+            parse_netem("jump 10%")
+        with self.assertRaises(ValueError):
+            parse_netem("loss")
+
+    def test_seeded(self):
+        """
+        Test if the same seed reproduces the same packets and another seed does not.
+        """
+        packets = [bytes([index]) for index in range(200)]
+        rule = "loss 20% duplicate 10% delay 10ms 5ms"
+        self.assertEqual(exchange(rule, 1, packets), exchange(rule, 1, packets))
+        self.assertNotEqual(exchange(rule, 1, packets), exchange(rule, 2, packets))
+
+    def test_impairments(self):
+        """
+        Test every impairment on its own.
+        """
+        packets = [bytes([index]) * 10 for index in range(100)]
+        self.assertEqual(exchange("", 0, packets), packets)
+        self.assertEqual(exchange("loss 100%", 0, packets), [])
+        self.assertEqual(exchange("duplicate 100%", 0, packets), [packet for packet in packets for _ in range(2)])
+
+        # A corrupted packet differs in exactly one bit.
+        for packet, corrupted in zip(packets, exchange("corrupt 100%", 0, packets)):
+            difference = int.from_bytes(packet, 'big') ^ int.from_bytes(corrupted, 'big')
+            self.assertEqual(bin(difference).count('1'), 1)
+
+        # The reordered packets are send immediately, the others are delayed.
+        reordered = exchange("delay 10ms reorder 50%", 0, packets)
+        self.assertEqual(sorted(reordered), packets)
+        self.assertNotEqual(reordered, packets)
+
+    def test_gemodel(self):
+        """
+        Test if the Gilbert-Elliott model loses about the stationary probability of the bad state, in bursts.
+        """
+        packets = [index.to_bytes(2, 'big') for index in range(5000)]
+        received = exchange("loss gemodel 10% 30%", 0, packets)
+        self.assertAlmostEqual(1 - len(received) / len(packets), 0.1 / (0.1 + 0.3), delta=0.05)
+
+        # The bursts are longer than with independent loss of the same probability.
+        lost = sorted(set(packets) - set(received))
+        bursts = sum(1 for (first, second) in zip(lost, lost[1:]) if int.from_bytes(second, 'big') -
+                     int.from_bytes(first, 'big') > 1) + 1
+        self.assertGreater(len(lost) / bursts, 1 / (1 - 0.25))
+
+
+if __name__ == "__main__":
+    unittest.main()
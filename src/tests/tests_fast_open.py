@@ -0,0 +1,57 @@
+import unittest
+
+
+class TestFastOpen(unittest.TestCase):
+    """Test cases for fast open and the FIN pipelined behind the data."""
+
+    def test_round_trips(self):
+        """
+        Test if a one segment transfer takes one round trip with fast open and a pipelined FIN, instead of three.
+        """
+        from benchmarks_framework import socket_transfer
+
+        rtt = 0.06  # Below the initial retransmission timeout.
+        rule = "delay {}ms".format(int(rtt * 500))
+        result = socket_transfer(b'x' * 500, rule, 1)
+        self.assertTrue(result["success"] and result["terminated"])
+        self.assertEqual(result["received"], b'x' * 500)
+        self.assertGreater(result["total_seconds"], 3 * rtt)
+
+        result = socket_transfer(b'x' * 500, rule, 1, fast_open=True, finish=True)
+        self.assertTrue(result["success"] and result["terminated"])
+        self.assertEqual(result["received"], b'x' * 500)
+        self.assertLess(result["total_seconds"], 1.8 * rtt)
+        self.assertEqual(result["client"].stats.segments_sent, 4)  # SYN, data, FIN and the ACK of the SYN-ACK.
+
+    def test_lossy(self):
+        """
+        Test if short transfers with fast open and a pipelined FIN arrive over a lossy and reordering network.
+        """
+        from benchmarks_framework import socket_transfer
+
+        for size in [0, 1008, 5000, 50000]:
+            data = bytes(range(256)) * (size // 256) + bytes(size % 256)
+            for seed in range(2):
+                for (rule, finish) in (("loss 10% delay 5ms 2ms reorder 20%", True), ("loss 10%", False)):
+                    result = socket_transfer(data, rule, seed, fast_open=True, finish=finish)
+                    self.assertTrue(result["success"] and result["terminated"], (size, seed, finish))
+                    self.assertEqual(result["received"], data, (size, seed, finish))
+
+    def test_small_payload_server(self):
+        """
+        Test if a server which accepts a smaller payload still receives the default sized segments send before the
+        SYN-ACK, the rest of the data uses the smaller payload.
+        """
+        from benchmarks_framework import socket_transfer
+        from btcp.constants import PAYLOAD_SIZE
+
+        data = bytes(range(256)) * 40
+        result = socket_transfer(data, "delay 20ms", 1, fast_open=True, server_kwargs={'payload_size': 500})
+        self.assertTrue(result["success"] and result["terminated"])
+        self.assertEqual(result["received"], data)
+        client = result["client"]
+        self.assertEqual(client.payload_size, 500)
+        self.assertGreater(client.stats.segments_sent - 3, len(data) // PAYLOAD_SIZE + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+
+def slow_transfer(data, window, rule='', seed=0, chunk=2000, delay=0.002, pause=0):
+    """
+    Transfer the data to a server which reads it slowly in chunks, after a pause, over an emulated network with the
+    rule.
+    :return: The results of the transfer and the largest amount of unread payloads buffered.
+    """
+    from benchmarks_framework import socket_transfer
+    import time
+
+    buffered = [0]
+
+    def receive(connection):
+        data = bytearray()
+        buffer = bytearray(chunk)
+        time.sleep(pause)
+        while True:
+            buffered[0] = max(buffered[0], len(connection._ready))
+            size = connection.recv_into(buffer)
+            if not size:
+                return bytes(data)
+            data += buffer[:size]
+            time.sleep(delay)
+
+    return socket_transfer(data, rule, seed, window, receive=receive), buffered[0]
+
+
+class TestFlowControl(unittest.TestCase):
+    """Test cases for the flow control between a fast client and a slow application on the server."""
+
+    def test_bounded_buffer(self):
+        """
+        Test if the server never buffers more unread data than its window, and the client waits for the reader.
+        """
+        data = bytes(range(256)) * 800
+        result, buffered = slow_transfer(data, 8)
+        self.assertTrue(result["success"])
+        self.assertLessEqual(buffered, 8)
+        self.assertIn(0, [window for (_, window) in result["client"].stats.windows])
+        self.assertGreater(result["connection"].stats.window_updates, 0)
+
+    def test_lost_window_updates(self):
+        """
+        Test if the zero window probes keep the transfer going when the reader pauses and window updates are lost.
+        """
+        data = bytes(range(256)) * 400
+        result, buffered = slow_transfer(data, 4, "loss 20%", 3, pause=0.5)
+        self.assertTrue(result["success"])
+        self.assertLessEqual(buffered, 4)
+        self.assertGreater(result["client"].stats.window_probes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,46 +1,10 @@
 import argparse
 import unittest
-import socket
-import time
 import sys
 
 timeout = 100
 window_size = 100
-interface = "lo"
-netem_add = "sudo tc qdisc add dev {} root netem".format(interface)
-netem_change = "sudo tc qdisc change dev {} root netem {}".format(interface, "{}")
-netem_del = "sudo tc qdisc del dev {} root netem".format(interface)
-
-
-def run_command_with_output(command, input=None, cwd=None, shell=True):
-    """run command and retrieve output"""
-    import subprocess
-    try:
-        process = subprocess.Popen(command, cwd=cwd, shell=shell, stdout=subprocess.PIPE, stdin=subprocess.PIPE)
-        # No pipes set for stdin/stdout/stdout streams so effectively just wait for process ends (same as process.wait()).
-        [stdout_data, stderr_data] = process.communicate(input)
-
-        if process.returncode:
-            print(stderr_data)
-            print("Problem running command : \n   ", str(command), " ", process.returncode)
-        return stdout_data
-    except subprocess.SubprocessError:
-        print("Problem running command : \n", str(command))
-
-
-def run_command(command, cwd=None, shell=True):
-    """run command with no output piping"""
-    import subprocess
-    process = None
-    try:
-        process = subprocess.Popen(command, shell=shell, cwd=cwd)
-        print(str(process))
-    except Exception as inst:
-        print("Problem running command : \n   ", str(command), "\n problem : ", str(inst))
-
-    process.communicate()  # wait for the process to end
-    if process.returncode:
-        print("Problem running command : \n   ", str(command), " ", process.returncode)
+seed = 0
 
 
 class TestFramework(unittest.TestCase):
@@ -48,17 +12,18 @@ class TestFramework(unittest.TestCase):
 
     def setUp(self):
         """Prepare for testing"""
-        # default netem rule (does nothing)
-        # run_command(netem_add)
-
-        # launch localhost server
+        # An emulated network with the default rule (does nothing), instead of netem on the loopback interface.
+        from btcp.emulator import Network
+        from btcp.lossy_layer import set_network
+        self.network = Network(seed=seed)
+        set_network(self.network)
 
     def tearDown(self):
         """Clean up after testing"""
         # clean the environment
-        # run_command(netem_del)
-
-        # close server
+        from btcp.lossy_layer import set_network
+        set_network(None)
+        self.network.close()
 
     def exchange(self):
         # Clear the output.txt file.
@@ -68,8 +33,8 @@ class TestFramework(unittest.TestCase):
         # Send the data simply by starting the server and client app.
         import ftp.client_app, ftp.server_app
         import threading
-        server = threading.Thread(target=ftp.server_app.main)
-        client = threading.Thread(target=ftp.client_app.main)
+        server = threading.Thread(target=ftp.server_app.main, args=(["-w", str(window_size)],))
+        client = threading.Thread(target=ftp.client_app.main, args=(["-t", str(timeout)],))
 
         server.start()
         client.start()
@@ -88,32 +53,32 @@ class TestFramework(unittest.TestCase):
     def test_flipping_network(self):
         """reliability over network with bit flips
         (which sometimes results in lower layer packet loss)"""
-        run_command(netem_change.format("corrupt 1%"))
+        self.network.configure("corrupt 1%")
         self.exchange()
 
     def test_duplicates_network(self):
         """reliability over network with duplicate packets"""
-        run_command(netem_change.format("duplicate 10%"))
+        self.network.configure("duplicate 10%")
         self.exchange()
 
     def test_lossy_network(self):
         """reliability over network with packet loss"""
-        run_command(netem_change.format("loss 10% 25%"))
+        self.network.configure("loss 10% 25%")
         self.exchange()
 
     def test_reordering_network(self):
         """reliability over network with packet reordering"""
-        run_command(netem_change.format("delay 20ms reorder 25% 50%"))
+        self.network.configure("delay 20ms reorder 25% 50%")
         self.exchange()
 
     def test_delayed_network(self):
         """reliability over network with delay relative to the timeout value"""
-        run_command(netem_change.format("delay " + str(timeout) + "ms 20ms"))
+        self.network.configure("delay " + str(timeout) + "ms 20ms")
         self.exchange()
 
     def test_allbad_network(self):
         """reliability over network with all of the above problems"""
-        run_command(netem_change.format("corrupt 1% duplicate 10% loss 10% 25% delay 20ms reorder 25% 50%"))
+        self.network.configure("corrupt 1% duplicate 10% loss 10% 25% delay 20ms reorder 25% 50%")
         self.exchange()
 
 
@@ -121,9 +86,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="bTCP tests")
     parser.add_argument("-w", "--window", help="Define bTCP window size used", type=int, default=100)
     parser.add_argument("-t", "--timeout", help="Define the timeout value used (ms)", type=int, default=timeout)
+    parser.add_argument("-s", "--seed", help="Define the seed of the emulated network", type=int, default=seed)
     args, extra = parser.parse_known_args()
     timeout = args.timeout
     window_size = args.window
+    seed = args.seed
 
     sys.argv[1:] = extra  # Pass the extra arguments to unittest
     unittest.main()       # Start test suite
@@ -0,0 +1,68 @@
+import unittest
+
+
+class TestPacing(unittest.TestCase):
+    """Test cases for the pacer."""
+
+    def test_rate(self):
+        """
+        Test if the rate follows the window per round-trip time and is capped by the rate limit.
+        """
+        from btcp.pacing import Pacer
+        from btcp.constants import PACING_GAIN, SEGMENT_SIZE
+
+        pacer = Pacer()
+        pacer.update(10, None)
+        self.assertIsNone(pacer.rate)
+        self.assertEqual(pacer.available(0), float('inf'))
+        pacer.update(10, 0.1)
+        self.assertAlmostEqual(pacer.rate, PACING_GAIN * 100)
+
+        limited = Pacer(rate_limit=50 * SEGMENT_SIZE)
+        limited.update(10, None)
+        self.assertEqual(limited.rate, 50)
+        limited.update(10, 0.1)
+        self.assertEqual(limited.rate, 50)
+        limited.update(10, 0.1, 2 * SEGMENT_SIZE)
+        self.assertEqual(limited.rate, 25)
+        fixed = Pacer(False, 50 * SEGMENT_SIZE)
+        fixed.update(1000, 0.001)
+        self.assertEqual(fixed.rate, 50)
+
+    def test_token_bucket(self):
+        """
+        Test if the tokens are released at the rate up to the burst.
+        """
+        from btcp.pacing import Pacer
+        from btcp.constants import SEGMENT_SIZE
+
+        pacer = Pacer(False, 100 * SEGMENT_SIZE, burst=2)
+        pacer.update(10, 0.1)
+        self.assertEqual(pacer.available(0), 2)
+        pacer.consume(2)
+        self.assertEqual(pacer.available(0), 0)
+        self.assertAlmostEqual(pacer.release(0), 0.01)
+        self.assertEqual(pacer.available(0.015), 1)
+        pacer.consume(1)
+        self.assertAlmostEqual(pacer.release(0.015), 0.02)
+
+        # The tokens do not pile up while the sender is idle.
+        self.assertEqual(pacer.available(10), 2)
+
+    def test_paced_transfer(self):
+        """
+        Test if a paced and a rate limited client transfer the data, the rate limit bounds the duration.
+        """
+        from benchmarks_framework import socket_transfer
+        from btcp.constants import PAYLOAD_SIZE, SEGMENT_SIZE
+
+        data = bytes(range(256)) * 200
+        for options in ({'pacing': True}, {'rate_limit': 50 * SEGMENT_SIZE}):
+            result = socket_transfer(data, client_kwargs=options)
+            self.assertTrue(result["success"], options)
+            if 'rate_limit' in options:
+                self.assertGreater(result["seconds"], (len(data) / PAYLOAD_SIZE - 2) / 50 * 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+
+class TestPayloadSize(unittest.TestCase):
+    """Test cases for the negotiation of the payload size."""
+
+    def test_negotiation(self):
+        """
+        Test if both sides agree on the smallest payload size offered, and the data arrives in larger segments.
+        """
+        from benchmarks_framework import socket_transfer
+        from btcp.constants import PAYLOAD_SIZE, MAX_PAYLOAD_SIZE
+
+        data = bytes(range(256)) * 1000
+        cases = [(PAYLOAD_SIZE, PAYLOAD_SIZE, PAYLOAD_SIZE, None), (16000, 8000, 8000, None),
+                 (500, MAX_PAYLOAD_SIZE, 500, None), (MAX_PAYLOAD_SIZE, MAX_PAYLOAD_SIZE, MAX_PAYLOAD_SIZE, None),
+                 (9000, 9000, 9000, "loss 5%")]
+        for (client_payload, server_payload, agreed, rule) in cases:
+            result = socket_transfer(data, rule, 1, 20, client_kwargs={'payload_size': client_payload},
+                                     server_kwargs={'payload_size': server_payload})
+            self.assertTrue(result["success"], (client_payload, server_payload))
+            self.assertEqual(result["received"], data, (client_payload, server_payload))
+            self.assertEqual(result["client"].payload_size, agreed, (client_payload, server_payload))
+            self.assertEqual(result["connection"].payload_size, agreed, (client_payload, server_payload))
+
+    def test_out_of_range(self):
+        """
+        Test if payload sizes which do not fit in a datagram are refused.
+        """
+        from btcp.client_socket import BTCPClientSocket
+        from btcp.server_socket import BTCPServerSocket
+        from btcp.constants import MAX_PAYLOAD_SIZE
+
+        with self.assertRaises(ValueError):
+            BTCPClientSocket(100, payload_size=MAX_PAYLOAD_SIZE + 1)
+        with self.assertRaises(ValueError):
+            BTCPServerSocket(20, payload_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+
+
+def stream(offset, data):
+    """
+    :return: The chunks of a stream which sends the data from the offset on, after a stripe header.
+    """
+    from ftp.striping import STRIPE_HEADER
+
+    payload = STRIPE_HEADER.pack(offset, len(data) - offset, len(data)) + data[offset:]
+    return [payload[index:index + 1000] for index in range(0, len(payload), 1000)]
+
+
+class TestResume(unittest.TestCase):
+    """Test cases for the checkpoints and resumed transfers of the FTP apps."""
+
+    def test_checkpoint(self):
+        """
+        Test if a checkpoint covers the synced prefix of an interrupted transfer, and is refused once that changed.
+        """
+        from ftp.checkpoint import CheckpointWriter, load_checkpoint, CHECKPOINT_INTERVAL
+        import hashlib
+        import os
+        import tempfile
+
+        data = os.urandom(CHECKPOINT_INTERVAL * 5 // 2)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'output')
+            self.assertEqual(load_checkpoint(output)[0], 0)
+
+            # Crash halfway the third interval, without persisting the data after the last checkpoint.
+            writer = CheckpointWriter(output)
+            for index in range(0, len(data), 10000):
+                writer.write(data[index:index + 10000])
+            writer._file.close()
+            offset, sha = load_checkpoint(output)
+            self.assertTrue(2 * CHECKPOINT_INTERVAL <= offset < 2 * CHECKPOINT_INTERVAL + 10000)
+            self.assertEqual(sha.digest(), hashlib.sha256(data[:offset]).digest())
+
+            with open(output, 'r+b') as file:
+                file.seek(100)
+                file.write(bytes([data[100] ^ 1]))
+            self.assertEqual(load_checkpoint(output)[0], 0)
+
+    def test_receive(self):
+        """
+        Test if an incomplete stream leaves a checkpoint, which the next stream resumes from or starts over.
+        """
+        from ftp.checkpoint import receive_resumable, load_checkpoint, checkpoint_path
+        import hashlib
+        import os
+        import tempfile
+
+        data = os.urandom(50000)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'output')
+            self.assertFalse(receive_resumable(stream(0, data)[:20], output, 0, hashlib.sha256()))
+            offset, sha = load_checkpoint(output)
+            self.assertGreater(offset, 0)
+
+            self.assertTrue(receive_resumable(stream(offset, data), output, offset, sha))
+            self.assertFalse(os.path.exists(checkpoint_path(output)))
+            with open(output, 'rb') as file:
+                self.assertEqual(file.read(), data)
+
+            # A client whose file does not match the offer starts over, other offsets are refused.
+            self.assertFalse(receive_resumable(stream(0, data)[:20], output, 0, hashlib.sha256()))
+            offset, sha = load_checkpoint(output)
+            self.assertFalse(receive_resumable(stream(offset + 1, data), output, offset, sha))
+            self.assertTrue(receive_resumable(stream(0, data), output, offset, sha))
+            with open(output, 'rb') as file:
+                self.assertEqual(file.read(), data)
+
+    def test_offer(self):
+        """
+        Test if the server offers its prefix to clients which can resume only.
+        """
+        from btcp.client_socket import BTCPClientSocket
+        from btcp.server_socket import BTCPServerSocket
+        import hashlib
+
+        offer = (12345, hashlib.sha256(b'prefix').digest())
+        server = BTCPServerSocket(20, address=('127.0.0.1', 0), resume=offer)
+        for resume in [True, False]:
+            client = BTCPClientSocket(100, address=('127.0.0.1', 0), server_address=server.address, resume=resume)
+            self.assertTrue(client.connect())
+            self.assertEqual(client.resume_offer, offer if resume else None)
+            self.assertTrue(client.disconnect())
+            client.close()
+        server.close()
+
+    def test_apps(self):
+        """
+        Test if the apps resume an interrupted transfer and only send the missing tail.
+        """
+        from ftp.checkpoint import CheckpointWriter, checkpoint_path
+        import ftp.client_app, ftp.server_app
+        import contextlib
+        import io
+        import os
+        import tempfile
+        import threading
+
+        data = os.urandom(300000)
+        with tempfile.TemporaryDirectory() as directory:
+            source, output = os.path.join(directory, 'input'), os.path.join(directory, 'output')
+            with open(source, 'wb') as file:
+                file.write(data)
+            writer = CheckpointWriter(output)
+            writer.write(data[:200000])
+            writer.close(False)
+
+            results = []
+            printed = io.StringIO()
+            with contextlib.redirect_stdout(printed):
+                server = threading.Thread(target=lambda: results.append(
+                    ftp.server_app.main(["-w", "50", "-o", output, "-r"])))
+                server.start()
+                self.assertEqual(ftp.client_app.main(["-t", "100", "-i", source, "-r"]), 0)
+                server.join(30)
+            self.assertEqual(results, [0])
+            self.assertIn("resumed at byte 200000", printed.getvalue())
+            self.assertFalse(os.path.exists(checkpoint_path(output)))
+            with open(output, 'rb') as file:
+                self.assertEqual(file.read(), data)
+
+    def test_apps_mixed(self):
+        """
+        Test if a resuming app falls back to a plain transfer when the other app does not resume.
+        """
+        import ftp.client_app, ftp.server_app
+        import os
+        import tempfile
+        import threading
+
+        data = os.urandom(100000)
+        for (client_args, server_args) in ((["-r"], []), ([], ["-r"])):
+            with tempfile.TemporaryDirectory() as directory:
+                source, output = os.path.join(directory, 'input'), os.path.join(directory, 'output')
+                with open(source, 'wb') as file:
+                    file.write(data)
+
+                results = []
+                server = threading.Thread(target=lambda: results.append(
+                    ftp.server_app.main(["-w", "50", "-o", output] + server_args)))
+                server.start()
+                self.assertEqual(ftp.client_app.main(["-t", "100", "-i", source] + client_args), 0)
+                server.join(30)
+                self.assertEqual(results, [0])
+                with open(output, 'rb') as file:
+                    self.assertEqual(file.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+
+class TestRTTEstimator(unittest.TestCase):
+    """Test cases for the round-trip time estimation."""
+
+    def test_initial_rto(self):
+        """
+        Test if the initial RTO is used until the first sample and if it is bounded.
+        """
+        from btcp.rtt_estimator import RTTEstimator
+        from btcp.constants import MIN_RTO, MAX_RTO
+
+        self.assertEqual(RTTEstimator(0.1).rto, 0.1)
+        self.assertIsNone(RTTEstimator(0.1).srtt)
+        self.assertEqual(RTTEstimator(0).rto, MIN_RTO)
+        self.assertEqual(RTTEstimator(1000).rto, MAX_RTO)
+
+    def test_sample(self):
+        """
+        Test the smoothed round-trip time and variation after a few samples (RFC 6298).
+        """
+        from btcp.rtt_estimator import RTTEstimator
+
+        estimator = RTTEstimator(1)
+        estimator.sample(0.1)
+        self.assertAlmostEqual(estimator.srtt, 0.1)
+        self.assertAlmostEqual(estimator.rttvar, 0.05)
+        self.assertAlmostEqual(estimator.rto, 0.3)
+
+        estimator.sample(0.2)
+        self.assertAlmostEqual(estimator.rttvar, 0.75 * 0.05 + 0.25 * 0.1)
+        self.assertAlmostEqual(estimator.srtt, 0.875 * 0.1 + 0.125 * 0.2)
+        self.assertAlmostEqual(estimator.rto, estimator.srtt + 4 * estimator.rttvar)
+
+    def test_backoff(self):
+        """
+        Test the exponential backoff of the RTO and the reset after a new sample.
+        """
+        from btcp.rtt_estimator import RTTEstimator
+        from btcp.constants import MAX_RTO
+
+        estimator = RTTEstimator(0.1)
+        estimator.backoff()
+        self.assertAlmostEqual(estimator.rto, 0.2)
+        for _ in range(100):
+            estimator.backoff()
+        self.assertEqual(estimator.rto, MAX_RTO)
+
+        estimator.sample(0.1)
+        self.assertAlmostEqual(estimator.rto, 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+
+class TestStats(unittest.TestCase):
+    """Test cases for the connection statistics and the tracer."""
+
+    def test_connection_stats(self):
+        """
+        Test the round-trip times, windows and phases of the statistics.
+        """
+        from btcp.stats import ConnectionStats
+
+        stats = ConnectionStats()
+        for sample in (0.3, 0.1, 0.2):
+            stats.rtt(sample)
+        self.assertEqual((stats.rtt_samples, stats.last_rtt, stats.min_rtt), (3, 0.2, 0.1))
+
+        # Only the changes of the window are kept.
+        for window in (10, 10, 20, 20, 10):
+            stats.window(window)
+        self.assertEqual([window for (_, window) in stats.windows], [10, 20, 10])
+
+        # Entering a phase ends the previous one, a phase entered again adds up.
+        stats.enter('connect')
+        stats.enter('transfer')
+        stats.leave()
+        stats.enter('connect')
+        stats.leave()
+        stats.leave()
+        self.assertEqual(sorted(stats.phases), ['connect', 'transfer'])
+        self.assertTrue(all(seconds >= 0 for seconds in stats.phases.values()))
+        self.assertEqual(stats.as_dict()['windows'], list(stats.windows))
+        self.assertNotIn('_phase', stats.as_dict())
+
+    def test_tracer(self):
+        """
+        Test if the tracer keeps the latest events and dumps them relative to the first one.
+        """
+        from btcp.stats import Tracer
+        import io
+
+        tracer = Tracer(3)
+        for index in range(5):
+            tracer.record('send', index, 'new')
+        self.assertEqual([event[1:] for event in tracer.events], [('send', index, 'new') for index in range(2, 5)])
+
+        output = io.StringIO()
+        tracer.dump(output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0].split(), ['0.000', 'send', '2', 'new'])
+
+    def test_transfer(self):
+        """
+        Test if the statistics of both sides of a lossy transfer add up.
+        """
+        from benchmarks_framework import socket_transfer
+        from btcp.stats import Tracer
+        from btcp.constants import HEADER_SIZE, PAYLOAD_SIZE
+
+        data = bytes(range(256)) * 400
+        segments = -(-len(data) // PAYLOAD_SIZE)
+
+        def prepare(client, server):
+            client.tracer = Tracer()
+
+        result = socket_transfer(data, "loss 10% corrupt 5%", 1, prepare=prepare)
+        self.assertTrue(result["success"])
+        client, server = result["client"], result["server"]
+
+        # Every data segment is send once plus its retransmissions, next to the SYN, ACK and the FIN(s).
+        stats, connection = client.stats, result["connection"].stats
+        retransmits = stats.fast_retransmits + stats.timeout_retransmits
+        self.assertGreater(retransmits, 0)
+        self.assertGreaterEqual(stats.segments_sent, segments + retransmits + 3)
+        self.assertGreaterEqual(stats.bytes_sent, len(data) + stats.segments_sent * HEADER_SIZE)
+        self.assertGreater(stats.rtt_samples, 0)
+        self.assertTrue(stats.windows)
+        self.assertEqual(sorted(stats.phases), ['connect', 'disconnect', 'transfer'])
+
+        # The server received at most what the client sent, the corrupted segments are counted by the listener.
+        self.assertLessEqual(server.stats.segments_received, stats.segments_sent)
+        self.assertGreaterEqual(server.stats.segments_received - server.stats.checksum_failures,
+                                connection.segments_received)
+        self.assertGreater(server.stats.checksum_failures, 0)
+        self.assertEqual(sorted(connection.phases), ['connect', 'transfer'])
+
+        # The tracer recorded every send segment.
+        sends = [event for event in client.tracer.events if event[1] == 'send']
+        self.assertEqual(len(sends), segments + retransmits)
+
+
+if __name__ == "__main__":
+    unittest.main()
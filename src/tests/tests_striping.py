@@ -0,0 +1,81 @@
+import unittest
+
+
+class TestStriping(unittest.TestCase):
+    """Test cases for the striped transfers of the FTP apps."""
+
+    def test_ranges(self):
+        """
+        Test if the stripes cover the file with contiguous ranges of about the same length.
+        """
+        from ftp.striping import stripe_ranges
+
+        self.assertEqual(stripe_ranges(10, 3), [(0, 4), (4, 3), (7, 3)])
+        self.assertEqual(stripe_ranges(2, 4), [(0, 1), (1, 1), (2, 0), (2, 0)])
+        self.assertEqual(stripe_ranges(0, 1), [(0, 0)])
+        with self.assertRaises(ValueError):
+            stripe_ranges(10, 0)
+
+    def test_reader(self):
+        """
+        Test if a stripe reads as its header followed by exactly its range, whatever the read sizes.
+        """
+        from ftp.striping import StripeReader, STRIPE_HEADER
+        import io
+
+        data = bytes(range(256)) * 10
+        for size in [1, 7, 1008, -1]:
+            reader = StripeReader(io.BytesIO(data), 300, 1000, len(data))
+            stream = b''
+            while True:
+                chunk = reader.read(size)
+                if not chunk:
+                    break
+                stream += chunk
+            self.assertEqual(STRIPE_HEADER.unpack_from(stream), (300, 1000, len(data)))
+            self.assertEqual(stream[STRIPE_HEADER.size:], data[300:1300])
+
+    def test_transfer(self):
+        """
+        Test if the apps transfer a file over concurrent connections and reassemble it.
+        """
+        import ftp.client_app, ftp.server_app
+        import os
+        import tempfile
+        import threading
+
+        with tempfile.TemporaryDirectory() as directory:
+            source, output = os.path.join(directory, 'input'), os.path.join(directory, 'output')
+            with open(source, 'wb') as file:
+                file.write(os.urandom(300000))
+
+            results = []
+            server = threading.Thread(target=lambda: results.append(
+                ftp.server_app.main(["-w", "50", "-o", output, "-s", "3"])))
+            server.start()
+            self.assertEqual(ftp.client_app.main(["-t", "100", "-i", source, "-s", "3"]), 0)
+            server.join(30)
+            self.assertEqual(results, [0])
+            with open(source, 'rb') as expected, open(output, 'rb') as received:
+                self.assertEqual(received.read(), expected.read())
+
+    def test_missing_stripe(self):
+        """
+        Test if a stripe which never connects is reported as failed after its timeout.
+        """
+        from ftp.striping import receive_stripe
+        import os
+        import tempfile
+        import time
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'output')
+            with open(output, 'wb'):
+                pass
+            start = time.monotonic()
+            self.assertEqual(receive_stripe(output, 7, 50, 0.2), (None, 0, None, None))
+            self.assertLess(time.monotonic() - start, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()